@@ -0,0 +1,88 @@
+# accounts/authentication.py
+"""
+JWT authentication without a user query per request.
+
+``TokenUser`` answers ``pk``/``id``, ``username``, ``is_instructor``,
+``is_staff`` and the ``is_authenticated`` checks from the access token's
+claims. Anything else, including passing it to a queryset filter or a
+foreign key, loads the full user through ``accounts.user_cache``. Users
+changed since the token was issued are loaded fresh instead (see
+``accounts.tokens``); the only per-request cost is one cache read.
+"""
+from django.utils.functional import LazyObject, empty
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .tokens import AUTH_VERSION_CLAIM, USER_CLAIMS, current_auth_version, load_active_user
+
+
+class TokenUser(LazyObject):
+    """A user built from token claims; hydrated on first use of any other field"""
+
+    def __init__(self, user_id, claims):
+        super().__init__()
+        self.__dict__['_user_id'] = user_id
+        self.__dict__['_claims'] = claims
+
+    def _setup(self):
+        self._wrapped = load_active_user(self._user_id)
+
+    def _claim(self, name):
+        if self._wrapped is not empty:
+            return getattr(self._wrapped, name)
+        return self._claims[name]
+
+    @property
+    def pk(self):
+        return self._user_id
+
+    id = pk
+
+    @property
+    def username(self):
+        return self._claim('username')
+
+    @property
+    def is_instructor(self):
+        return self._claim('is_instructor')
+
+    @property
+    def is_staff(self):
+        return self._claim('is_staff')
+
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    def __bool__(self):
+        return True
+
+    def __str__(self):
+        return self.username
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that trusts the token's user claims instead of loading the row"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        claims = {claim: validated_token.get(claim) for claim in USER_CLAIMS}
+        if None in claims.values():
+            # Issued before the claims existed
+            return load_active_user(user_id, fresh=True)
+
+        version = current_auth_version(user_id)
+        if version is not None and version != validated_token.get(AUTH_VERSION_CLAIM):
+            # The user changed after this token was issued: trust the row, not the claims
+            return load_active_user(user_id, fresh=True)
+        return TokenUser(user_id, claims)
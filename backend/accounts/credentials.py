@@ -0,0 +1,190 @@
+# accounts/credentials.py
+"""
+Password hashing and checks, one hash per operation.
+
+Hashes run on a bounded thread pool of ``PASSWORD_HASHING_WORKERS``
+threads. PBKDF2 and argon2 both release the GIL, so the pool uses that
+many cores and caps how much CPU a registration storm can take. At most
+``PASSWORD_HASHING_QUEUE`` more hashes wait for a thread. Beyond that
+``HashingBusy`` turns the request into a 503 with Retry-After instead of
+queueing it indefinitely. Async views await the pool (``acreate_user``);
+sync callers block on it.
+
+Login: a successful check can be remembered for
+``LOGIN_VERIFY_CACHE_TIMEOUT`` seconds, keyed by username. The cached
+value is an HMAC of the password and the stored password hash, keyed
+with ``LOGIN_VERIFY_SECRET``. During a login storm, a student who logs
+in again (retry, second tab, reload) gets a cheap HMAC comparison
+instead of another PBKDF2 run. A repeat login still loads the user's
+row, so a password reset or deactivation on any worker takes effect at
+once. A wrong password never matches and falls through to the full
+check, so the cache gives no shortcut for guessing.
+
+The shortcut is off by default. It needs the dedicated secret, which
+is never SECRET_KEY, and a cache shared by all workers
+(``check_login_cache_settings`` enforces both at startup).
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework.exceptions import APIException
+
+from elearning_backend.caching import cache_is_shared
+from .models import User
+
+KEY_SALT = 'accounts.credentials.login'
+
+
+class HashingBusy(APIException):
+    status_code = 503
+    default_detail = 'Too many sign-ups right now, please retry in a moment.'
+    default_code = 'hashing_busy'
+    # Sent as Retry-After by DRF's exception handler
+    wait = 1
+
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+
+
+def _submit(fn, *args):
+    global _pool, _slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = getattr(settings, 'PASSWORD_HASHING_WORKERS', 2)
+                _slots = threading.BoundedSemaphore(workers + getattr(settings, 'PASSWORD_HASHING_QUEUE', 64))
+                _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+    future = _pool.submit(fn, *args)
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def hash_password(password):
+    """``make_password`` on the hashing pool"""
+    return _submit(make_password, password).result()
+
+
+async def ahash_password(password):
+    return await asyncio.wrap_future(_submit(make_password, password))
+
+
+def verify_password(user, password):
+    """
+    Check ``password`` against ``user`` on the hashing pool.
+
+    Unlike ``user.check_password`` this never re-hashes an outdated hash,
+    so callers that are about to replace the password pay for one hash.
+    """
+    return _submit(check_password, password, user.password).result()
+
+
+def set_password(user, password):
+    """``user.set_password`` with the hash made on the pool; the caller saves"""
+    user.password = hash_password(password)
+    # Lets save() notify the password validators, as set_password() does
+    user._password = password
+
+
+def _new_user(username, email, password_hash, **extra_fields):
+    user = User(
+        username=User.normalize_username(username),
+        email=User.objects.normalize_email(email),
+        **extra_fields,
+    )
+    user.password = password_hash
+    return user
+
+
+def create_user(username, email, password, **extra_fields):
+    """``User.objects.create_user`` with one hash, made on the pool, and one INSERT"""
+    user = _new_user(username, email, hash_password(password), **extra_fields)
+    user.save()
+    return user
+
+
+async def acreate_user(username, email, password, **extra_fields):
+    user = _new_user(username, email, await ahash_password(password), **extra_fields)
+    await user.asave()
+    return user
+
+
+def _login_cache_timeout():
+    return getattr(settings, 'LOGIN_VERIFY_CACHE_TIMEOUT', 0)
+
+
+def _login_cache_problem():
+    """Why the login shortcut cannot be used as configured, or None"""
+    if not getattr(settings, 'LOGIN_VERIFY_SECRET', ''):
+        return 'LOGIN_VERIFY_SECRET is not set'
+    if settings.LOGIN_VERIFY_SECRET == settings.SECRET_KEY:
+        return 'LOGIN_VERIFY_SECRET must not be SECRET_KEY'
+    if not cache_is_shared():
+        # Other workers would never see a forget_login()
+        return 'the default cache is not shared between workers'
+    return None
+
+
+def check_login_cache_settings():
+    """Refuse to start with LOGIN_VERIFY_CACHE_TIMEOUT set but unsafe to use"""
+    if _login_cache_timeout() > 0:
+        problem = _login_cache_problem()
+        if problem:
+            raise ImproperlyConfigured(f'LOGIN_VERIFY_CACHE_TIMEOUT is set but {problem}')
+
+
+def _login_cache_enabled():
+    return _login_cache_timeout() > 0 and _login_cache_problem() is None
+
+
+def _cache_key(username):
+    return f'login-verified:{username}'
+
+
+def _digest(password, user):
+    return salted_hmac(
+        KEY_SALT, f'{password}\x00{user.password}', secret=settings.LOGIN_VERIFY_SECRET, algorithm='sha256',
+    ).hexdigest()
+
+
+def forget_login(username):
+    cache.delete(_cache_key(username))
+
+
+def _recently_verified(username, password):
+    digest = cache.get(_cache_key(username))
+    if digest is None:
+        return None
+    # Fresh row, never a cached copy: the stored hash and is_active decide
+    user = (
+        User.objects.only('username', 'password', 'is_active', 'is_staff', 'is_instructor')
+        .filter(username=username).first()
+    )
+    if user is not None and user.is_active and constant_time_compare(digest, _digest(password, user)):
+        return user
+    return None
+
+
+def authenticate_login(request, username, password):
+    """The active user for these credentials, or None; repeats within the cache window skip the hash"""
+    if not username or not password:
+        return None
+    if not _login_cache_enabled():
+        return authenticate(request, username=username, password=password)
+    user = _recently_verified(username, password)
+    if user is not None:
+        return user
+    user = authenticate(request, username=username, password=password)
+    if user is not None:
+        cache.set(_cache_key(username), _digest(password, user), _login_cache_timeout())
+    return user
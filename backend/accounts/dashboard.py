@@ -0,0 +1,95 @@
+# accounts/dashboard.py
+"""
+One-shot payload for the student dashboard.
+
+Each section is built from a single query (upcoming exams may come from
+the per-user cache in ``exams.upcoming``), so a full dashboard costs at most
+three queries however many courses the student has. Callers pass the
+sections they want; the enrollment and completed-course sections share
+their query.
+"""
+from enrollments.models import Enrollment
+from exams.models import ExamAttempt
+from exams.upcoming import exam_as_json, get_upcoming_exams
+
+DASHBOARD_FIELDS = ('enrollments', 'completed_courses', 'upcoming_exams', 'recent_results')
+RECENT_RESULTS_LIMIT = 5
+
+
+def parse_fields(value):
+    """
+    Sections named in a ``?fields=`` value, in DASHBOARD_FIELDS order.
+
+    An empty value selects every section; unknown names raise ValueError.
+    """
+    names = {name.strip() for name in (value or '').split(',') if name.strip()}
+    unknown = names.difference(DASHBOARD_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown dashboard fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in DASHBOARD_FIELDS if not names or name in names)
+
+
+def _enrollment_as_json(enrollment):
+    course = enrollment.course
+    return {
+        'id': enrollment.id,
+        'course': {
+            'id': course.id,
+            'title': course.title,
+            'instructor': course.instructor.username,
+            'thumbnail': course.thumbnail.url if course.thumbnail else None,
+        },
+        'status': enrollment.status,
+        'enrolled_at': enrollment.created_at.isoformat(),
+        'completion_date': enrollment.completion_date.isoformat() if enrollment.completion_date else None,
+        'completed_sections': enrollment.completed_sections,
+        'total_sections': enrollment.total_sections,
+        'progress_percentage': enrollment.progress_percentage,
+    }
+
+
+def _enrollment_sections(user, fields):
+    statuses = []
+    if 'enrollments' in fields:
+        statuses.append('active')
+    if 'completed_courses' in fields:
+        statuses.append('completed')
+    sections = {name: [] for name in ('enrollments', 'completed_courses') if name in fields}
+    for enrollment in Enrollment.objects.filter(user=user, status__in=statuses).select_related(
+        'course__instructor'
+    ):
+        name = 'enrollments' if enrollment.status == 'active' else 'completed_courses'
+        sections[name].append(_enrollment_as_json(enrollment))
+    return sections
+
+
+def _recent_results(user, limit=RECENT_RESULTS_LIMIT):
+    return [
+        {
+            'attempt_id': row['id'],
+            'exam': {'id': row['exam_id'], 'title': row['exam__title']},
+            'course': {'id': row['exam__course_id'], 'title': row['exam__course__title']},
+            'status': row['status'],
+            'score': float(row['score']) if row['score'] is not None else None,
+            'passed': row['score'] is not None and row['score'] >= row['exam__passing_score'],
+            'submitted_at': row['end_time'].isoformat() if row['end_time'] else None,
+        }
+        for row in ExamAttempt.objects.filter(user=user).exclude(status='in_progress')
+        .order_by('-end_time', '-id')
+        .values(
+            'id', 'exam_id', 'exam__title', 'exam__course_id', 'exam__course__title',
+            'exam__passing_score', 'status', 'score', 'end_time',
+        )[:limit]
+    ]
+
+
+def build_dashboard(user, fields=DASHBOARD_FIELDS):
+    """The selected dashboard sections for a user, JSON-ready"""
+    payload = {}
+    if 'enrollments' in fields or 'completed_courses' in fields:
+        payload.update(_enrollment_sections(user, fields))
+    if 'upcoming_exams' in fields:
+        payload['upcoming_exams'] = [exam_as_json(exam) for exam in get_upcoming_exams(user)]
+    if 'recent_results' in fields:
+        payload['recent_results'] = _recent_results(user)
+    return payload
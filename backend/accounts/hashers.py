@@ -0,0 +1,41 @@
+# accounts/hashers.py
+"""
+Password hashers whose cost comes from settings.
+
+Both keep Django's algorithm names. Existing hashes therefore still
+verify, and any hash made with other parameters is re-hashed on the
+user's next successful login (``must_update``). Switching
+``PASSWORD_HASHER`` from pbkdf2 to argon2 works the same way through the
+order of ``PASSWORD_HASHERS``.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with ``PASSWORD_PBKDF2_ITERATIONS`` iterations"""
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id with costs from ``PASSWORD_ARGON2_*``.
+
+    ``memory_cost`` is KiB per hash in flight. Multiply it by
+    ``PASSWORD_HASHING_WORKERS`` to get the peak during a registration storm.
+    """
+
+    @property
+    def time_cost(self):
+        return getattr(settings, 'PASSWORD_ARGON2_TIME_COST', Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, 'PASSWORD_ARGON2_MEMORY_COST', Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'PASSWORD_ARGON2_PARALLELISM', Argon2PasswordHasher.parallelism)
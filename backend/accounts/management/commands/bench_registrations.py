@@ -0,0 +1,66 @@
+import asyncio
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Registrations/sec in one worker process: the old serializer path (create_user, then '
+        'set_password and a second save, on the request thread) vs. the async register_view with '
+        'hashing on the pool. Run on a scratch, migrated database; the users it creates are deleted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--registrations', type=int, default=64)
+        parser.add_argument('--concurrency', type=int, default=16, help='In-flight async requests')
+
+    def handle(self, *args, **options):
+        prefix = f'regbench-{uuid.uuid4().hex[:8]}'
+        n = options['registrations']
+        hasher = get_hasher()
+        self.stdout.write(f'hasher: {hasher.algorithm}  pool workers: {settings.PASSWORD_HASHING_WORKERS}  '
+                          f'registrations: {n}')
+        try:
+            started = time.perf_counter()
+            for i in range(n):
+                user = User.objects.create_user(f'{prefix}-legacy-{i}', f'{prefix}-legacy-{i}@example.com')
+                user.set_password('correct horse battery staple')
+                user.save()
+            self._report('legacy serializer path', n, time.perf_counter() - started, [])
+
+            started = time.perf_counter()
+            # AsyncClient always sends Host: testserver
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                statuses = asyncio.run(self._register_async(prefix, n, options['concurrency']))
+            elapsed = time.perf_counter() - started
+            self._report(f"async register_view x{options['concurrency']}", statuses.count(200), elapsed,
+                         [s for s in statuses if s != 200])
+        finally:
+            User.objects.filter(username__startswith=prefix).delete()
+
+    async def _register_async(self, prefix, n, concurrency):
+        client = AsyncClient()
+        gate = asyncio.Semaphore(concurrency)
+
+        async def register(i):
+            async with gate:
+                response = await client.post('/api/register/', json.dumps({
+                    'username': f'{prefix}-async-{i}',
+                    'email': f'{prefix}-async-{i}@example.com',
+                    'password': 'correct horse battery staple',
+                }), content_type='application/json')
+                return response.status_code
+
+        return await asyncio.gather(*(register(i) for i in range(n)))
+
+    def _report(self, name, ok, elapsed, failures):
+        self.stdout.write(f'{name:<28} ok: {ok:>4}  elapsed: {elapsed:6.2f} s  '
+                          f'registrations/s: {ok / elapsed:7.1f}  failed: {len(failures)} {sorted(set(failures))}')
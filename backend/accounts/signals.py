@@ -0,0 +1,27 @@
+# accounts/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .credentials import forget_login
+from .models import User
+from .tokens import bump_auth_version
+from .user_cache import user_cache
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, update_fields=None, **kwargs):
+    # Drop now and again after commit, so a request that loads the row
+    # before the commit lands cannot keep the old version cached
+    user_id, username = instance.pk, instance.get_username()
+
+    def invalidate():
+        user_cache.invalidate(user_id)
+        forget_login(username)
+
+    invalidate()
+    transaction.on_commit(invalidate)
+    # Last-login stamps change nothing a token vouches for
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        bump_auth_version(user_id)
@@ -1,3 +1,312 @@
-from django.test import TestCase
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from courses.models import Category, Course
+from elearning_backend import profiling
+from elearning_backend.profiling import QueryBudgetMixin
+from enrollments.models import Enrollment
+from exams.models import Exam, ExamAttempt
+from users.serializers import UserRegistrationSerializer
+from . import credentials
+from .authentication import TokenUser
+from .dashboard import build_dashboard
+from .models import User
+from .tokens import AccountRefreshToken
+from .user_cache import user_cache
+
+
+class DashboardAPITestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.instructor = User.objects.create_user('teacher', 'teacher@example.com', 'pass')
+        self.student = User.objects.create_user('student', 'student@example.com', 'pass')
+        category = Category.objects.create(name="Programming")
+        self.courses = [
+            Course.objects.create(
+                title=f"Course {i}", description="", instructor=self.instructor,
+                category=category, is_published=True,
+            )
+            for i in range(4)
+        ]
+        for course in self.courses:
+            Enrollment.objects.create(user=self.student, course=course)
+        Enrollment.objects.filter(course=self.courses[3]).update(status='completed', completion_date=timezone.now())
+
+        now = timezone.now()
+        for i, course in enumerate(self.courses[:2]):
+            Exam.objects.create(
+                title=f"Quiz {i}", course=course, exam_type='quiz',
+                start_date=now + timedelta(days=i + 1), end_date=now + timedelta(days=i + 2),
+            )
+        past = Exam.objects.create(
+            title="Midterm", course=self.courses[0], exam_type='midterm', passing_score=60,
+            start_date=now - timedelta(days=2), end_date=now - timedelta(days=1),
+        )
+        ExamAttempt.objects.create(exam=past, user=self.student, status='graded',
+                                   score=Decimal('75.00'), end_time=now)
+        ExamAttempt.objects.create(exam=past, user=self.student)
+
+    def test_bounded_queries(self):
+        with self.assertNumQueries(3):
+            payload = build_dashboard(self.student)
+        self.assertEqual([e['course']['title'] for e in payload['enrollments']],
+                         ['Course 2', 'Course 1', 'Course 0'])
+        self.assertEqual([e['course']['title'] for e in payload['completed_courses']], ['Course 3'])
+        self.assertEqual([exam['title'] for exam in payload['upcoming_exams']], ['Quiz 0', 'Quiz 1'])
+        self.assertEqual(len(payload['recent_results']), 1)
+        self.assertTrue(payload['recent_results'][0]['passed'])
+
+        # More courses do not add queries
+        Enrollment.objects.create(user=self.student, course=Course.objects.create(
+            title="Course 4", description="", instructor=self.instructor,
+            category=self.courses[0].category, is_published=True,
+        ))
+        with self.assertNumQueries(3):
+            build_dashboard(self.student)
+
+    def test_field_selection(self):
+        self.client.force_login(self.student)
+        response = self.client.get('/api/dashboard/', {'fields': 'completed_courses,recent_results'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {'completed_courses', 'recent_results'})
+
+        response = self.client.get('/api/dashboard/', {'fields': 'enrollments,grades'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_login(self):
+        self.assertIn(self.client.get('/api/dashboard/').status_code, (401, 403))
+
+    def test_query_budget(self):
+        self.client.force_login(self.student)
+        with self.assertMaxQueries(6):
+            self.client.get('/api/dashboard/')
+        with self.assertRaisesMessage(AssertionError, 'budget is 1'):
+            with self.assertMaxQueries(1):
+                self.client.get('/api/dashboard/')
+
+    @override_settings(QUERY_PROFILING_SAMPLE_RATE=1.0)
+    def test_profiling_headers_and_stats(self):
+        profiling.reset()
+        self.client.force_login(self.student)
+        response = self.client.get('/api/dashboard/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries, 0 duplicate", app;dur=')
+
+        # Staff only
+        self.assertEqual(self.client.get('/api/profiling/').status_code, 302)
+        self.student.is_staff = True
+        self.student.save()
+        stats = self.client.get('/api/profiling/').json()['views']
+        self.assertEqual(stats['api_dashboard']['requests'], 1)
+        self.assertEqual(stats['api_dashboard']['latency_ms']['histogram'][-1]['le'], None)
+
+    def test_fingerprint_collapses_lists(self):
+        self.assertEqual(
+            profiling.fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            profiling.fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'),
+        )
+
+
+class StatelessJWTAuthenticationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.student = User.objects.create_user('student', 'student@example.com', 'pass')
+        self.course = Course.objects.create(
+            title="Course", description="", instructor=self.student,
+            category=Category.objects.create(name="Programming"), is_published=True,
+        )
+        Enrollment.objects.create(user=self.student, course=self.course)
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccountRefreshToken.for_user(self.student).access_token}'}
+
+    def test_hot_endpoint_without_auth_queries(self):
+        url = f'/enrollments/statuses/?course_ids={self.course.id}'
+        # Only the enrollment status lookup; nothing loads the user
+        with self.assertNumQueries(1):
+            response = self.client.get(url, **self.auth)
+        self.assertEqual(response.json(), {str(self.course.id): {'is_enrolled': True, 'status': 'active'}})
+        with self.assertNumQueries(1):
+            self.client.get(url, **self.auth)
+
+    def test_lazy_hydration_and_invalidation(self):
+        user = TokenUser(self.student.pk, {'username': 'student', 'is_instructor': False, 'is_staff': False})
+        with self.assertNumQueries(0):
+            self.assertEqual((user.pk, user.username, user.is_authenticated), (self.student.pk, 'student', True))
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'student@example.com')
+        with self.assertNumQueries(0):
+            self.assertEqual(user_cache.get(self.student.pk).email, 'student@example.com')
+
+        self.student.email = 'new@example.com'
+        self.student.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(user_cache.get(self.student.pk).email, 'new@example.com')
+
+    def test_inactive_user_rejected(self):
+        active = user_cache.get(self.student.pk)
+        self.student.is_active = False
+        self.student.save()
+        # Still cached as active, as another worker would have it
+        user_cache.put(active)
+        response = self.client.get(f'/enrollments/check/{self.course.id}/', **self.auth)
+        self.assertEqual(response.status_code, 401)
+
+    def test_changed_user_loses_stale_claims(self):
+        self.student.is_staff = True
+        self.student.save()
+        staff_auth = {'HTTP_AUTHORIZATION': f'Bearer {AccountRefreshToken.for_user(self.student).access_token}'}
+        self.student.is_staff = False
+        self.student.save()
+        url = f'/enrollments/statuses/?course_ids={self.course.id}'
+        # The old token says staff; the marker sends it to the row
+        with self.assertNumQueries(2):
+            request = self.client.get(url, **staff_auth).wsgi_request
+        self.assertFalse(request.user.is_staff)
+        # Tokens issued after the change keep the query-free path
+        fresh_auth = {'HTTP_AUTHORIZATION': f'Bearer {AccountRefreshToken.for_user(self.student).access_token}'}
+        with self.assertNumQueries(1):
+            self.client.get(url, **fresh_auth)
+
+    def test_tokens_without_claims_still_work(self):
+        token = AccessToken.for_user(self.student)
+        response = self.client.get(f'/enrollments/check/{self.course.id}/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.json(), {'is_enrolled': True})
+
+    def test_obtain_pair_carries_claims(self):
+        response = self.client.post('/api/token/', {'username': 'student', 'password': 'pass'})
+        access = AccessToken(response.json()['access'])
+        self.assertEqual((access['username'], access['is_instructor']), ('student', False))
+
+
+class LoginTokenTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.student = User.objects.create_user('student', 'student@example.com', 'pass')
+
+    def login(self, password='pass'):
+        return self.client.post('/api/login/', {'username': 'student', 'password': password},
+                                content_type='application/json')
+
+    def test_login_issues_working_pair(self):
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        access = response.json()['access']
+        self.assertEqual(AccessToken(access)['username'], 'student')
+        self.assertEqual(self.client.get('/api/dashboard/', HTTP_AUTHORIZATION=f'Bearer {access}').status_code, 200)
+        self.assertEqual(self.login('wrong').status_code, 401)
+
+    def test_repeat_login_skips_hashing(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                'LOCATION': location}},
+            LOGIN_VERIFY_CACHE_TIMEOUT=60, LOGIN_VERIFY_SECRET='login-verify-test-secret',
+        ):
+            with mock.patch.object(credentials, 'authenticate', wraps=credentials.authenticate) as check:
+                self.assertEqual(self.login().status_code, 200)
+                # The repeat still reads the row: one query, no hash
+                with self.assertNumQueries(2):
+                    self.assertEqual(self.login().status_code, 200)
+                self.assertEqual(check.call_count, 1)
+                # Wrong passwords always take the full check
+                self.assertEqual(self.login('wrong').status_code, 401)
+                self.assertEqual(check.call_count, 2)
+
+            # A reset on another worker: no signal reaches this process
+            User.objects.filter(pk=self.student.pk).update(password=make_password('changed'))
+            self.assertEqual(self.login().status_code, 401)
+            self.assertEqual(self.login('changed').status_code, 200)
+
+    def test_login_cache_needs_shared_cache_and_own_secret(self):
+        with override_settings(LOGIN_VERIFY_CACHE_TIMEOUT=60, LOGIN_VERIFY_SECRET='login-verify-test-secret'):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'not shared'):
+                credentials.check_login_cache_settings()
+        with override_settings(LOGIN_VERIFY_CACHE_TIMEOUT=60):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'LOGIN_VERIFY_SECRET'):
+                credentials.check_login_cache_settings()
+        # Off by default: every login takes the full check
+        with mock.patch.object(credentials, 'authenticate', wraps=credentials.authenticate) as check:
+            self.login()
+            self.login()
+        self.assertEqual(check.call_count, 2)
+
+    def test_refresh_rotates_and_blacklists(self):
+        refresh = self.login().json()['refresh']
+        self.student.is_instructor = True
+        self.student.save()
+
+        response = self.client.post('/api/token/refresh/', {'refresh': refresh})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(AccessToken(response.json()['access'])['is_instructor'])
+        self.assertNotEqual(response.json()['refresh'], refresh)
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': refresh}).status_code, 401)
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000, PASSWORD_HASHERS=['accounts.hashers.TunedPBKDF2PasswordHasher'])
+class CredentialServiceTestCase(TestCase):
+    def test_registration_hashes_once(self):
+        serializer = UserRegistrationSerializer(data={
+            'username': 'newuser', 'email': 'new@example.com', 'password': 'pass-123-word', 'password2': 'pass-123-word',
+        })
+        self.assertTrue(serializer.is_valid())
+        with mock.patch.object(credentials, 'make_password', wraps=credentials.make_password) as make:
+            with self.assertNumQueries(1):
+                user = serializer.save()
+        self.assertEqual(make.call_count, 1)
+        self.assertTrue(user.check_password('pass-123-word'))
+
+    @override_settings(QUERY_PROFILING_SAMPLE_RATE=1.0)
+    async def test_async_register_view(self):
+        response = await self.async_client.post(
+            '/api/register/', {'username': 'async', 'email': 'async@example.com', 'password': 'pass-123-word'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        user = await User.objects.aget(username='async')
+        self.assertTrue(user.check_password('pass-123-word'))
+        # Profiling still sees the queries run from the async view
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries')
+
+    def test_register_sheds_load_when_pool_is_full(self):
+        with mock.patch.multiple(credentials, _pool=mock.Mock(), _slots=threading.Semaphore(0)):
+            response = self.client.post(
+                '/api/register/', {'username': 'late', 'email': 'late@example.com', 'password': 'pass-123-word'},
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(User.objects.filter(username='late').exists())
+
+    def test_change_password_checks_fresh_hash(self):
+        user = User.objects.create_user('student', 'student@example.com', 'old-pass')
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {AccountRefreshToken.for_user(user).access_token}'}
+        user_cache.clear()
+        user_cache.get(user.pk)
+        # Changed on another worker: this process's cached copy is stale
+        User.objects.filter(pk=user.pk).update(password=make_password('other-pass'))
+
+        response = self.client.post('/api/users/change-password/',
+                                    {'current_password': 'old-pass', 'new_password': 'new-pass-123'}, **auth)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/users/change-password/',
+                                    {'current_password': 'other-pass', 'new_password': 'new-pass-123'}, **auth)
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.check_password('new-pass-123'))
+
+    def test_outdated_hash_upgraded_on_login(self):
+        user = User.objects.create_user('student', 'student@example.com', 'pass')
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(authenticate(username='student', password='pass'), user)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
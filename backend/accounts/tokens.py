@@ -0,0 +1,92 @@
+# accounts/tokens.py
+"""
+JWTs carrying the user fields API views check most often.
+
+``StatelessJWTAuthentication`` answers ``request.user.username``,
+``is_instructor`` and ``is_staff`` from these claims without loading the
+user. The claims are stamped at login and again on every refresh.
+
+Changing a user bumps its auth version, a marker in the shared cache
+that outlives every access token issued before it. Each token carries
+the version it was issued under. A token with an outdated version is
+authenticated against a freshly loaded row instead of its claims, so
+a demotion or deactivation applies on the next request. Otherwise it
+applies within ACCESS_TOKEN_LIFETIME.
+"""
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .user_cache import user_cache
+
+USER_CLAIMS = ('username', 'is_instructor', 'is_staff')
+AUTH_VERSION_CLAIM = 'auth_version'
+
+
+def _auth_version_key(user_id):
+    return f'auth-version:{user_id}'
+
+
+def current_auth_version(user_id):
+    """The user's auth version, or None when unchanged for longer than any access token lives"""
+    return cache.get(_auth_version_key(user_id))
+
+
+def bump_auth_version(user_id):
+    # A fresh random value rather than incr(), so every bump restarts the
+    # timeout and concurrent bumps cannot collide with an older version
+    cache.set(_auth_version_key(user_id), uuid.uuid4().hex[:12],
+              api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+
+
+def load_active_user(user_id, fresh=False):
+    """
+    The user behind a token; rejects missing and inactive users.
+
+    ``fresh`` skips the user cache, for decisions about who may
+    authenticate at all.
+    """
+    try:
+        user = get_user_model().objects.get(pk=user_id) if fresh else user_cache.get(user_id)
+    except get_user_model().DoesNotExist:
+        raise AuthenticationFailed(_('User not found'), code='user_not_found')
+    if not user.is_active:
+        raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+    return user
+
+
+class AccountRefreshToken(RefreshToken):
+    """Refresh token whose access tokens carry USER_CLAIMS"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.stamp_claims(user)
+        return token
+
+    def stamp_claims(self, user):
+        for claim in USER_CLAIMS:
+            self[claim] = getattr(user, claim)
+        self[AUTH_VERSION_CLAIM] = current_auth_version(user.pk)
+
+
+class _RestampedRefreshToken(AccountRefreshToken):
+    def __init__(self, token=None, verify=True):
+        super().__init__(token, verify)
+        if token is not None:
+            self.stamp_claims(load_active_user(self[api_settings.USER_ID_CLAIM], fresh=True))
+
+
+class AccountTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = AccountRefreshToken
+
+
+class AccountTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh with current claims; inactive users cannot refresh"""
+    token_class = _RestampedRefreshToken
@@ -0,0 +1,64 @@
+# accounts/user_cache.py
+"""
+Small in-process LRU cache of User rows with a TTL.
+
+Used to hydrate the claims-only users built by
+``accounts.authentication.StatelessJWTAuthentication``. Saving or deleting
+a user drops its entry in this process (see ``accounts.signals``). Other
+processes see the change once their entry expires, after at most
+``USER_CACHE_TTL`` seconds.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+
+class UserCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def peek(self, user_id):
+        """The cached user, or None when missing or expired; never queries"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+        # Callers may change their copy; the cached row stays untouched
+        return copy.copy(user)
+
+    def get(self, user_id):
+        """The user with this id, loaded on a miss; raises DoesNotExist"""
+        user = self.peek(user_id)
+        if user is None:
+            user = get_user_model().objects.get(pk=user_id)
+            self.put(user)
+        return user
+
+    def put(self, user):
+        expires = time.monotonic() + getattr(settings, 'USER_CACHE_TTL', 300)
+        with self._lock:
+            self._entries[user.pk] = (copy.copy(user), expires)
+            self._entries.move_to_end(user.pk)
+            while len(self._entries) > getattr(settings, 'USER_CACHE_SIZE', 1024):
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
@@ -6,7 +6,13 @@ from django.contrib import messages
 from django.views.generic import ListView, DetailView, UpdateView, CreateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
 
+from exams.upcoming import get_upcoming_exams
+from .dashboard import build_dashboard, parse_fields
 from .models import User
 from .forms import UserRegistrationForm, UserProfileForm, UserLoginForm
 
@@ -71,18 +77,21 @@ class DashboardView(LoginRequiredMixin, ListView):
     context_object_name = 'enrolled_courses'
     
     def get_queryset(self):
-        return self.request.user.enrollments.filter(status='active')
+        return self.request.user.user_enrollments.filter(status='active').select_related('course')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
-        context['upcoming_exams'] = []
-        
-        for enrollment in user.enrollments.filter(status='active'):
-            exams = enrollment.course.exams.filter(is_active=True)
-            for exam in exams:
-                if exam.is_upcoming:
-                    context['upcoming_exams'].append(exam)
-        
-        context['completed_courses'] = user.enrollments.filter(status='completed')
-        return context
\ No newline at end of file
+        context['upcoming_exams'] = get_upcoming_exams(user)
+        context['completed_courses'] = user.user_enrollments.filter(status='completed').select_related('course')
+        return context
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard_api(request):
+    """Everything the dashboard shows in one response; ?fields= picks sections"""
+    try:
+        fields = parse_fields(request.query_params.get('fields'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(build_dashboard(request.user, fields))
@@ -0,0 +1,119 @@
+# courses/catalog.py
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .models import Course
+from .search import filter_courses
+
+# Columns needed to render a catalog card, fetched in one joined query
+CATALOG_FIELDS = (
+    'id', 'title', 'description', 'thumbnail', 'cover_image',
+    'instructor__username', 'category__name', 'difficulty', 'price',
+    'duration_in_weeks', 'created_at', 'updated_at', 'rating_avg', 'rating_count',
+)
+
+# Keyset sort orders: name -> (column, parser for the cursor value). Each is
+# descending with id as the tie-breaker and backed by an index on Course.
+CATALOG_SORTS = {
+    'newest': ('created_at', parse_datetime),
+    'rating': ('rating_avg', float),
+}
+
+# Matches Course.Meta.ordering
+CATALOG_ORDERING = ('-created_at', '-id')
+
+
+class InvalidCursor(ValueError):
+    """Raised when a catalog cursor cannot be decoded"""
+
+
+def catalog_ordering(sort='newest'):
+    column = CATALOG_SORTS[sort][0]
+    return (f'-{column}', '-id')
+
+
+def catalog_queryset(category=None, search=None, difficulty=None, min_rating=None, sort='newest'):
+    """Published courses matching the catalog filters, in ``sort`` order"""
+    queryset = Course.objects.filter(is_published=True)
+
+    if category:
+        queryset = queryset.filter(category__id=category)
+    if search:
+        queryset = filter_courses(queryset, search)
+    if difficulty:
+        queryset = queryset.filter(difficulty=difficulty)
+    if min_rating is not None:
+        queryset = queryset.filter(rating_avg__gte=min_rating)
+
+    return queryset.order_by(*catalog_ordering(sort))
+
+
+def encode_cursor(value, pk):
+    value = value.isoformat() if hasattr(value, 'isoformat') else repr(value)
+    return base64.urlsafe_b64encode(f"{value}|{pk}".encode()).decode()
+
+
+def decode_cursor(cursor, sort='newest'):
+    parse = CATALOG_SORTS[sort][1]
+    try:
+        value = base64.urlsafe_b64decode(cursor.encode()).decode()
+        value, pk = value.rsplit('|', 1)
+        value = parse(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise InvalidCursor(cursor)
+    if value is None:
+        raise InvalidCursor(cursor)
+    return value, pk
+
+
+def catalog_page(queryset, page_size, cursor=None, sort='newest'):
+    """
+    Return one page of catalog rows and the cursor for the next page.
+
+    Rows are plain dicts from a single ``values()`` query; the cursor seeks on
+    ``(sort column, id)`` so deep pages cost the same as the first one.
+    """
+    column = CATALOG_SORTS[sort][0]
+    if cursor:
+        value, pk = decode_cursor(cursor, sort)
+        queryset = queryset.filter(
+            Q(**{f'{column}__lt': value}) |
+            Q(**{column: value, 'id__lt': pk})
+        )
+
+    rows = list(queryset.values(*CATALOG_FIELDS)[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1][column], rows[-1]['id'])
+
+    return [serialize_catalog_row(row) for row in rows], next_cursor
+
+
+def _file_url(field_name, name):
+    if not name:
+        return None
+    return Course._meta.get_field(field_name).storage.url(name)
+
+
+def serialize_catalog_row(row):
+    return {
+        'id': row['id'],
+        'title': row['title'],
+        'description': row['description'],
+        'thumbnail': _file_url('thumbnail', row['thumbnail']),
+        'cover_image': _file_url('cover_image', row['cover_image']),
+        'instructor': row['instructor__username'],
+        'category': row['category__name'],
+        'difficulty': row['difficulty'],
+        'price': str(row['price']),
+        'duration_in_weeks': row['duration_in_weeks'],
+        'created_at': row['created_at'].isoformat(),
+        'updated_at': row['updated_at'].isoformat(),
+        'rating_avg': row['rating_avg'],
+        'rating_count': row['rating_count'],
+    }
@@ -0,0 +1,96 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from courses import search
+from courses.catalog import CATALOG_ORDERING
+from courses.models import Category, Course
+
+User = get_user_model()
+
+TOPICS = [
+    'python', 'django', 'react', 'semiconductor', 'physics', 'algebra', 'calculus',
+    'marketing', 'finance', 'design', 'photography', 'cooking', 'history', 'biology',
+    'chemistry', 'networking', 'security', 'statistics', 'writing', 'music',
+]
+FILLER = [
+    'learn', 'practical', 'introduction', 'advanced', 'project', 'hands', 'course',
+    'fundamentals', 'build', 'master', 'skills', 'guide', 'complete', 'beginner',
+    'theory', 'applied', 'modern', 'real', 'world', 'examples', 'workshop',
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare course search latency: icontains scan vs. the full-text index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        queries = ['python', 'semiconductor physics', 'photo', 'guide']
+        self.stdout.write(f"backend: {type(search.get_backend()).__name__}")
+        self.stdout.write(f"{'courses':>10} {'query':<22} {'icontains ms':>13} {'index ms':>9} {'ranked ms':>10}")
+
+        for size in options['sizes']:
+            # Everything is rolled back so the benchmark never touches real data
+            with transaction.atomic():
+                self._populate(size, rng)
+                for query in queries:
+                    scan = self._time(lambda: self._icontains_page(query), options['repeat'])
+                    indexed = self._time(lambda: self._indexed_page(query), options['repeat'])
+                    ranked = self._time(lambda: search.search_courses(query, limit=9), options['repeat'])
+                    self.stdout.write(f"{size:>10} {query:<22} {scan:>13.2f} {indexed:>9.2f} {ranked:>10.2f}")
+                transaction.set_rollback(True)
+
+    def _populate(self, size, rng):
+        instructor = User.objects.create_user('bench-instructor', 'bench@example.com', None)
+        categories = [Category.objects.create(name=f'Bench {i}') for i in range(5)]
+        difficulties = [choice for choice, _ in Course.DIFFICULTY_CHOICES]
+
+        batch = []
+        for i in range(size):
+            topic = rng.choice(TOPICS)
+            words = rng.choices(FILLER + TOPICS, k=40)
+            batch.append(Course(
+                title=f'{topic.title()} {rng.choice(FILLER)} {i}',
+                description=' '.join(words),
+                category=rng.choice(categories),
+                instructor=instructor,
+                difficulty=rng.choice(difficulties),
+                is_published=True,
+            ))
+            if len(batch) == 5000:
+                Course.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Course.objects.bulk_create(batch)
+        # bulk_create skips the post_save signals, so index in one pass
+        search.rebuild_index()
+
+    def _icontains_page(self, query):
+        return list(
+            Course.objects.filter(is_published=True)
+            .filter(Q(title__icontains=query) | Q(description__icontains=query))
+            .order_by(*CATALOG_ORDERING)
+            .values_list('id', flat=True)[:9]
+        )
+
+    def _indexed_page(self, query):
+        queryset = search.filter_courses(Course.objects.filter(is_published=True), query)
+        return list(queryset.order_by(*CATALOG_ORDERING).values_list('id', flat=True)[:9])
+
+    def _time(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
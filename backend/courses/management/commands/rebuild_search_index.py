@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from courses import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the course full-text search index from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        backend = type(search.get_backend()).__name__
+        total = search.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} courses with {backend}'))
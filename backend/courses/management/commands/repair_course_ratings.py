@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from courses.ratings import recompute_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized review aggregates on every course'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = recompute_ratings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Repaired rating aggregates on {fixed} courses'))
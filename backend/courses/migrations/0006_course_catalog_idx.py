@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_remove_progress_enrollment_remove_progress_completed_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['is_published', '-created_at', '-id'], name='course_catalog_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_course_catalog_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='courses.course')),
+            ],
+            options={
+                'unique_together': {('term', 'course')},
+            },
+        ),
+    ]
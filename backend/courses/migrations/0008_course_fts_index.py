@@ -0,0 +1,65 @@
+from collections import Counter
+
+from django.db import migrations
+
+from courses.search import TITLE_WEIGHT, tokenize
+
+
+FTS_TABLE = 'courses_course_fts'
+
+
+def build_inverted_index(apps, schema_editor):
+    # The same terms InvertedIndexBackend writes, from the historical models
+    Course = apps.get_model('courses', 'Course')
+    CourseSearchTerm = apps.get_model('courses', 'CourseSearchTerm')
+    db = schema_editor.connection.alias
+    terms = []
+    rows = Course.objects.using(db).order_by().values_list('id', 'title', 'description')
+    for course_id, title, description in rows.iterator(chunk_size=1000):
+        weights = Counter()
+        for token in tokenize(title):
+            weights[token] += TITLE_WEIGHT
+        for token in tokenize(description):
+            weights[token] += 1
+        terms.extend(
+            CourseSearchTerm(course_id=course_id, term=term, weight=weight)
+            for term, weight in weights.items()
+        )
+        if len(terms) >= 1000:
+            CourseSearchTerm.objects.using(db).bulk_create(terms)
+            terms = []
+    CourseSearchTerm.objects.using(db).bulk_create(terms)
+
+
+def create_fts_table(apps, schema_editor):
+    # Only SQLite gets the FTS5 table; other databases search CourseSearchTerm
+    if schema_editor.connection.vendor != 'sqlite':
+        build_inverted_index(apps, schema_editor)
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+        f"USING fts5(title, description, tokenize='unicode61')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, title, description) "
+        f"SELECT id, title, description FROM courses_course"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        CourseSearchTerm = apps.get_model('courses', 'CourseSearchTerm')
+        CourseSearchTerm.objects.using(schema_editor.connection.alias).all().delete()
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_coursesearchterm'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:25
+
+from django.db import migrations, models
+
+
+def backfill_ratings(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Review = apps.get_model('courses', 'Review')
+    totals = {}
+    for course_id, rating in Review.objects.values_list('course_id', 'rating').iterator():
+        totals.setdefault(course_id, []).append(rating)
+    for course_id, ratings in totals.items():
+        Course.objects.filter(pk=course_id).update(
+            rating_count=len(ratings),
+            rating_sum=sum(ratings),
+            rating_avg=sum(ratings) / len(ratings),
+            **{f'rating_{value}_count': ratings.count(value) for value in range(1, 6)},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_course_fts_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_avg',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['is_published', '-rating_avg', '-id'], name='course_rating_idx'),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:28
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_section_count(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Section = apps.get_model('courses', 'Section')
+    sections = (
+        Section.objects.filter(course=OuterRef('pk')).order_by()
+        .values('course').annotate(total=Count('id')).values('total')
+    )
+    Course.objects.update(section_count=Coalesce(Subquery(sections, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_course_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='section_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_section_count, migrations.RunPython.noop),
+    ]
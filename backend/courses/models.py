@@ -34,15 +34,49 @@ class Course(models.Model):
     cover_image = models.ImageField(upload_to='course_covers/', null=True, blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     
+    # Maintained by the Section signals in courses.signals
+    section_count = models.PositiveIntegerField(default=0)
+    
+    # Review aggregates, maintained incrementally by courses.ratings
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_avg = models.FloatField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Serve the catalog's keyset pagination on (created_at, id) and (rating_avg, id)
+            models.Index(fields=['is_published', '-created_at', '-id'], name='course_catalog_idx'),
+            models.Index(fields=['is_published', '-rating_avg', '-id'], name='course_rating_idx'),
+        ]
     
     def __str__(self):
         return self.title
     
+    @property
+    def rating_histogram(self):
+        return {rating: getattr(self, f'rating_{rating}_count') for rating in range(1, 6)}
+    
     def get_absolute_url(self):
         return reverse('courses:course_detail', kwargs={'course_id': self.id})
 
+class CourseSearchTerm(models.Model):
+    """Inverted index entry for course search on databases without FTS5"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=64)
+    weight = models.PositiveIntegerField(default=1)
+    
+    class Meta:
+        unique_together = ('term', 'course')
+    
+    def __str__(self):
+        return f"{self.term} -> {self.course_id}"
+
 # Define both Module and Section (with Module as an alias for Section)
 class Section(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='sections')
@@ -0,0 +1,122 @@
+# courses/outline.py
+from collections import namedtuple
+
+from django.db.models import Prefetch
+
+from .models import Course, Section, Lesson
+
+CourseOutline = namedtuple('CourseOutline', [
+    'id', 'title', 'description', 'thumbnail', 'cover_image', 'instructor',
+    'category', 'difficulty', 'price', 'duration_in_weeks', 'created_at',
+    'updated_at', 'avg_rating', 'review_count', 'sections',
+])
+SectionOutline = namedtuple('SectionOutline', ['id', 'title', 'description', 'order', 'lessons'])
+LessonOutline = namedtuple('LessonOutline', [
+    'id', 'title', 'content_type', 'order', 'text_content', 'video_url', 'file',
+])
+
+LESSON_FIELDS = ('id', 'section_id', 'title', 'content_type', 'order', 'text_content', 'video_url', 'file')
+
+
+def course_outline_queryset():
+    """
+    Courses with everything an outline needs, in three queries per course:
+    the course joined to instructor/category, all of its sections, and all
+    of their lessons.
+    """
+    lessons = Lesson.objects.only(*LESSON_FIELDS).order_by('order', 'id')
+    sections = Section.objects.order_by('order', 'id').prefetch_related(
+        Prefetch('lessons', queryset=lessons)
+    )
+    return (
+        Course.objects
+        .select_related('instructor', 'category')
+        .prefetch_related(Prefetch('sections', queryset=sections))
+    )
+
+
+def build_course_outline(course):
+    """Freeze a course from course_outline_queryset() into a CourseOutline"""
+    return CourseOutline(
+        id=course.id,
+        title=course.title,
+        description=course.description,
+        thumbnail=course.thumbnail.url if course.thumbnail else None,
+        cover_image=course.cover_image.url if course.cover_image else None,
+        instructor=course.instructor.username,
+        category=course.category.name,
+        difficulty=course.difficulty,
+        price=course.price,
+        duration_in_weeks=course.duration_in_weeks,
+        created_at=course.created_at,
+        updated_at=course.updated_at,
+        avg_rating=course.rating_avg,
+        review_count=course.rating_count,
+        sections=tuple(
+            SectionOutline(
+                id=section.id,
+                title=section.title,
+                description=section.description,
+                order=section.order,
+                lessons=tuple(
+                    LessonOutline(
+                        id=lesson.id,
+                        title=lesson.title,
+                        content_type=lesson.content_type,
+                        order=lesson.order,
+                        text_content=lesson.text_content,
+                        video_url=lesson.video_url,
+                        file=lesson.file.url if lesson.file else None,
+                    )
+                    for lesson in section.lessons.all()
+                ),
+            )
+            for section in course.sections.all()
+        ),
+    )
+
+
+def load_course_outline(course_id):
+    """Load and freeze one course outline; raises Course.DoesNotExist"""
+    return build_course_outline(course_outline_queryset().get(pk=course_id))
+
+
+def outline_as_dict(outline):
+    """JSON-ready representation of a CourseOutline"""
+    return {
+        'id': outline.id,
+        'title': outline.title,
+        'description': outline.description,
+        'thumbnail': outline.thumbnail,
+        'cover_image': outline.cover_image,
+        'instructor': outline.instructor,
+        'category': outline.category,
+        'difficulty': outline.difficulty,
+        'price': str(outline.price),
+        'duration_in_weeks': outline.duration_in_weeks,
+        'created_at': outline.created_at.isoformat(),
+        'updated_at': outline.updated_at.isoformat(),
+        'avg_rating': float(outline.avg_rating),
+        'review_count': outline.review_count,
+        'sections': [
+            {
+                'id': section.id,
+                'title': section.title,
+                'description': section.description,
+                'order': section.order,
+                'lessons': [
+                    {
+                        'id': lesson.id,
+                        'title': lesson.title,
+                        'order': lesson.order,
+                        'content_type': lesson.content_type,
+                        'content': lesson.text_content,
+                        'video_url': lesson.video_url,
+                        'file': lesson.file,
+                    }
+                    for lesson in section.lessons
+                ],
+            }
+            for section in outline.sections
+        ],
+    }
@@ -0,0 +1,95 @@
+# courses/outline_cache.py
+"""
+Versioned cache of serialized course outlines.
+
+The version is the course's ``updated_at`` column: the signals in
+``courses.signals`` move it whenever the course, its sections, lessons or
+reviews change, so every worker sees the new version on its next lookup and
+stale entries are simply never looked up again, aging out on their own.
+Only ``cache.get``/``set`` are used, which keeps this working on the locmem
+and file-based backends.
+"""
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from elearning_backend.routers import primary_reads
+from .models import Course
+from .outline import load_course_outline, outline_as_dict
+
+OUTLINE_CACHE_TIMEOUT = getattr(settings, 'COURSE_OUTLINE_CACHE_TIMEOUT', 60 * 60)
+
+
+class CachedOutline:
+    """Pre-rendered JSON for one course outline plus its validators"""
+
+    __slots__ = ('body', 'etag', 'last_modified')
+
+    def __init__(self, body, etag, last_modified):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class OutlineCacheStats:
+    """Process-local hit/miss counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+        }
+
+
+stats = OutlineCacheStats()
+
+
+def _entry_key(course_id, version):
+    return f'course-outline:{course_id}:{version.isoformat()}'
+
+
+def _current_version(course_id):
+    version = Course.objects.filter(pk=course_id).values_list('updated_at', flat=True).first()
+    if version is None:
+        raise Course.DoesNotExist(f'Course {course_id} does not exist')
+    return version
+
+
+def get_cached_outline(course_id):
+    """Return the CachedOutline for a course; raises Course.DoesNotExist"""
+    key = _entry_key(course_id, _current_version(course_id))
+    entry = cache.get(key)
+    stats.record(entry is not None)
+    if entry is not None:
+        return CachedOutline(*entry)
+
+    # Cached under the version just read, so never from a replica that may
+    # not have the change behind that version yet
+    with primary_reads():
+        outline = load_course_outline(course_id)
+    body = json.dumps(outline_as_dict(outline), cls=DjangoJSONEncoder).encode()
+    entry = CachedOutline(
+        body=body,
+        etag=f'"{hashlib.md5(body).hexdigest()}"',
+        last_modified=outline.updated_at.timestamp(),
+    )
+    cache.set(key, (entry.body, entry.etag, entry.last_modified), OUTLINE_CACHE_TIMEOUT)
+    return entry
@@ -0,0 +1,203 @@
+# courses/search.py
+"""
+Full-text search over courses.
+
+On SQLite the index is the ``courses_course_fts`` FTS5 table; on other
+databases it falls back to the ``CourseSearchTerm`` inverted index, tokenized
+in Python. Both are kept in sync by the signals in ``courses.signals``.
+"""
+import re
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.expressions import RawSQL
+
+from .models import Course, CourseSearchTerm
+
+FTS_TABLE = 'courses_course_fts'
+TITLE_WEIGHT = 10
+TERM_MAX_LENGTH = 64
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return [token[:TERM_MAX_LENGTH] for token in _TOKEN_RE.findall((text or '').lower())]
+
+
+class FTS5Backend:
+    """Search backed by SQLite's FTS5 extension, ranked with bm25"""
+
+    def index(self, rows):
+        rows = list(rows)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+                [(row[0],) for row in rows],
+            )
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)",
+                rows,
+            )
+
+    def remove(self, course_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+                [(course_id,) for course_id in course_ids],
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+    def _match_expression(self, tokens):
+        # Tokens are \w+ only, so quoting them cannot break the FTS5 syntax
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def filter(self, queryset, tokens):
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            (self._match_expression(tokens),),
+        ))
+
+    def ranked_ids(self, queryset, tokens, limit):
+        sql, params = queryset.order_by().values('id').query.sql_with_params()
+        # The unary + keeps SQLite from driving the FTS lookup row by row
+        # from the IN list, which turns a single MATCH into N of them.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND +rowid IN ({sql}) "
+                f"ORDER BY bm25({FTS_TABLE}, {TITLE_WEIGHT}.0, 1.0) LIMIT %s",
+                (self._match_expression(tokens), *params, limit),
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class InvertedIndexBackend:
+    """Portable search over the CourseSearchTerm table"""
+
+    def _terms(self, row):
+        course_id, title, description = row
+        weights = Counter()
+        for token in tokenize(title):
+            weights[token] += TITLE_WEIGHT
+        for token in tokenize(description):
+            weights[token] += 1
+        return [
+            CourseSearchTerm(course_id=course_id, term=term, weight=weight)
+            for term, weight in weights.items()
+        ]
+
+    def index(self, rows):
+        rows = list(rows)
+        CourseSearchTerm.objects.filter(course_id__in=[row[0] for row in rows]).delete()
+        CourseSearchTerm.objects.bulk_create(
+            [term for row in rows for term in self._terms(row)],
+            batch_size=1000,
+        )
+
+    def remove(self, course_ids):
+        CourseSearchTerm.objects.filter(course_id__in=course_ids).delete()
+
+    def clear(self):
+        CourseSearchTerm.objects.all().delete()
+
+    def filter(self, queryset, tokens):
+        # Every token has to prefix-match at least one indexed term
+        for token in tokens:
+            queryset = queryset.filter(id__in=CourseSearchTerm.objects.filter(
+                term__startswith=token).values('course_id'))
+        return queryset
+
+    def ranked_ids(self, queryset, tokens, limit):
+        any_token = Q()
+        for token in tokens:
+            any_token |= Q(term__startswith=token)
+        matches = self.filter(queryset, tokens).order_by().values('id')
+        return list(
+            CourseSearchTerm.objects.filter(any_token, course_id__in=matches)
+            .values('course_id')
+            .annotate(score=Sum('weight'))
+            .order_by('-score', '-course_id')
+            .values_list('course_id', flat=True)[:limit]
+        )
+
+
+def get_backend():
+    if connection.vendor == 'sqlite':
+        return FTS5Backend()
+    return InvertedIndexBackend()
+
+
+def index_courses(courses):
+    """Add or refresh the index entries for the given Course instances"""
+    get_backend().index((course.id, course.title, course.description) for course in courses)
+
+
+def remove_courses(course_ids):
+    get_backend().remove(course_ids)
+
+
+def rebuild_index(batch_size=1000):
+    """Re-index every course from scratch; returns the number indexed"""
+    backend = get_backend()
+    total = 0
+    with transaction.atomic():
+        backend.clear()
+        batch = []
+        rows = Course.objects.order_by().values_list('id', 'title', 'description')
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                backend.index(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            backend.index(batch)
+            total += len(batch)
+    return total
+
+
+def filter_courses(queryset, query):
+    """Restrict a Course queryset to those matching every word of ``query``"""
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset.none()
+    return get_backend().filter(queryset, tokens)
+
+
+def search_courses(query, category=None, difficulty=None, limit=20):
+    """
+    Ranked search over published courses.
+
+    Returns ``(course_ids, facets)``: ids best match first, narrowed by the
+    category/difficulty filters, and per-category and per-difficulty counts
+    for every published course matching the text alone.
+    """
+    facets = {'category': {}, 'difficulty': {}}
+    tokens = tokenize(query)
+    if not tokens:
+        return [], facets
+
+    backend = get_backend()
+    matched = backend.filter(Course.objects.filter(is_published=True), tokens)
+
+    groups = (
+        matched.order_by()
+        .values('category_id', 'difficulty')
+        .annotate(total=Count('id'))
+    )
+    for group in groups:
+        for facet, key in (('category', group['category_id']), ('difficulty', group['difficulty'])):
+            facets[facet][key] = facets[facet].get(key, 0) + group['total']
+
+    queryset = Course.objects.filter(is_published=True)
+    if category:
+        queryset = queryset.filter(category__id=category)
+    if difficulty:
+        queryset = queryset.filter(difficulty=difficulty)
+
+    return backend.ranked_ids(queryset, tokens, limit), facets
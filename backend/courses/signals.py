@@ -0,0 +1,80 @@
+# courses/signals.py
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import ratings, search
+from .models import Course, Section, Lesson, Review
+
+
+@receiver(post_save, sender=Course)
+def index_course(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_courses([instance])
+
+
+@receiver(post_delete, sender=Course)
+def unindex_course(sender, instance, **kwargs):
+    search.remove_courses([instance.pk])
+
+
+# Models whose deletion cascades to the sender. Their own post_delete
+# handlers cover the course, so the cascaded rows need not each touch it.
+PARENTS = {
+    Review: (Course,),
+    Section: (Course,),
+    Lesson: (Course, Section),
+}
+
+
+def _cascaded(sender, origin):
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in PARENTS.get(sender, ())
+
+
+def _touch_course(course_id):
+    # Content changes count as a course change, so Last-Modified and the
+    # outline cache version (both updated_at) move too
+    Course.objects.filter(pk=course_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_course_content(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or (origin is not None and _cascaded(sender, origin)):
+        return
+    if sender is Lesson:
+        if Lesson.section.is_cached(instance):
+            course_id = instance.section.course_id
+        else:
+            course_id = Section.objects.filter(pk=instance.section_id).values_list('course_id', flat=True).first()
+    else:
+        course_id = instance.course_id
+    _touch_course(course_id)
+
+
+@receiver(post_delete, sender=Review)
+def uncount_review(sender, instance, origin=None, **kwargs):
+    if origin is not None and _cascaded(Review, origin):
+        return
+    ratings.forget_rating(instance.course_id, instance.rating)
+
+
+@receiver(post_save, sender=Section)
+def count_section(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Course.objects.filter(pk=instance.course_id).update(section_count=F('section_count') + 1)
+
+
+@receiver(post_delete, sender=Section)
+def uncount_section(sender, instance, origin=None, **kwargs):
+    if origin is not None and _cascaded(Section, origin):
+        return
+    Course.objects.filter(pk=instance.course_id, section_count__gt=0).update(
+        section_count=F('section_count') - 1)
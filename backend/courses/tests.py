@@ -1,11 +1,30 @@
-from django.test import TestCase
+import importlib
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
-from .models import Category, Course, Section, Lesson, Enrollment
+from .models import Category, Course, CourseSearchTerm, Section, Lesson, Review
+from .outline import load_course_outline
+from .ratings import recompute_ratings
+from .search import InvertedIndexBackend, search_courses
+from elearning_backend.routers import (
+    PIN_COOKIE, ReplicaPinningMiddleware, ReplicaRouter, primary_reads, use_read_replica,
+)
+from enrollments.models import Enrollment
 
 class CoursesAPITestCase(TestCase):
     def setUp(self):
@@ -87,4 +106,364 @@ class CoursesAPITestCase(TestCase):
             'category': self.category.id
         }
         response = self.client.post(reverse('course-list'), data)
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class CourseCatalogJSONTestCase(TestCase):
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            'teacher', 'teacher@example.com', 'teacherpass')
+        self.category = Category.objects.create(name="Programming")
+        self.courses = [
+            Course.objects.create(
+                title=f"Course {i}",
+                description="Catalog course",
+                instructor=self.instructor,
+                category=self.category,
+                is_published=True,
+            )
+            for i in range(12)
+        ]
+        Course.objects.create(
+            title="Draft",
+            description="Not published",
+            instructor=self.instructor,
+            category=self.category,
+        )
+
+    def get_json(self, url, **params):
+        return self.client.get(url, params, HTTP_ACCEPT='application/json')
+
+    def test_json_list_is_paginated_with_cursor(self):
+        with self.assertNumQueries(1):
+            response = self.get_json('/courses/')
+        self.assertEqual(response.status_code, 200)
+        first_page = response.json()
+        self.assertEqual(len(first_page['results']), 9)
+        self.assertEqual(first_page['results'][0]['instructor'], 'teacher')
+        self.assertEqual(first_page['results'][0]['category'], 'Programming')
+        self.assertIsNotNone(first_page['next'])
+
+        response = self.client.get(first_page['next'], HTTP_ACCEPT='application/json')
+        second_page = response.json()
+        self.assertEqual(len(second_page['results']), 3)
+        self.assertIsNone(second_page['next'])
+
+        ids = [row['id'] for row in first_page['results'] + second_page['results']]
+        expected = sorted((c.id for c in self.courses), reverse=True)
+        self.assertEqual(ids, expected)
+
+    def test_invalid_cursor(self):
+        response = self.get_json('/courses/', cursor='not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+
+
+class CourseSearchTestCase(TestCase):
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            'teacher', 'teacher@example.com', 'teacherpass')
+        self.programming = Category.objects.create(name="Programming")
+        self.science = Category.objects.create(name="Science")
+        self.python = Course.objects.create(
+            title="Python for Beginners",
+            description="Variables, loops and functions",
+            instructor=self.instructor,
+            category=self.programming,
+            is_published=True,
+        )
+        self.physics = Course.objects.create(
+            title="Semiconductor Physics",
+            description="Band theory with python simulations",
+            instructor=self.instructor,
+            category=self.science,
+            difficulty='advanced',
+            is_published=True,
+        )
+
+    def test_ranked_prefix_search_with_facets(self):
+        course_ids, facets = search_courses('pyth')
+        self.assertEqual(course_ids, [self.python.id, self.physics.id])
+        self.assertEqual(facets['category'], {self.programming.id: 1, self.science.id: 1})
+        self.assertEqual(facets['difficulty'], {'beginner': 1, 'advanced': 1})
+
+        course_ids, _ = search_courses('python', difficulty='advanced')
+        self.assertEqual(course_ids, [self.physics.id])
+
+    def test_search_limit_is_clamped(self):
+        for limit in (0, -3):
+            response = self.client.get('/courses/search/', {'q': 'python', 'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['results']), 1)
+
+    def test_index_follows_saves_and_deletes(self):
+        self.python.title = "Rust for Beginners"
+        self.python.save()
+        self.assertEqual(search_courses('rust')[0], [self.python.id])
+
+        self.physics.delete()
+        self.assertEqual(search_courses('semiconductor')[0], [])
+
+    def test_inverted_index_backend(self):
+        backend = InvertedIndexBackend()
+        backend.index([
+            (self.python.id, self.python.title, self.python.description),
+            (self.physics.id, self.physics.title, self.physics.description),
+        ])
+        published = Course.objects.filter(is_published=True)
+        self.assertEqual(
+            backend.ranked_ids(published, ['pyth'], 10),
+            [self.python.id, self.physics.id],
+        )
+        self.assertEqual(
+            list(backend.filter(published, ['band', 'pyth']).values_list('id', flat=True)),
+            [self.physics.id],
+        )
+
+    def test_migration_builds_inverted_index_off_sqlite(self):
+        migration = importlib.import_module('courses.migrations.0008_course_fts_index')
+        editor = mock.Mock()
+        editor.connection.vendor = 'postgresql'
+        editor.connection.alias = 'default'
+
+        def index():
+            return sorted(CourseSearchTerm.objects.values_list('course_id', 'term', 'weight'))
+
+        InvertedIndexBackend().index([
+            (course.id, course.title, course.description) for course in (self.python, self.physics)])
+        expected = index()
+        CourseSearchTerm.objects.all().delete()
+
+        migration.create_fts_table(apps, editor)
+        self.assertEqual(index(), expected)
+        migration.drop_fts_table(apps, editor)
+        self.assertEqual(index(), [])
+        editor.execute.assert_not_called()
+
+
+class CourseOutlineTestCase(TestCase):
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            'teacher', 'teacher@example.com', 'teacherpass')
+        self.course = Course.objects.create(
+            title="Python for Beginners",
+            description="Learn Python basics",
+            instructor=self.instructor,
+            category=Category.objects.create(name="Programming"),
+            is_published=True,
+        )
+        for section_order in range(3):
+            section = Section.objects.create(
+                course=self.course, title=f"Section {section_order}", order=section_order)
+            for lesson_order in range(5):
+                Lesson.objects.create(
+                    section=section,
+                    title=f"Lesson {section_order}.{lesson_order}",
+                    content_type="text",
+                    text_content="Hello",
+                    order=lesson_order,
+                )
+        cache.clear()
+
+    def test_outline_loads_in_fixed_queries(self):
+        with self.assertNumQueries(3):
+            outline = load_course_outline(self.course.id)
+        self.assertEqual(len(outline.sections), 3)
+        self.assertEqual([len(section.lessons) for section in outline.sections], [5, 5, 5])
+        self.assertEqual(outline.sections[1].lessons[2].title, "Lesson 1.2")
+
+    def get_json(self, **headers):
+        return self.client.get(
+            f'/courses/{self.course.id}/', HTTP_ACCEPT='application/json', **headers)
+
+    def test_json_detail_uses_outline(self):
+        # The cache version, then the outline's three
+        with self.assertNumQueries(4):
+            response = self.get_json()
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['instructor'], 'teacher')
+        self.assertEqual(data['sections'][0]['lessons'][0]['content'], "Hello")
+
+    def test_json_detail_is_cached_and_conditional(self):
+        first = self.get_json()
+        # Only the version lookup
+        with self.assertNumQueries(1):
+            second = self.get_json()
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertIn('Last-Modified', second)
+
+        not_modified = self.get_json(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        lesson = Lesson.objects.get(title="Lesson 0.0")
+        lesson.title = "Renamed"
+        lesson.save()
+        changed = self.get_json(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['sections'][0]['lessons'][0]['title'], "Renamed")
+
+    def test_reviews_move_last_modified(self):
+        Course.objects.filter(pk=self.course.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        first = self.get_json()
+        self.assertEqual(self.get_json(HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+        Review.objects.create(course=self.course, user=self.instructor, rating=5, comment="Great")
+        changed = self.get_json(HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['Last-Modified'], first['Last-Modified'])
+
+    def test_version_lives_in_the_database(self):
+        first = self.get_json()
+        # A change made by another worker: no signal or cache delete here
+        Course.objects.filter(pk=self.course.pk).update(
+            title="Renamed", updated_at=timezone.now() + timedelta(seconds=1))
+        changed = self.get_json(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['title'], "Renamed")
+
+    def test_cascade_delete_touches_the_course_once(self):
+        section = Section.objects.filter(course=self.course).first()
+        with CaptureQueriesContext(connection) as queries:
+            section.delete()
+        course_updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE "courses_course"')]
+        # updated_at and section_count, not one per lesson
+        self.assertEqual(len(course_updates), 2)
+        self.assertEqual(Course.objects.get(pk=self.course.pk).section_count, 2)
+
+    def test_file_based_cache_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            backend = {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }
+            with self.settings(CACHES={'default': backend}):
+                first = self.get_json()
+                with self.assertNumQueries(1):
+                    second = self.get_json()
+                self.assertEqual(first.content, second.content)
+
+    def test_missing_course_is_404(self):
+        response = self.client.get('/courses/999999/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 404)
+
+
+class CourseRatingTestCase(TestCase):
+    def setUp(self):
+        self.instructor = User.objects.create_user(
+            'teacher', 'teacher@example.com', 'teacherpass')
+        self.category = Category.objects.create(name="Programming")
+        self.course = Course.objects.create(
+            title="Python for Beginners",
+            description="Learn Python basics",
+            instructor=self.instructor,
+            category=self.category,
+            is_published=True,
+        )
+        self.students = []
+        for i in range(2):
+            student = User.objects.create_user(f'student{i}', f'student{i}@example.com', 'studentpass')
+            Enrollment.objects.create(user=student, course=self.course)
+            self.students.append(student)
+
+    def review(self, student, rating):
+        self.client.force_login(student)
+        response = self.client.post(
+            f'/courses/{self.course.id}/review/', {'rating': rating, 'comment': 'Nice'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_create_review_updates_aggregates(self):
+        self.review(self.students[0], 5)
+        self.review(self.students[1], 2)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.rating_count, 2)
+        self.assertEqual(self.course.rating_sum, 7)
+        self.assertEqual(self.course.rating_avg, 3.5)
+
+        # Editing a review moves it between histogram buckets
+        self.review(self.students[1], 4)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.rating_count, 2)
+        self.assertEqual(self.course.rating_avg, 4.5)
+        self.assertEqual(self.course.rating_histogram, {1: 0, 2: 0, 3: 0, 4: 1, 5: 1})
+
+    def test_deleting_a_review_updates_aggregates(self):
+        self.review(self.students[0], 5)
+        self.review(self.students[1], 2)
+        Review.objects.get(user=self.students[0]).delete()
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.rating_count, self.course.rating_sum, self.course.rating_avg), (1, 2, 2.0))
+        self.assertEqual(self.course.rating_histogram, {1: 0, 2: 1, 3: 0, 4: 0, 5: 0})
+
+        # Deleting the reviewer's account drops the last one too
+        self.students[1].delete()
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.rating_count, self.course.rating_sum, self.course.rating_avg), (0, 0, 0.0))
+        self.assertEqual(recompute_ratings(), 0)
+
+    def test_recompute_repairs_drift(self):
+        Review.objects.create(course=self.course, user=self.students[0], rating=3, comment='Ok')
+        self.assertEqual(recompute_ratings(), 1)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.rating_count, 1)
+        self.assertEqual(self.course.rating_3_count, 1)
+        self.assertEqual(recompute_ratings(), 0)
+
+    def test_catalog_sort_and_min_rating(self):
+        other = Course.objects.create(
+            title="Rust", description="Systems", instructor=self.instructor,
+            category=self.category, is_published=True)
+        Course.objects.filter(pk=self.course.pk).update(rating_avg=4.5, rating_count=2)
+        Course.objects.filter(pk=other.pk).update(rating_avg=3.0, rating_count=1)
+
+        response = self.client.get('/courses/', {'sort': 'rating'}, HTTP_ACCEPT='application/json')
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.course.id, other.id])
+
+        response = self.client.get('/courses/', {'min_rating': 4}, HTTP_ACCEPT='application/json')
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.course.id])
+
+
+@override_settings(READ_REPLICAS=['replica1'])
+class ReplicaRoutingTestCase(SimpleTestCase):
+    def route(self, request, write=False, model=Course, primary=False):
+        """Run a replica-enabled view through the pinning middleware; returns (read alias, response)"""
+        router = ReplicaRouter()
+        seen = []
+
+        @use_read_replica
+        def view(request):
+            if write:
+                router.db_for_write(Enrollment)
+            if primary:
+                with primary_reads():
+                    seen.append(router.db_for_read(model))
+            else:
+                seen.append(router.db_for_read(model))
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(view)(request)
+        return seen[0], response
+
+    def test_reads_go_to_replica(self):
+        alias, response = self.route(RequestFactory().get('/courses/'))
+        self.assertEqual(alias, 'replica1')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        # Outside opted-in views, and for sessions, reads stay on the primary
+        self.assertEqual(ReplicaRouter().db_for_read(Course), 'default')
+        self.assertEqual(self.route(RequestFactory().get('/courses/'), model=Session)[0], 'default')
+
+    def test_cache_rebuilds_read_the_primary(self):
+        alias, response = self.route(RequestFactory().get('/courses/'), primary=True)
+        self.assertEqual(alias, 'default')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_writes_pin_to_primary(self):
+        self.assertEqual(self.route(RequestFactory().post('/courses/'))[0], 'default')
+
+        alias, response = self.route(RequestFactory().get('/courses/'), write=True)
+        self.assertEqual(alias, 'default')
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        request = RequestFactory().get('/courses/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.assertEqual(self.route(request)[0], 'default')
@@ -6,6 +6,8 @@ app_name = 'courses'
 
 urlpatterns = [
     path('', views.CourseListView.as_view(), name='course_list'),
+    path('search/', views.course_search, name='course_search'),
+    path('outline-cache/metrics/', views.outline_cache_metrics, name='outline_cache_metrics'),
     path('<int:course_id>/', views.CourseDetailView.as_view(), name='course_detail'),
     path('<int:course_id>/review/', views.create_review, name='create_review'),
     path('section/<int:section_id>/', views.SectionDetailView.as_view(), name='section_detail'),
@@ -6,38 +6,56 @@ from django.urls import reverse_lazy
 from django.contrib import messages
 from django.db.models import Q, Avg
 from django.conf import settings
-from django.db import models
-from django.http import JsonResponse
+from django.db import models, transaction
+from django.http import Http404, HttpResponse, JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.views.decorators.csrf import csrf_exempt
 
 from .models import Course, Category, Section, Lesson, Review
+from .catalog import CATALOG_FIELDS, CATALOG_SORTS, InvalidCursor, catalog_page, catalog_queryset, serialize_catalog_row
+from .outline import build_course_outline, course_outline_queryset
+from .outline_cache import get_cached_outline, stats as outline_cache_stats
+from .ratings import record_rating
+from .search import search_courses
 from .forms import CourseForm, ModuleForm, ContentForm, ReviewForm
 from accounts.models import User
-from enrollments.models import Enrollment, Progress
+from elearning_backend.routers import ReadReplicaMixin, use_read_replica
+from enrollments.models import Enrollment
+from enrollments.progress import record_lesson_view
 
-class CourseListView(ListView):
+
+def wants_json(request):
+    return request.headers.get('Accept') == 'application/json' or request.path.startswith('/api/')
+
+class CourseListView(ReadReplicaMixin, ListView):
     model = Course
     template_name = 'courses/course_list.html'
     context_object_name = 'courses'
     paginate_by = 9
     
+    def get_sort(self):
+        sort = self.request.GET.get('sort')
+        return sort if sort in CATALOG_SORTS else 'newest'
+    
+    def get_min_rating(self):
+        try:
+            return float(self.request.GET['min_rating'])
+        except (KeyError, ValueError):
+            return None
+    
+    def get_catalog_queryset(self):
+        return catalog_queryset(
+            category=self.request.GET.get('category'),
+            search=self.request.GET.get('search'),
+            difficulty=self.request.GET.get('difficulty'),
+            min_rating=self.get_min_rating(),
+            sort=self.get_sort(),
+        )
+    
     def get_queryset(self):
-        queryset = Course.objects.filter(is_published=True)
-        category = self.request.GET.get('category')
-        search = self.request.GET.get('search')
-        difficulty = self.request.GET.get('difficulty')
-        
-        if category:
-            queryset = queryset.filter(category__id=category)
-        if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) | 
-                Q(description__icontains=search)
-            )
-        if difficulty:
-            queryset = queryset.filter(difficulty=difficulty)
-            
-        return queryset
+        return self.get_catalog_queryset().select_related('instructor', 'category')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -45,44 +63,105 @@ class CourseListView(ListView):
         context['selected_category'] = self.request.GET.get('category', '')
         context['search_query'] = self.request.GET.get('search', '')
         context['selected_difficulty'] = self.request.GET.get('difficulty', '')
+        context['selected_sort'] = self.get_sort()
+        context['min_rating'] = self.get_min_rating()
         return context
 
-    def render_to_response(self, context, **response_kwargs):
-        if self.request.headers.get('Accept') == 'application/json' or self.request.path.startswith('/api/'):
-            courses = self.get_queryset()
-            data = []
-            for course in courses:
-                data.append({
-                    'id': course.id,
-                    'title': course.title,
-                    'description': course.description,
-                    'thumbnail': course.thumbnail.url if course.thumbnail else None,
-                    'cover_image': course.cover_image.url if course.cover_image else None,
-                    'instructor': course.instructor.username,
-                    'category': course.category.name,
-                    'difficulty': course.difficulty,
-                    'price': str(course.price),
-                    'duration_in_weeks': course.duration_in_weeks,
-                    'created_at': course.created_at.isoformat(),
-                    'updated_at': course.updated_at.isoformat(),
-                })
-            return JsonResponse(data, safe=False)
-        return super().render_to_response(context, **response_kwargs)
-
-class CourseDetailView(DetailView):
+    def get(self, request, *args, **kwargs):
+        # JSON clients get a keyset-paginated page straight from the catalog
+        # query, skipping the ListView COUNT/OFFSET pagination entirely.
+        if wants_json(request):
+            return self.render_json_page()
+        return super().get(request, *args, **kwargs)
+
+    def get_json_page_size(self):
+        if self.request.path.startswith('/api/'):
+            return settings.REST_FRAMEWORK['PAGE_SIZE']
+        return self.paginate_by
+
+    def render_json_page(self):
+        try:
+            results, next_cursor = catalog_page(
+                self.get_catalog_queryset(),
+                self.get_json_page_size(),
+                cursor=self.request.GET.get('cursor'),
+                sort=self.get_sort(),
+            )
+        except InvalidCursor:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+        next_url = None
+        if next_cursor:
+            params = self.request.GET.copy()
+            params['cursor'] = next_cursor
+            next_url = self.request.build_absolute_uri(
+                f"{self.request.path}?{params.urlencode()}")
+
+        return JsonResponse({'next': next_url, 'results': results})
+
+@use_read_replica
+def course_search(request):
+    """Ranked course search with category and difficulty facets"""
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), 100))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit'}, status=400)
+
+    course_ids, facets = search_courses(
+        request.GET.get('q', ''),
+        category=request.GET.get('category'),
+        difficulty=request.GET.get('difficulty'),
+        limit=limit,
+    )
+    rows = {
+        row['id']: row
+        for row in Course.objects.filter(id__in=course_ids).values(*CATALOG_FIELDS)
+    }
+    return JsonResponse({
+        'results': [serialize_catalog_row(rows[course_id]) for course_id in course_ids if course_id in rows],
+        'facets': facets,
+    })
+
+class CourseDetailView(ReadReplicaMixin, DetailView):
     model = Course
     template_name = 'courses/course_detail.html'
     context_object_name = 'course'
     pk_url_kwarg = 'course_id'
     
+    def get_queryset(self):
+        return course_outline_queryset()
+    
+    def get(self, request, *args, **kwargs):
+        if wants_json(request):
+            return self.render_cached_outline()
+        return super().get(request, *args, **kwargs)
+    
+    def render_cached_outline(self):
+        try:
+            entry = get_cached_outline(self.kwargs[self.pk_url_kwarg])
+        except Course.DoesNotExist:
+            raise Http404("No course found matching the query")
+        
+        response = HttpResponse(entry.body, content_type='application/json')
+        response['ETag'] = entry.etag
+        response['Last-Modified'] = http_date(entry.last_modified)
+        return get_conditional_response(
+            self.request,
+            etag=entry.etag,
+            last_modified=int(entry.last_modified),
+            response=response,
+        )
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        course = self.get_object()
+        course = self.object
         user = self.request.user
+        outline = build_course_outline(course)
         
-        context['sections'] = course.sections.all()
-        context['reviews'] = course.reviews.all()
-        context['avg_rating'] = course.reviews.aggregate(Avg('rating'))['rating__avg'] or 0
+        context['outline'] = outline
+        context['sections'] = outline.sections
+        context['reviews'] = course.reviews.select_related('user')
+        context['avg_rating'] = outline.avg_rating
         
         if user.is_authenticated:
             context['is_enrolled'] = Enrollment.objects.filter(
@@ -92,45 +171,9 @@ class CourseDetailView(DetailView):
         
         return context
 
-    def render_to_response(self, context, **response_kwargs):
-        if self.request.headers.get('Accept') == 'application/json' or self.request.path.startswith('/api/'):
-            course = self.get_object()
-            data = {
-                'id': course.id,
-                'title': course.title,
-                'description': course.description,
-                'thumbnail': course.thumbnail.url if course.thumbnail else None,
-                'cover_image': course.cover_image.url if course.cover_image else None,
-                'instructor': course.instructor.username,
-                'category': course.category.name,
-                'difficulty': course.difficulty,
-                'price': str(course.price),
-                'duration_in_weeks': course.duration_in_weeks,
-                'created_at': course.created_at.isoformat(),
-                'updated_at': course.updated_at.isoformat(),
-                'sections': [
-                    {
-                        'id': section.id,
-                        'title': section.title,
-                        'description': section.description,
-                        'order': section.order,
-                        'lessons': [
-                            {
-                                'id': lesson.id,
-                                'title': lesson.title,
-                                'description': lesson.description,
-                                'order': lesson.order,
-                                'content_type': lesson.content_type,
-                                'content': lesson.content
-                            }
-                            for lesson in section.lessons.all()
-                        ]
-                    }
-                    for section in course.sections.all()
-                ]
-            }
-            return JsonResponse(data)
-        return super().render_to_response(context, **response_kwargs)
+@staff_member_required
+def outline_cache_metrics(request):
+    return JsonResponse(outline_cache_stats.as_dict())
 
 @login_required
 def create_review(request, course_id):
@@ -147,10 +190,17 @@ def create_review(request, course_id):
     if request.method == 'POST':
         form = ReviewForm(request.POST, instance=existing_review)
         if form.is_valid():
-            review = form.save(commit=False)
-            review.user = request.user
-            review.course = course
-            review.save()
+            with transaction.atomic():
+                previous_rating = None
+                if existing_review:
+                    # The form already wrote the new rating onto the instance
+                    previous_rating = Review.objects.select_for_update().values_list(
+                        'rating', flat=True).get(pk=existing_review.pk)
+                review = form.save(commit=False)
+                review.user = request.user
+                review.course = course
+                review.save()
+                record_rating(course.id, review.rating, previous_rating)
             messages.success(request, "Your review has been submitted successfully.")
             return redirect('courses:course_detail', course_id=course_id)
     else:
@@ -213,11 +263,8 @@ class LessonDetailView(LoginRequiredMixin, DetailView):
         context['section'] = section
         context['course'] = course
         
-        # Mark section as completed
-        progress, created = Progress.objects.get_or_create(
-            enrollment=enrollment,
-            section=section
-        )
+        # Record the visit on the section's progress row (single upsert)
+        record_lesson_view(enrollment, lesson)
         
         # Navigation
         lessons = list(section.lessons.all())
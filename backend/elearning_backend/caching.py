@@ -0,0 +1,34 @@
+# elearning_backend/caching.py
+"""
+Guards for caches that are invalidated by deleting keys.
+
+A delete on a per-process backend (LocMemCache, DummyCache) only reaches
+the worker that ran it; every other worker keeps serving its own copy
+until the timeout. Caches kept correct that way are therefore off unless
+their timeout setting is positive *and* the default cache is shared
+between workers (``CACHE_BACKEND``, see settings). ``check_shared_cache``
+refuses to start with such a timeout set on a per-process backend.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared():
+    return settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+def shared_cache_timeout(setting):
+    """The timeout in ``setting`` when the cache may be used, else 0"""
+    timeout = getattr(settings, setting, 0)
+    return timeout if timeout > 0 and cache_is_shared() else 0
+
+
+def check_shared_cache(*setting_names):
+    for name in setting_names:
+        if getattr(settings, name, 0) > 0 and not cache_is_shared():
+            raise ImproperlyConfigured(f'{name} is set but the default cache is not shared between workers')
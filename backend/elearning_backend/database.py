@@ -0,0 +1,65 @@
+# elearning_backend/database.py
+"""
+DATABASES entries built from environment variables.
+
+``DB_ENGINE=postgresql`` selects PostgreSQL. It keeps persistent connections
+(``DB_CONN_MAX_AGE`` seconds) and checks them before reuse. On Django 5.1+,
+setting ``DB_POOL_MAX_SIZE`` switches to psycopg's connection pool instead;
+on older Django put PgBouncer in front. Anything else selects SQLite,
+tuned for concurrent writers through
+``elearning_backend.db_backends.sqlite3``.
+"""
+import os
+
+import django
+from django.core.exceptions import ImproperlyConfigured
+
+
+def _env(prefix, name, default=None):
+    return os.environ.get(f'{prefix}{name}', default)
+
+
+def _postgresql(prefix):
+    config = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': _env(prefix, 'NAME', 'elearning'),
+        'USER': _env(prefix, 'USER', ''),
+        'PASSWORD': _env(prefix, 'PASSWORD', ''),
+        'HOST': _env(prefix, 'HOST', 'localhost'),
+        'PORT': _env(prefix, 'PORT', '5432'),
+        'CONN_MAX_AGE': int(_env(prefix, 'CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'connect_timeout': int(_env(prefix, 'CONNECT_TIMEOUT', '5'))},
+    }
+    pool_size = _env(prefix, 'POOL_MAX_SIZE')
+    if pool_size:
+        if django.VERSION < (5, 1):
+            raise ImproperlyConfigured(f'{prefix}POOL_MAX_SIZE needs Django 5.1+; use PgBouncer instead')
+        # Pooled connections replace persistent ones
+        config['CONN_MAX_AGE'] = 0
+        config['OPTIONS']['pool'] = {
+            'min_size': int(_env(prefix, 'POOL_MIN_SIZE', '2')),
+            'max_size': int(pool_size),
+            'timeout': int(_env(prefix, 'POOL_TIMEOUT', '10')),
+        }
+    return config
+
+
+def _sqlite(prefix, default_name):
+    return {
+        'ENGINE': 'elearning_backend.db_backends.sqlite3',
+        'NAME': _env(prefix, 'NAME', default_name),
+        'OPTIONS': {
+            'journal_mode': _env('SQLITE_', 'JOURNAL_MODE', 'WAL'),
+            'synchronous': _env('SQLITE_', 'SYNCHRONOUS', 'NORMAL'),
+            'busy_timeout': int(_env('SQLITE_', 'BUSY_TIMEOUT_MS', '5000')),
+            'transaction_mode': _env('SQLITE_', 'TRANSACTION_MODE', 'IMMEDIATE'),
+        },
+    }
+
+
+def database_from_env(prefix='DB_', default_name=None):
+    """One DATABASES entry from ``<prefix>ENGINE``, ``<prefix>NAME`` and friends"""
+    if _env(prefix, 'ENGINE', 'sqlite') == 'postgresql':
+        return _postgresql(prefix)
+    return _sqlite(prefix, default_name)
@@ -0,0 +1,47 @@
+# elearning_backend/db_backends/sqlite3/base.py
+"""
+SQLite backend tuned for concurrent writers.
+
+Takes four extra OPTIONS, applied to every new connection:
+
+- ``journal_mode``: ``WAL`` lets readers run alongside the single writer.
+- ``synchronous``: ``NORMAL`` is safe with WAL and skips an fsync per commit.
+- ``busy_timeout``: milliseconds a writer waits for the lock before
+  failing with "database is locked".
+- ``transaction_mode``: ``IMMEDIATE`` takes the write lock when an atomic
+  block begins. A deferred transaction that reads and then writes cannot
+  wait on busy_timeout and fails at once when another writer holds the
+  lock.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+PRAGMA_OPTIONS = ('journal_mode', 'synchronous', 'busy_timeout')
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for option in PRAGMA_OPTIONS + ('transaction_mode',):
+            params.pop(option, None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        options = self.settings_dict['OPTIONS']
+        for pragma in PRAGMA_OPTIONS:
+            value = options.get(pragma)
+            if value is None:
+                continue
+            if not str(value).isalnum():
+                raise ImproperlyConfigured(f'Invalid SQLite {pragma}: {value!r}')
+            conn.execute(f'PRAGMA {pragma} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = (self.settings_dict['OPTIONS'].get('transaction_mode') or 'DEFERRED').upper()
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f'Invalid SQLite transaction_mode: {mode!r}')
+        self.cursor().execute(f'BEGIN {mode}')
@@ -0,0 +1,269 @@
+# elearning_backend/instrumentation.py
+"""
+Structured, low-overhead event logging.
+
+Views call ``log_event(logger, 'enrollment.created', course_id=...)``.
+Every event carries the request id, the user id and the milliseconds since
+the request started (set up by RequestContextMiddleware), and its fields
+are redacted before the record is created. QueueLogHandler only puts the
+record on an in-memory queue; a background listener thread, started by the
+first record each process logs, formats it as one JSON line and writes it
+out, so a request never waits on the output stream. High-volume events are sampled per event name through
+``settings.LOG_EVENT_SAMPLE_RATES``; warnings and errors are always kept.
+"""
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+import weakref
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject, empty
+
+RequestContext = namedtuple('RequestContext', ['request_id', 'request', 'started'])
+
+_context = contextvars.ContextVar('request_context', default=None)
+
+SECRET_KEY_PATTERN = re.compile(r'authorization|password|passwd|secret|token|cookie|session|api[_-]?key', re.I)
+SECRET_VALUE_PATTERN = re.compile(r'\b(Bearer|Basic|Token|JWT)\s+[\w\-.~+/=]+', re.I)
+REDACTED = '[redacted]'
+REQUEST_ID_PATTERN = re.compile(r'^[\w\-]{1,64}$')
+
+request_logger = logging.getLogger('elearning_backend.requests')
+
+
+def redact(value, key=''):
+    """Copy of ``value`` with secret-looking keys and credentials masked"""
+    if key and SECRET_KEY_PATTERN.search(key):
+        return REDACTED
+    if isinstance(value, dict):
+        return {k: redact(v, str(k)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    if isinstance(value, str):
+        return SECRET_VALUE_PATTERN.sub(lambda match: f'{match.group(1)} {REDACTED}', value)
+    return value
+
+
+def _user_id(request):
+    user = getattr(request, 'user', None)
+    # Never force a lazy user just to log it; that would cost a query.
+    # type() because isinstance() reads __class__, which forces it too
+    if user is None or (issubclass(type(user), SimpleLazyObject) and user._wrapped is empty):
+        return None
+    return user.pk if user.is_authenticated else None
+
+
+def current_context():
+    """``(request_id, user_id, elapsed_ms)`` for the running request, or Nones"""
+    context = _context.get()
+    if context is None:
+        return None, None, None
+    return context.request_id, _user_id(context.request), round((time.perf_counter() - context.started) * 1000, 2)
+
+
+def sample_rate(event):
+    return getattr(settings, 'LOG_EVENT_SAMPLE_RATES', {}).get(event, 1.0)
+
+
+def log_event(logger, event, level=logging.INFO, exc_info=False, **fields):
+    """Log a structured event; info-level events may be sampled out"""
+    if not logger.isEnabledFor(level):
+        return
+    if level < logging.WARNING:
+        rate = sample_rate(event)
+        if rate < 1.0:
+            if random.random() >= rate:
+                return
+            fields['sample_rate'] = rate
+    request_id, user_id, elapsed_ms = current_context()
+    # makeRecord + handle rather than logger.log(): skips the stack walk
+    # for the caller's file and line, which the JSON output does not use
+    record = logger.makeRecord(
+        logger.name, level, '(event)', 0, event, None, sys.exc_info() if exc_info else None,
+        extra={
+            'event': event,
+            'fields': redact(fields),
+            'request_id': request_id,
+            'user_id': user_id,
+            'elapsed_ms': elapsed_ms,
+        },
+    )
+    logger.handle(record)
+
+
+@contextmanager
+def request_context(request):
+    """Bind a request, and its id, to the events logged inside the block"""
+    request_id = request.headers.get('X-Request-ID', '')
+    if not REQUEST_ID_PATTERN.match(request_id):
+        request_id = uuid.uuid4().hex
+    request.request_id = request_id
+    token = _context.set(RequestContext(request_id, request, time.perf_counter()))
+    try:
+        yield request_id
+    finally:
+        _context.reset(token)
+
+
+class RequestContextMiddleware:
+    """Assign a request id, expose it to log_event and log the request's outcome"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with request_context(request) as request_id:
+            response = self.get_response(request)
+            self._finish(request, response, request_id)
+        return response
+
+    async def __acall__(self, request):
+        with request_context(request) as request_id:
+            response = await self.get_response(request)
+            self._finish(request, response, request_id)
+        return response
+
+    def _finish(self, request, response, request_id):
+        log_event(
+            request_logger, 'request.finished',
+            level=logging.ERROR if response.status_code >= 500 else logging.INFO,
+            method=request.method, path=request.path, status=response.status_code,
+        )
+        response['X-Request-ID'] = request_id
+
+
+class RequestContextFilter(logging.Filter):
+    """Add request context to records that did not come through log_event"""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id, record.user_id, record.elapsed_ms = current_context()
+        return True
+
+
+class RedactSecretsFilter(logging.Filter):
+    """Mask credentials in the message of records that did not come through log_event"""
+
+    def filter(self, record):
+        if not hasattr(record, 'fields'):
+            record.msg = redact(record.getMessage())
+            record.args = None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': getattr(record, 'event', None),
+            'request_id': getattr(record, 'request_id', None),
+            'user_id': getattr(record, 'user_id', None),
+            'elapsed_ms': getattr(record, 'elapsed_ms', None),
+        }
+        if data['event'] is None:
+            data['message'] = record.getMessage()
+        data.update(getattr(record, 'fields', {}))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, default=str)
+
+
+class QueueLogHandler(QueueHandler):
+    """
+    Hand records to a background thread that writes them as JSON lines.
+
+    The queue is bounded; when the writer falls behind, records are dropped
+    and counted rather than blocking the request.
+
+    The thread is started by the first record a process logs, not when
+    logging is configured: a preloading server configures logging in its
+    master and forks the workers, and a thread does not survive a fork.
+    Each forked child starts over with an empty queue and its own thread.
+    """
+
+    def __init__(self, maxsize=10000, stream=None):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.target.setFormatter(JsonFormatter())
+        self.listener = None
+        self._start_lock = threading.Lock()
+        _handlers.add(self)
+
+    def _start_listener(self):
+        with self._start_lock:
+            if self.listener is None:
+                listener = QueueListener(self.queue, self.target)
+                listener.start()
+                self.listener = listener
+
+    def _after_fork(self):
+        # The parent's thread and whatever it had queued stay in the parent
+        self.queue = queue.Queue(self.queue.maxsize)
+        self.listener = None
+        self._start_lock = threading.Lock()
+
+    def prepare(self, record):
+        # Keep the record's structure for JsonFormatter; only resolve what
+        # cannot cross threads safely (message args, exception objects)
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            # Copy, so handlers after this one still see the exception
+            record = copy.copy(record)
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.listener is None:
+            self._start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        # logging.shutdown() closes the handler, and so drains the queue, at exit
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
+
+
+_handlers = weakref.WeakSet()
+
+
+def _reset_handlers_after_fork():
+    for handler in list(_handlers):
+        handler._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_handlers_after_fork)
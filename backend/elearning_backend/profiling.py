@@ -0,0 +1,265 @@
+# elearning_backend/profiling.py
+"""
+Per-request query and latency profiling.
+
+QueryProfilingMiddleware wraps a sampled share of requests
+(``settings.QUERY_PROFILING_SAMPLE_RATE``) with ``connection.execute_wrapper``,
+so it works without DEBUG and keeps no SQL log: each query only bumps a
+counter, the SQL time and its fingerprint (the SQL with ``IN`` lists
+collapsed, so an N+1 loop shows up as one fingerprint seen N times).
+Sampled responses get a ``Server-Timing`` header, and every sampled request
+is folded into per-view histograms held in process memory, which staff can
+read from ``/api/profiling/``. Views listed in ``settings.QUERY_BUDGETS``
+log a warning event when a request goes over its query budget.
+
+Tests opt in to budgets with ``assert_max_queries`` (or
+``QueryBudgetMixin.assertMaxQueries``), which fails with the duplicated
+fingerprints in the message.
+"""
+import bisect
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.http import JsonResponse
+
+from .instrumentation import log_event
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+TOP_DUPLICATES = 5
+
+IN_LIST_PATTERN = re.compile(r'\((?:%s, )+%s\)')
+VALUES_LIST_PATTERN = re.compile(r'(\((?:%s, )*%s\))(?:, \((?:%s, )*%s\))+')
+
+
+def fingerprint(sql):
+    """The query's shape: placeholders are already in the SQL, only list lengths vary"""
+    sql = VALUES_LIST_PATTERN.sub(r'\1, ...', sql)
+    return IN_LIST_PATTERN.sub('(...)', sql)
+
+
+class QueryProfile:
+    """Queries seen on every database connection while installed"""
+
+    def __init__(self):
+        self.count = 0
+        self.sql_seconds = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def install(self):
+        """Wrap the calling thread's connections; closing the returned stack unwraps them"""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+    @contextmanager
+    def installed(self):
+        with self.install():
+            yield self
+
+    @property
+    def duplicates(self):
+        """(fingerprint, count) for every query shape run more than once, most repeated first"""
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count > 1]
+
+
+class ViewStats:
+    """Histograms for one view"""
+
+    def __init__(self):
+        self.requests = 0
+        self.latency_sum = 0.0
+        self.sql_ms_sum = 0.0
+        self.query_sum = 0
+        self.query_max = 0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.query_buckets = [0] * (len(QUERY_BUCKETS) + 1)
+        self.duplicates = Counter()
+
+    def add(self, latency_ms, profile):
+        self.requests += 1
+        self.latency_sum += latency_ms
+        self.sql_ms_sum += profile.sql_seconds * 1000
+        self.query_sum += profile.count
+        self.query_max = max(self.query_max, profile.count)
+        self.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+        self.query_buckets[bisect.bisect_left(QUERY_BUCKETS, profile.count)] += 1
+        for sql, count in profile.duplicates:
+            self.duplicates[sql] += count
+        if len(self.duplicates) > TOP_DUPLICATES * 10:
+            # Keep memory bounded on views with many distinct shapes
+            self.duplicates = Counter(dict(self.duplicates.most_common(TOP_DUPLICATES)))
+
+    def as_json(self):
+        n = self.requests
+        return {
+            'requests': n,
+            'latency_ms': {
+                'mean': self.latency_sum / n,
+                'p50_le': _quantile_bound(self.latency_buckets, LATENCY_BUCKETS_MS, 0.5),
+                'p95_le': _quantile_bound(self.latency_buckets, LATENCY_BUCKETS_MS, 0.95),
+                'histogram': _histogram(self.latency_buckets, LATENCY_BUCKETS_MS),
+            },
+            'queries': {
+                'mean': self.query_sum / n,
+                'max': self.query_max,
+                'histogram': _histogram(self.query_buckets, QUERY_BUCKETS),
+            },
+            'sql_ms_mean': self.sql_ms_sum / n,
+            'duplicate_queries': [
+                {'sql': sql, 'count': count} for sql, count in self.duplicates.most_common(TOP_DUPLICATES)
+            ],
+        }
+
+
+def _histogram(counts, bounds):
+    return [{'le': bound, 'count': count} for bound, count in zip(list(bounds) + [None], counts)]
+
+
+def _quantile_bound(counts, bounds, quantile):
+    """Upper bound of the bucket holding the quantile; None means above the last bound"""
+    target = quantile * sum(counts)
+    seen = 0
+    for bound, count in zip(list(bounds) + [None], counts):
+        seen += count
+        if count and seen >= target:
+            return bound
+    return None
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def record(view_name, latency_ms, profile):
+    with _stats_lock:
+        stats = _stats.get(view_name)
+        if stats is None:
+            stats = _stats[view_name] = ViewStats()
+        stats.add(latency_ms, profile)
+
+
+def snapshot():
+    """JSON-ready stats of this process, by view name"""
+    with _stats_lock:
+        return {view_name: stats.as_json() for view_name, stats in sorted(_stats.items())}
+
+
+def reset():
+    with _stats_lock:
+        _stats.clear()
+
+
+def server_timing(profile, latency_ms):
+    duplicates = sum(count for _, count in profile.duplicates)
+    return (
+        f'db;dur={profile.sql_seconds * 1000:.1f};desc="{profile.count} queries, {duplicates} duplicate", '
+        f'app;dur={latency_ms:.1f}'
+    )
+
+
+class QueryProfilingMiddleware:
+    """Profile a sample of requests; see the module docstring"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        rate = getattr(settings, 'QUERY_PROFILING_SAMPLE_RATE', 0.0)
+        return rate > 0 and (rate >= 1 or random.random() < rate)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        profile = QueryProfile()
+        started = time.perf_counter()
+        with profile.installed():
+            response = self.get_response(request)
+        return self._finish(request, response, profile, started)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        profile = QueryProfile()
+        started = time.perf_counter()
+        # Async views reach the ORM through sync_to_async, which runs on the
+        # request's own executor thread with that thread's connections
+        stack = await sync_to_async(profile.install)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self._finish(request, response, profile, started)
+
+    def _finish(self, request, response, profile, started):
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        view_name = request.resolver_match.view_name if request.resolver_match else 'unresolved'
+        record(view_name, latency_ms, profile)
+        response['Server-Timing'] = server_timing(profile, latency_ms)
+
+        budget = getattr(settings, 'QUERY_BUDGETS', {}).get(view_name)
+        if budget is not None and profile.count > budget:
+            log_event(
+                logger, 'query_budget.exceeded', level=logging.WARNING, view=view_name,
+                queries=profile.count, budget=budget, duplicates=profile.duplicates[:TOP_DUPLICATES],
+            )
+        return response
+
+
+@staff_member_required
+def profiling_stats(request):
+    """Per-view query and latency histograms of the process serving this request"""
+    if request.method == 'POST':
+        reset()
+    return JsonResponse({'sample_rate': getattr(settings, 'QUERY_PROFILING_SAMPLE_RATE', 0.0), 'views': snapshot()})
+
+
+@contextmanager
+def assert_max_queries(limit):
+    """Fail when the block runs more than ``limit`` queries; for tests"""
+    profile = QueryProfile()
+    with profile.installed():
+        yield profile
+    if profile.count > limit:
+        details = '\n'.join(f'  {count}x {sql}' for sql, count in profile.duplicates[:TOP_DUPLICATES])
+        raise AssertionError(
+            f'{profile.count} queries executed, budget is {limit}'
+            + (f'; repeated queries:\n{details}' if details else '')
+        )
+
+
+class QueryBudgetMixin:
+    """TestCase mixin: ``with self.assertMaxQueries(5): self.client.get(...)``"""
+
+    def assertMaxQueries(self, limit):
+        return assert_max_queries(limit)
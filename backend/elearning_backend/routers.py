@@ -0,0 +1,180 @@
+# elearning_backend/routers.py
+"""
+Read-replica routing.
+
+Reads go to a replica only inside views that opt in with
+``@use_read_replica`` or ``ReadReplicaMixin``. Everything else, including
+management commands and the grading worker, keeps reading from
+``default``. Writes always go to ``default``.
+
+A request is pinned to the primary for reads when any of these hold:
+- it uses an unsafe method;
+- it writes anything;
+- it carries the pin cookie, which is set for ``REPLICA_PIN_SECONDS``
+  after a write.
+The last case means a student who just enrolled reads their enrollment
+back from the primary until the replicas have caught up. Code that
+rebuilds cached data wraps the rebuild in ``primary_reads``.
+
+Replicas are listed in ``settings.READ_REPLICAS``. Locally two SQLite
+files are enough (see the ``DB_REPLICA*`` variables in settings).
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+PIN_COOKIE = 'db_primary_pin'
+UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+# Sessions and token blacklists must never lag behind a login or logout
+PRIMARY_ONLY_APPS = ('sessions', 'token_blacklist')
+
+
+class _RoutingState:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.replica_reads = False
+        self.wrote = False
+
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+@contextmanager
+def routing_state(pinned=False):
+    """Fresh routing state for one request or task"""
+    state = _RoutingState(pinned)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def replica_reads():
+    """Let reads in this block go to a replica unless the request is pinned"""
+    state = _state.get()
+    if state is None:
+        yield
+        return
+    previous = state.replica_reads
+    state.replica_reads = True
+    try:
+        yield
+    finally:
+        state.replica_reads = previous
+
+
+@contextmanager
+def primary_reads():
+    """
+    Read from the primary in this block, even inside a replica view.
+
+    For rebuilding cached or stored data derived from the database: a
+    lagging replica would otherwise put stale data into the cache under
+    the newest version, where it stays until the next bump.
+    """
+    state = _state.get()
+    if state is None:
+        yield
+        return
+    previous = state.replica_reads
+    state.replica_reads = False
+    try:
+        yield
+    finally:
+        state.replica_reads = previous
+
+
+def _render_with_replica_reads(view, request, *args, **kwargs):
+    with replica_reads():
+        response = view(request, *args, **kwargs)
+        # Template responses evaluate their querysets when rendered, which
+        # would otherwise happen after the view has returned
+        if hasattr(response, 'render') and not response.is_rendered:
+            response.render()
+    return response
+
+
+def use_read_replica(view):
+    """View decorator: read from a replica unless pinned to the primary"""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        return _render_with_replica_reads(view, request, *args, **kwargs)
+    return wrapped
+
+
+class ReadReplicaMixin:
+    """Class-based view counterpart of ``use_read_replica``"""
+
+    def dispatch(self, request, *args, **kwargs):
+        return _render_with_replica_reads(super().dispatch, request, *args, **kwargs)
+
+
+class ReplicaPinningMiddleware:
+    """Track writes per request and keep the client on the primary after one"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with routing_state(self._pinned(request)) as state:
+            response = self.get_response(request)
+        return self._pin(response, state)
+
+    async def __acall__(self, request):
+        with routing_state(self._pinned(request)) as state:
+            response = await self.get_response(request)
+        return self._pin(response, state)
+
+    def _pinned(self, request):
+        return request.method in UNSAFE_METHODS or PIN_COOKIE in request.COOKIES
+
+    def _pin(self, response, state):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 15),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class ReplicaRouter:
+    """Send opted-in reads to a random replica and everything else to ``default``"""
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'READ_REPLICAS', ())
+        state = _state.get()
+        if (
+            not replicas
+            or state is None
+            or state.pinned
+            or not state.replica_reads
+            or model._meta.app_label in PRIMARY_ONLY_APPS
+        ):
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # Read-your-writes for the rest of this request
+            state.pinned = state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
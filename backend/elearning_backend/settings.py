@@ -10,6 +10,9 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 import os
 from datetime import timedelta
+from importlib.util import find_spec
+
+from .database import database_from_env
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -44,12 +47,16 @@ INSTALLED_APPS = [
     # Third-party apps
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'crispy_forms',
     'crispy_bootstrap5',
 ]
 
 MIDDLEWARE = [
+    'elearning_backend.instrumentation.RequestContextMiddleware',
+    'elearning_backend.profiling.QueryProfilingMiddleware',
+    'elearning_backend.routers.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -81,12 +88,91 @@ TEMPLATES = [
 WSGI_APPLICATION = 'elearning_backend.wsgi.application'
 
 # Database
+# Configured from the environment, see elearning_backend.database:
+# DB_ENGINE=postgresql with DB_NAME/DB_USER/DB_PASSWORD/DB_HOST/DB_PORT and
+# DB_CONN_MAX_AGE for production; the SQLite default runs in WAL mode with
+# SQLITE_BUSY_TIMEOUT_MS and IMMEDIATE transactions.
 DATABASES = {
+    'default': database_from_env('DB_', BASE_DIR / 'db.sqlite3'),
+}
+
+# Read replicas, see elearning_backend.routers: DB_REPLICA_COUNT=N adds
+# replica1..replicaN configured from DB_REPLICA1_ENGINE, DB_REPLICA1_NAME, ...
+# Catalog and reporting views read from them unless the client wrote within
+# the last REPLICA_PIN_SECONDS.
+READ_REPLICAS = []
+for _i in range(1, int(os.environ.get('DB_REPLICA_COUNT', '0')) + 1):
+    DATABASES[f'replica{_i}'] = {
+        **database_from_env(f'DB_REPLICA{_i}_', BASE_DIR / f'db.replica{_i}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+    READ_REPLICAS.append(f'replica{_i}')
+DATABASE_ROUTERS = ['elearning_backend.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = 15
+
+# Cache
+# Course outlines are served from here. Any Django backend works, e.g.
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache with
+# CACHE_LOCATION=/var/tmp/elearning_cache to share entries between workers.
+# Caches invalidated by deletes stay off on the default per-process
+# backend (see elearning_backend.caching).
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'elearning'),
     }
 }
+COURSE_OUTLINE_CACHE_TIMEOUT = 60 * 60
+EXAM_ANSWER_KEY_CACHE_TIMEOUT = 60 * 60
+# How long a process reuses an answer key before checking its version
+EXAM_ANSWER_KEY_LOCAL_TTL = 5
+# Need a shared CACHE_BACKEND; 0 turns the cache off
+UPCOMING_EXAMS_CACHE_TIMEOUT = int(os.environ.get('UPCOMING_EXAMS_CACHE_TIMEOUT', '0'))
+ENROLLMENT_STATUS_CACHE_TIMEOUT = int(os.environ.get('ENROLLMENT_STATUS_CACHE_TIMEOUT', '0'))
+# Grade submitted attempts in the run_grading_worker command instead of the request
+EXAM_GRADING_ASYNC = True
+
+# Logging
+# Structured events from elearning_backend.instrumentation.log_event, written
+# as JSON lines by a background thread. Info events listed here are kept at
+# the given rate; warnings and errors are never sampled.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_EVENT_SAMPLE_RATES = {
+    'request.finished': 0.05,
+    'enrollment.check': 0.01,
+    'enrollment.statuses': 0.01,
+}
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_context': {'()': 'elearning_backend.instrumentation.RequestContextFilter'},
+        'redact_secrets': {'()': 'elearning_backend.instrumentation.RedactSecretsFilter'},
+    },
+    'handlers': {
+        'events': {
+            'class': 'elearning_backend.instrumentation.QueueLogHandler',
+            'filters': ['request_context', 'redact_secrets'],
+        },
+    },
+    'loggers': {
+        name: {'handlers': ['events'], 'level': LOG_LEVEL, 'propagate': False}
+        for name in ('elearning_backend', 'enrollments', 'exams', 'django.request')
+    },
+}
+
+# Query profiling, see elearning_backend.profiling. Share of requests that
+# get query counting, a Server-Timing header and a place in the per-view
+# histograms at /api/profiling/.
+QUERY_PROFILING_SAMPLE_RATE = float(os.environ.get('QUERY_PROFILING_SAMPLE_RATE', '1.0' if DEBUG else '0.05'))
+# Maximum queries per request by view name; going over logs a warning
+QUERY_BUDGETS = {
+    'web_accounts:dashboard': 10,
+    'enrollments:check_enrollment': 5,
+    'enrollments:enrollment_statuses': 5,
+    'enrollments:course_progress': 10,
+    'exams:submit_exam': 10,
+}
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -104,6 +190,28 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing. PASSWORD_HASHER picks argon2 (the default when
+# argon2-cffi is installed) or pbkdf2. Hashes made with the other hasher,
+# or with other costs, are upgraded on the user's next login.
+_PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'argon2' if find_spec('argon2') else 'pbkdf2')
+PASSWORD_HASHERS = [
+    'accounts.hashers.TunedPBKDF2PasswordHasher',
+    'accounts.hashers.TunedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if _PASSWORD_HASHER == 'argon2':
+    PASSWORD_HASHERS[:2] = reversed(PASSWORD_HASHERS[:2])
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', '600000'))
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_ARGON2_TIME_COST', '2'))
+PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', '65536'))
+PASSWORD_ARGON2_PARALLELISM = int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', '2'))
+# Hashes run in a pool of this many threads; at most PASSWORD_HASHING_QUEUE
+# more wait for a thread before registrations get a 503
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', str(os.cpu_count() or 2)))
+PASSWORD_HASHING_QUEUE = int(os.environ.get('PASSWORD_HASHING_QUEUE', '64'))
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -112,9 +220,10 @@ USE_TZ = True
 
 # REST Framework settings
 REST_FRAMEWORK = {
+    # Bearer tokens first: they authenticate from claims without a query
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'accounts.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -151,9 +260,12 @@ CORS_ALLOW_HEADERS = [
 
 # JWT settings
 SIMPLE_JWT = {
-    'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
+    # Short-lived: roles and is_active come from the token between refreshes
+    # unless the auth-version marker (accounts.tokens) says the user changed
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.environ.get('JWT_ACCESS_TOKEN_MINUTES', '15'))),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
-    'ROTATE_REFRESH_TOKENS': False,
+    # Every refresh returns a new refresh token and blacklists the old one
+    'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
@@ -163,7 +275,16 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    'TOKEN_OBTAIN_SERIALIZER': 'accounts.tokens.AccountTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.tokens.AccountTokenRefreshSerializer',
 }
+# Per-process cache of user rows behind StatelessJWTAuthentication
+USER_CACHE_SIZE = 1024
+USER_CACHE_TTL = 5 * 60
+# How long a successful login skips the password hash on repeat logins.
+# Off unless set; then it needs a shared CACHE_BACKEND and its own secret
+LOGIN_VERIFY_CACHE_TIMEOUT = int(os.environ.get('LOGIN_VERIFY_CACHE_TIMEOUT', '0'))
+LOGIN_VERIFY_SECRET = os.environ.get('LOGIN_VERIFY_SECRET', '')
 
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = '/static/'
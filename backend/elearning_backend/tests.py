@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase
+
+from . import database
+from .db_backends.sqlite3.base import DatabaseWrapper
+from .instrumentation import QueueLogHandler
+
+
+class DatabaseFromEnvTestCase(SimpleTestCase):
+    def config(self, **env):
+        environ = {f'TEST_DB_{name}': value for name, value in env.items()}
+        with mock.patch.dict(os.environ, environ):
+            return database.database_from_env('TEST_DB_', 'default.sqlite3')
+
+    def test_sqlite_by_default(self):
+        config = self.config()
+        self.assertEqual(config['ENGINE'], 'elearning_backend.db_backends.sqlite3')
+        self.assertEqual(config['NAME'], 'default.sqlite3')
+        self.assertEqual(config['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+
+    def test_postgresql_keeps_checked_persistent_connections(self):
+        config = self.config(ENGINE='postgresql', NAME='school', HOST='db', CONN_MAX_AGE='300')
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((config['NAME'], config['HOST'], config['PORT']), ('school', 'db', '5432'))
+        self.assertEqual(config['CONN_MAX_AGE'], 300)
+        self.assertIs(config['CONN_HEALTH_CHECKS'], True)
+        self.assertNotIn('pool', config['OPTIONS'])
+        self.assertEqual(self.config(ENGINE='postgresql')['CONN_MAX_AGE'], 60)
+
+    def test_pool_needs_django_5_1(self):
+        with mock.patch.object(database.django, 'VERSION', (5, 0, 0, 'final', 0)):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'TEST_DB_POOL_MAX_SIZE'):
+                self.config(ENGINE='postgresql', POOL_MAX_SIZE='20')
+        with mock.patch.object(database.django, 'VERSION', (5, 1, 0, 'final', 0)):
+            config = self.config(ENGINE='postgresql', POOL_MAX_SIZE='20')
+        # Pooled connections replace persistent ones
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertEqual(config['OPTIONS']['pool'], {'min_size': 2, 'max_size': 20, 'timeout': 10})
+
+
+class SQLiteBackendTestCase(SimpleTestCase):
+    def wrapper(self, **options):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_dict = {
+            **connection.settings_dict,
+            **database.database_from_env('SQLITE_TEST_', os.path.join(directory.name, 'test.sqlite3')),
+        }
+        settings_dict['OPTIONS'].update(options)
+        wrapper = DatabaseWrapper(settings_dict, alias='sqlite-pragmas')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_new_connections_get_the_pragmas(self):
+        wrapper = self.wrapper(busy_timeout=1234)
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        # NORMAL
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 1234)
+
+    def test_rejects_unsafe_values(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, 'journal_mode'):
+            self.wrapper(journal_mode='WAL; DROP TABLE x').ensure_connection()
+
+
+class QueueLogHandlerTestCase(SimpleTestCase):
+    def log(self, handler, event):
+        handler.handle(logging.makeLogRecord({'name': 'test', 'msg': event, 'event': event}))
+
+    def events(self, stream):
+        stream.seek(0)
+        return [json.loads(line)['event'] for line in stream]
+
+    def test_listener_starts_with_the_first_record(self):
+        stream = tempfile.TemporaryFile('w+')
+        self.addCleanup(stream.close)
+        handler = QueueLogHandler(stream=stream)
+        self.assertIsNone(handler.listener)
+        self.log(handler, 'first')
+        self.assertIsNotNone(handler.listener)
+        handler.close()
+        self.assertEqual(self.events(stream), ['first'])
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs fork()')
+    def test_forked_child_runs_its_own_listener(self):
+        stream = tempfile.TemporaryFile('w+')
+        self.addCleanup(stream.close)
+        handler = QueueLogHandler(stream=stream)
+        self.log(handler, 'parent')
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self.log(handler, 'child')
+                handler.close()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        handler.close()
+        self.assertEqual(sorted(self.events(stream)), ['child', 'parent'])
@@ -1,9 +1,11 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import RedirectView
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenBlacklistView, TokenObtainPairView, TokenRefreshView
 from django.conf import settings
 from django.conf.urls.static import static
+from accounts.views import dashboard_api
+from .profiling import profiling_stats
 from . import views
 
 urlpatterns = [
@@ -12,6 +14,7 @@ urlpatterns = [
     path('api/register/', views.register_view, name='register'),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/blacklist/', TokenBlacklistView.as_view(), name='token_blacklist'),
     
     # Admin site
     path('admin/', admin.site.urls),
@@ -19,6 +22,8 @@ urlpatterns = [
     # API endpoints for existing apps
     path('api/users/', include('users.urls')),
     path('api/courses/', include('courses.urls', namespace='api_courses')),
+    path('api/dashboard/', dashboard_api, name='api_dashboard'),
+    path('api/profiling/', profiling_stats, name='profiling_stats'),
     
     # New application endpoints
     path('accounts/', include('accounts.urls', namespace='web_accounts')),
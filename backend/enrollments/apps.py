@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class EnrollmentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'enrollments'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from elearning_backend.caching import check_shared_cache
+        check_shared_cache('ENROLLMENT_STATUS_CACHE_TIMEOUT')
@@ -0,0 +1,59 @@
+# enrollments/counters.py
+"""
+Reconciliation of the denormalized progress counters.
+
+``Course.section_count``, ``Enrollment.total_sections`` and
+``Enrollment.completed_sections`` are maintained incrementally; these
+helpers find rows that drifted from the source tables and fix them with a
+single UPDATE per counter.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from courses.models import Course, Section
+from .models import Enrollment, Progress
+
+
+def _count_subquery(queryset, group_field):
+    return Coalesce(
+        Subquery(
+            queryset.order_by()
+            .values(group_field)
+            .annotate(total=Count('id'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def actual_section_count(course_ref):
+    return _count_subquery(Section.objects.filter(course=course_ref), 'course')
+
+
+def actual_completed_sections(enrollment_ref):
+    return _count_subquery(
+        Progress.objects.filter(enrollment=enrollment_ref, completed=True), 'enrollment')
+
+
+def _fix(model, counters):
+    """Update every row whose counters disagree with their expressions"""
+    drifted = model.objects.annotate(
+        **{f'actual_{field}': expression for field, expression in counters.items()}
+    ).filter(
+        Q(*[~Q(**{field: F(f'actual_{field}')}) for field in counters], _connector=Q.OR)
+    )
+    return model.objects.filter(pk__in=drifted.values('pk')).update(**counters)
+
+
+def reconcile_counters():
+    """Fix drifted progress counters; returns the number of rows fixed per model"""
+    return {
+        'courses': _fix(Course, {
+            'section_count': actual_section_count(OuterRef('pk')),
+        }),
+        'enrollments': _fix(Enrollment, {
+            'total_sections': actual_section_count(OuterRef('course_id')),
+            'completed_sections': actual_completed_sections(OuterRef('pk')),
+        }),
+    }
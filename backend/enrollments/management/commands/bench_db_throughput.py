@@ -0,0 +1,139 @@
+import statistics
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.utils import timezone
+
+from courses.models import Category, Course
+from exams.models import Choice, Exam, Question
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test: concurrent enroll + take/submit exam flows through the real views against the '
+        'configured database. Run it once per profile (DB_ENGINE, SQLITE_* variables) on a scratch, '
+        'migrated database; the rows it creates are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--flows', type=int, default=25, help='Enroll + submit flows per worker')
+        parser.add_argument('--courses', type=int, default=4)
+        parser.add_argument('--questions', type=int, default=10)
+
+    def handle(self, *args, **options):
+        prefix = f'loadtest-{uuid.uuid4().hex[:8]}'
+        exams, students = self._populate(prefix, options)
+        try:
+            results = self._run(exams, students, options['workers'])
+        finally:
+            User.objects.filter(username__startswith=prefix).delete()
+            Course.objects.filter(title__startswith=prefix).delete()
+            Category.objects.filter(name=prefix).delete()
+        self._report(results, options)
+
+    def _populate(self, prefix, options):
+        category = Category.objects.create(name=prefix)
+        instructor = User.objects.create_user(f'{prefix}-instructor', None, None)
+        now = timezone.now()
+        exams = []
+        for i in range(options['courses']):
+            course = Course.objects.create(
+                title=f'{prefix} course {i}', description='', instructor=instructor,
+                category=category, is_published=True,
+            )
+            exam = Exam.objects.create(
+                title='Load test', course=course, exam_type='quiz', max_attempts=1000,
+                start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+            )
+            answers = {}
+            for order in range(options['questions']):
+                question = Question.objects.create(
+                    exam=exam, question_text='Pick one', question_type='multiple_choice', order=order)
+                answers[f'question_{question.id}'] = Choice.objects.create(
+                    question=question, choice_text='Right', is_correct=True).id
+                Choice.objects.create(question=question, choice_text='Wrong')
+            exams.append((course.id, exam.id, answers))
+
+        total = options['workers'] * options['flows']
+        students = User.objects.bulk_create([
+            User(username=f'{prefix}-student-{i}', email=f'{prefix}-{i}@example.com', password='!')
+            for i in range(total)
+        ])
+        if students[0].pk is None:
+            students = list(User.objects.filter(username__startswith=f'{prefix}-student-').order_by('id'))
+        return exams, students
+
+    def _run(self, exams, students, workers):
+        results = {'enroll': [], 'submit': [], 'errors': []}
+        lock = threading.Lock()
+        chunks = [students[i::workers] for i in range(workers)]
+
+        def worker(chunk):
+            client = Client(SERVER_NAME='localhost')
+            enroll_times, submit_times, errors = [], [], []
+            try:
+                for student in chunk:
+                    course_id, exam_id, answers = exams[student.pk % len(exams)]
+                    try:
+                        client.force_login(student)
+                        started = time.perf_counter()
+                        response = client.post(f'/enrollments/enroll/{course_id}/')
+                        if response.status_code != 201:
+                            raise RuntimeError(f'enroll returned {response.status_code}')
+                        enroll_times.append(time.perf_counter() - started)
+
+                        started = time.perf_counter()
+                        take_url = client.get(f'/exams/{exam_id}/start/')['Location']
+                        response = client.post(take_url, {**answers, 'submit': '1'})
+                        if response.status_code != 302 or 'results' not in response['Location']:
+                            raise RuntimeError(f'submit returned {response.status_code}')
+                        submit_times.append(time.perf_counter() - started)
+                    except Exception as e:
+                        errors.append(repr(e))
+            finally:
+                connection.close()
+            with lock:
+                results['enroll'].extend(enroll_times)
+                results['submit'].extend(submit_times)
+                results['errors'].extend(errors)
+
+        # The main thread's connection would hold SQLite locks open otherwise
+        connections.close_all()
+        threads = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results['elapsed'] = time.perf_counter() - started
+        return results
+
+    def _report(self, results, options):
+        settings_dict = connection.settings_dict
+        self.stdout.write(f"engine: {settings_dict['ENGINE']}  options: {settings_dict['OPTIONS']}  "
+                          f"CONN_MAX_AGE: {settings_dict['CONN_MAX_AGE']}")
+        self.stdout.write(f"workers: {options['workers']}  flows: {options['workers'] * options['flows']}  "
+                          f"elapsed: {results['elapsed']:.2f} s")
+        self.stdout.write(f"completed flows/s: {len(results['submit']) / results['elapsed']:.1f}")
+        for name in ('enroll', 'submit'):
+            times = sorted(results[name])
+            if not times:
+                self.stdout.write(f'{name}: no successful requests')
+                continue
+            p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+            self.stdout.write(
+                f'{name:<7} ok: {len(times):>5}  p50: {statistics.median(times) * 1000:>7.1f} ms  '
+                f'p95: {p95 * 1000:>7.1f} ms'
+            )
+        self.stdout.write(f"errors: {len(results['errors'])}")
+        for error in sorted(set(results['errors']))[:5]:
+            self.stdout.write(f'  {error}')
@@ -0,0 +1,75 @@
+import logging
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+from elearning_backend.instrumentation import JsonFormatter, QueueLogHandler, log_event, request_context
+
+
+class SlowSink:
+    """A log pipe that takes ``latency`` seconds per write, like a backed-up collector"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def write(self, text):
+        time.sleep(self.latency)
+
+    def flush(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Per-request cost of the old print() calls vs. structured events through the queue handler'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20_000)
+        parser.add_argument('--sink-latency-us', type=int, default=50,
+                            help='Per-write latency of the simulated slow log pipe')
+
+    def handle(self, *args, **options):
+        n = options['requests']
+        request = RequestFactory().get('/enrollments/check/1/', HTTP_AUTHORIZATION='Bearer bench-token')
+        logger = logging.getLogger('enrollments.bench')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+
+        with open(os.devnull, 'w') as devnull, request_context(request):
+            slow = SlowSink(options['sink_latency_us'] / 1_000_000)
+            for sink_name, sink in (('fast sink', devnull), ('slow sink', slow)):
+                def prints():
+                    # What enroll_course and check_enrollment did per request
+                    print(f"Checking enrollment for user bench in course {1}", file=sink)
+                    print(f"Auth header: {request.headers.get('Authorization', 'No Auth header')}", file=sink)
+
+                def event():
+                    log_event(logger, 'enrollment.check', course_id=1, is_enrolled=True)
+
+                stream = logging.StreamHandler(sink)
+                stream.setFormatter(JsonFormatter())
+                queued = QueueLogHandler(maxsize=n + 1, stream=sink)
+                rows = [
+                    ('print() x2', prints, None, 1.0),
+                    ('event, sync handler', event, stream, 1.0),
+                    ('event, queue handler', event, queued, 1.0),
+                    ('event, 1% sampled', event, queued, 0.01),
+                ]
+                self.stdout.write(sink_name)
+                for label, call, handler, rate in rows:
+                    self.stdout.write(f"  {label:<22} {self._time(n, call, logger, handler, rate):>9.2f} us/request")
+                queued.close()
+
+    def _time(self, n, call, logger, handler, rate):
+        if handler is not None:
+            logger.addHandler(handler)
+        try:
+            with override_settings(LOG_EVENT_SAMPLE_RATES={'enrollment.check': rate}):
+                started = time.perf_counter()
+                for _ in range(n):
+                    call()
+                return (time.perf_counter() - started) * 1_000_000 / n
+        finally:
+            if handler is not None:
+                logger.removeHandler(handler)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from enrollments.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Find and fix drift in the section and progress counters'
+
+    def handle(self, *args, **options):
+        fixed = reconcile_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f"Fixed {fixed['courses']} courses and {fixed['enrollments']} enrollments"))
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:28
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Enrollment = apps.get_model('enrollments', 'Enrollment')
+    Progress = apps.get_model('enrollments', 'Progress')
+    Section = apps.get_model('courses', 'Section')
+    sections = (
+        Section.objects.filter(course=OuterRef('course_id')).order_by()
+        .values('course').annotate(total=Count('id')).values('total')
+    )
+    completed = (
+        Progress.objects.filter(enrollment=OuterRef('pk'), completed=True).order_by()
+        .values('enrollment').annotate(total=Count('id')).values('total')
+    )
+    Enrollment.objects.update(
+        total_sections=Coalesce(Subquery(sections, output_field=IntegerField()), 0),
+        completed_sections=Coalesce(Subquery(completed, output_field=IntegerField()), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrollments', '0007_alter_enrollment_options_alter_progress_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_sections',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='total_sections',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 # enrollments/models.py
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.conf import settings
+from django.utils import timezone
 from accounts.models import User
 from courses.models import Course, Section, Content
 
@@ -20,6 +22,10 @@ class Enrollment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     completion_date = models.DateTimeField(null=True, blank=True)
+    # Denormalized progress counters, see Progress.mark_completed and
+    # the Section signals in enrollments.signals
+    total_sections = models.PositiveIntegerField(default=0)
+    completed_sections = models.PositiveIntegerField(default=0)
     
     class Meta:
         unique_together = ['user', 'course']
@@ -29,21 +35,22 @@ class Enrollment(models.Model):
         return f"{self.user_name or self.user.username} - {self.course_name or self.course.title}"
     
     def save(self, *args, **kwargs):
-        # Store the current username and course title
-        if not self.pk or not self.user_name:  # On creation or if name not set
+        # Store the current username and course title unless the caller
+        # already filled them in (saves two lookups per enrollment)
+        if not self.user_name:
             self.user_name = self.user.username
-        if not self.pk or not self.course_name:  # On creation or if name not set
+        if not self.course_name:
             self.course_name = self.course.title
+        if self.pk is None and not self.total_sections:
+            self.total_sections = self.course.section_count
         super().save(*args, **kwargs)
     
     @property
     def progress_percentage(self):
-        """Calculate progress percentage based on completed sections"""
-        total_sections = self.course.sections.count()
-        if not total_sections:
+        """Progress percentage from the completed/total section counters"""
+        if not self.total_sections:
             return 0
-        completed = self.progress.filter(completed=True).count()
-        return (completed / total_sections) * 100
+        return (self.completed_sections / self.total_sections) * 100
 
 class Progress(models.Model):
     """Tracks progress of a user through course content"""
@@ -51,6 +58,7 @@ class Progress(models.Model):
     section = models.ForeignKey('courses.Section', on_delete=models.CASCADE)
     completed = models.BooleanField(default=False)
     completed_at = models.DateTimeField(null=True, blank=True)
+    last_accessed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -60,6 +68,53 @@ class Progress(models.Model):
     
     def __str__(self):
         return f"{self.enrollment.user.username} - {self.section.title}"
+    
+    def _set_completed(self, completed):
+        # Conditional UPDATE so concurrent requests flip the row, and move
+        # the enrollment counter, at most once
+        now = timezone.now()
+        with transaction.atomic():
+            changed = Progress.objects.filter(pk=self.pk, completed=not completed).update(
+                completed=completed,
+                completed_at=now if completed else None,
+                updated_at=now,
+            )
+            if changed:
+                delta = 1 if completed else -1
+                Enrollment.objects.filter(pk=self.enrollment_id).update(
+                    completed_sections=F('completed_sections') + delta)
+        if changed:
+            self.completed = completed
+            self.completed_at = now if completed else None
+        return bool(changed)
+    
+    def mark_completed(self):
+        """Mark the section completed; returns False if it already was"""
+        return self._set_completed(True)
+    
+    def mark_incomplete(self):
+        """Undo a completion; returns False if the section was not completed"""
+        return self._set_completed(False)
+
+class ProgressEvent(models.Model):
+    """Learning-player event, kept to make batch ingestion idempotent"""
+    EVENT_TYPES = (
+        ('viewed', 'Viewed'),
+        ('completed', 'Completed'),
+    )
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='progress_events')
+    key = models.CharField(max_length=64)  # Client-generated idempotency key
+    lesson = models.ForeignKey('courses.Lesson', on_delete=models.CASCADE, related_name='progress_events')
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPES)
+    client_timestamp = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['user', 'key']
+    
+    def __str__(self):
+        return f"{self.user_id} {self.event_type} lesson {self.lesson_id}"
 
 class EnrollmentRecord(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='enrollments_record')
@@ -0,0 +1,229 @@
+# enrollments/progress.py
+"""
+Set-based progress tracking for the learning player.
+
+Events arrive in batches and carry a client-generated idempotency key.
+Each batch is applied in one transaction with a fixed number of statements:
+one upsert for the touched section Progress rows, one insert for lesson
+completions, and one conditional UPDATE per enrollment for sections that
+became complete. Course completion is detected from the enrollment's
+counters, never by recounting.
+"""
+from collections import defaultdict, namedtuple
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from courses.models import Lesson, Progress as LessonProgress
+from exams.upcoming import invalidate_upcoming_exams
+from .models import Enrollment, Progress, ProgressEvent
+from .statuses import invalidate_enrollment_statuses
+
+EventInput = namedtuple('EventInput', ['key', 'lesson_id', 'event_type', 'timestamp'])
+
+EVENT_TYPES = {choice for choice, _ in ProgressEvent.EVENT_TYPES}
+
+
+def parse_event(data):
+    """Validate one event dict from the API; raises ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError('Each event must be an object')
+    key = str(data.get('key') or '')
+    if not key or len(key) > 64:
+        raise ValueError('Each event needs a "key" of at most 64 characters')
+    if data.get('type') not in EVENT_TYPES:
+        raise ValueError(f'Unknown event type for {key}')
+    try:
+        lesson_id = int(data.get('lesson_id'))
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid lesson_id for {key}')
+    timestamp = timezone.now()
+    if data.get('timestamp'):
+        timestamp = parse_datetime(str(data['timestamp']))
+        if timestamp is None:
+            raise ValueError(f'Invalid timestamp for {key}')
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+    return EventInput(key, lesson_id, data['type'], timestamp)
+
+
+def _record_access(last_access):
+    """Upsert section Progress rows from {(enrollment_id, section_id): timestamp}"""
+    Progress.objects.bulk_create(
+        [
+            Progress(enrollment_id=enrollment_id, section_id=section_id, last_accessed_at=timestamp)
+            for (enrollment_id, section_id), timestamp in last_access.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['enrollment', 'section'],
+        update_fields=['last_accessed_at', 'updated_at'],
+    )
+
+
+def _complete_lessons(user, lesson_ids, lessons, enrollments):
+    """
+    Record lesson completions and flip the sections they finish.
+
+    ``lessons`` maps lesson id to (section_id, course_id) and ``enrollments``
+    maps course id to enrollment id. Returns the finished section ids and
+    the course ids completed by this call.
+    """
+    LessonProgress.objects.bulk_create(
+        [LessonProgress(user_id=user.pk, lesson_id=lesson_id) for lesson_id in lesson_ids],
+        ignore_conflicts=True,
+    )
+
+    touched = {lessons[lesson_id][0] for lesson_id in lesson_ids}
+    totals = dict(
+        Lesson.objects.filter(section_id__in=touched).order_by()
+        .values('section_id').annotate(total=Count('id')).values_list('section_id', 'total')
+    )
+    done = dict(
+        LessonProgress.objects.filter(user_id=user.pk, lesson__section_id__in=touched).order_by()
+        .values('lesson__section_id').annotate(done=Count('id')).values_list('lesson__section_id', 'done')
+    )
+    section_courses = {section_id: course_id for section_id, course_id in lessons.values()}
+
+    finished = defaultdict(list)
+    for section_id in touched:
+        if done.get(section_id, 0) >= totals.get(section_id, 0):
+            finished[section_courses[section_id]].append(section_id)
+
+    now = timezone.now()
+    completed_sections = []
+    completed_courses = []
+    for course_id, section_ids in finished.items():
+        enrollment_id = enrollments[course_id]
+        completed_sections.extend(section_ids)
+        flipped = Progress.objects.filter(
+            enrollment_id=enrollment_id, section_id__in=section_ids, completed=False,
+        ).update(completed=True, completed_at=now, updated_at=now)
+        if not flipped:
+            continue
+        Enrollment.objects.filter(pk=enrollment_id).update(
+            completed_sections=F('completed_sections') + flipped)
+        if Enrollment.objects.filter(
+            pk=enrollment_id,
+            status='active',
+            total_sections__gt=0,
+            completed_sections__gte=F('total_sections'),
+        ).update(status='completed', completion_date=now, updated_at=now):
+            completed_courses.append(course_id)
+
+    if completed_courses:
+        # Completed courses no longer list upcoming exams
+        invalidate_enrollment_statuses([user.pk])
+        invalidate_upcoming_exams([user.pk])
+    return completed_sections, completed_courses
+
+
+def _resolve(user, lesson_ids):
+    lessons = {
+        lesson_id: (section_id, course_id)
+        for lesson_id, section_id, course_id in Lesson.objects.filter(id__in=lesson_ids).order_by()
+        .values_list('id', 'section_id', 'section__course_id')
+    }
+    enrollments = dict(
+        Enrollment.objects.filter(user_id=user.pk, course_id__in={course_id for _, course_id in lessons.values()})
+        .exclude(status='dropped')
+        .order_by()
+        .values_list('course_id', 'id')
+    )
+    return lessons, enrollments
+
+
+def ingest_events(user, events):
+    """
+    Apply a batch of EventInputs for one user.
+
+    Only ``user.pk`` is used, so a claims-only API user is never loaded.
+
+    Returns a dict with the ``accepted``, ``duplicate`` and ``rejected``
+    event keys plus the ``completed_sections`` and ``completed_courses``
+    ids. Replaying a batch is harmless: known keys are skipped, and every
+    write is an upsert or a conditional update anyway.
+    """
+    result = {
+        'accepted': [], 'duplicate': [], 'rejected': [],
+        'completed_sections': [], 'completed_courses': [],
+    }
+    by_key = {}
+    for event in events:
+        if event.key in by_key:
+            result['duplicate'].append(event.key)
+        else:
+            by_key[event.key] = event
+
+    with transaction.atomic():
+        seen = set(
+            ProgressEvent.objects.filter(user_id=user.pk, key__in=list(by_key))
+            .values_list('key', flat=True)
+        )
+        fresh = []
+        for key, event in by_key.items():
+            if key in seen:
+                result['duplicate'].append(key)
+            else:
+                fresh.append(event)
+
+        lessons, enrollments = _resolve(user, {event.lesson_id for event in fresh})
+        accepted = []
+        for event in fresh:
+            lesson = lessons.get(event.lesson_id)
+            if lesson is None or lesson[1] not in enrollments:
+                result['rejected'].append(event.key)
+            else:
+                accepted.append(event)
+        if not accepted:
+            return result
+
+        ProgressEvent.objects.bulk_create(
+            [
+                ProgressEvent(
+                    user_id=user.pk,
+                    key=event.key,
+                    lesson_id=event.lesson_id,
+                    event_type=event.event_type,
+                    client_timestamp=event.timestamp,
+                )
+                for event in accepted
+            ],
+            ignore_conflicts=True,
+        )
+
+        last_access = {}
+        for event in accepted:
+            section_id, course_id = lessons[event.lesson_id]
+            pair = (enrollments[course_id], section_id)
+            last_access[pair] = max(last_access.get(pair, event.timestamp), event.timestamp)
+        _record_access(last_access)
+
+        completed = {event.lesson_id for event in accepted if event.event_type == 'completed'}
+        if completed:
+            result['completed_sections'], result['completed_courses'] = _complete_lessons(
+                user, completed, lessons, enrollments)
+
+    result['accepted'] = [event.key for event in accepted]
+    return result
+
+
+def record_lesson_view(enrollment, lesson):
+    """Server-side page view: one upsert instead of get_or_create"""
+    _record_access({(enrollment.id, lesson.section_id): timezone.now()})
+
+
+def complete_lesson(user, lesson):
+    """
+    Mark a single lesson completed for a user outside the batch API.
+
+    Returns ``(completed_sections, completed_courses)`` like the batch path.
+    """
+    with transaction.atomic():
+        lessons, enrollments = _resolve(user, [lesson.id])
+        if lesson.id not in lessons or lessons[lesson.id][1] not in enrollments:
+            return [], []
+        section_id, course_id = lessons[lesson.id]
+        _record_access({(enrollments[course_id], section_id): timezone.now()})
+        return _complete_lessons(user, {lesson.id}, lessons, enrollments)
@@ -0,0 +1,144 @@
+# enrollments/services.py
+"""
+Enrollment writes.
+
+Every enrollment, single or batch, is created in one transaction together
+with its per-section Progress rows, so a failure can never leave an
+enrollment without its progress records.
+"""
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from exams.upcoming import invalidate_upcoming_exams
+from .models import Enrollment, Progress
+from .statuses import invalidate_enrollment_statuses
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+
+def _chunks(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _progress_rows(enrollments, section_ids):
+    return [
+        Progress(enrollment_id=enrollment.id, section_id=section_id)
+        for enrollment in enrollments
+        for section_id in section_ids
+    ]
+
+
+def enroll_user(user, course):
+    """
+    Enroll one user, reactivating a dropped enrollment if there is one.
+
+    Returns ``(enrollment, outcome)`` where outcome is ``'created'``,
+    ``'reactivated'`` or ``'exists'``.
+    """
+    with transaction.atomic():
+        existing = (
+            Enrollment.objects.select_for_update()
+            .filter(user=user, course=course)
+            .first()
+        )
+        if existing:
+            if existing.status != 'dropped':
+                return existing, 'exists'
+            existing.status = 'active'
+            existing.save(update_fields=['status', 'updated_at'])
+            return existing, 'reactivated'
+
+        section_ids = list(course.sections.values_list('id', flat=True))
+        try:
+            with transaction.atomic():
+                enrollment = Enrollment.objects.create(
+                    user=user,
+                    user_name=user.username,
+                    course=course,
+                    course_name=course.title,
+                    status='active',
+                    total_sections=len(section_ids),
+                )
+        except IntegrityError:
+            # A concurrent request enrolled the same user first
+            return Enrollment.objects.get(user=user, course=course), 'exists'
+
+        Progress.objects.bulk_create(_progress_rows([enrollment], section_ids))
+        return enrollment, 'created'
+
+
+def enroll_users(course, user_ids):
+    """
+    Enroll a cohort of users in one transaction.
+
+    Returns a dict of user id lists keyed by outcome: ``created``,
+    ``reactivated``, ``already_enrolled`` and ``unknown`` (no such user).
+    """
+    user_ids = list(dict.fromkeys(int(user_id) for user_id in user_ids))
+    result = {'created': [], 'reactivated': [], 'already_enrolled': [], 'unknown': []}
+
+    with transaction.atomic():
+        section_ids = list(course.sections.values_list('id', flat=True))
+        usernames = {}
+        existing = {}
+        for chunk in _chunks(user_ids):
+            usernames.update(User.objects.filter(id__in=chunk).values_list('id', 'username'))
+            existing.update(
+                (user_id, (enrollment_id, status))
+                for enrollment_id, user_id, status in Enrollment.objects
+                .select_for_update()
+                .filter(course=course, user_id__in=chunk)
+                .values_list('id', 'user_id', 'status')
+            )
+
+        to_create = []
+        dropped = []
+        for user_id in user_ids:
+            if user_id not in usernames:
+                result['unknown'].append(user_id)
+            elif user_id not in existing:
+                to_create.append(Enrollment(
+                    user_id=user_id,
+                    user_name=usernames[user_id],
+                    course=course,
+                    course_name=course.title,
+                    status='active',
+                    total_sections=len(section_ids),
+                ))
+                result['created'].append(user_id)
+            elif existing[user_id][1] == 'dropped':
+                dropped.append(existing[user_id][0])
+                result['reactivated'].append(user_id)
+            else:
+                result['already_enrolled'].append(user_id)
+
+        for chunk in _chunks(dropped):
+            Enrollment.objects.filter(id__in=chunk).update(status='active', updated_at=timezone.now())
+
+        # The row locks above cannot stop a concurrent enroll_user from
+        # inserting one of these pairs, so conflicts are skipped and the
+        # ids read back instead of coming from the insert
+        Enrollment.objects.bulk_create(to_create, batch_size=BATCH_SIZE, ignore_conflicts=True)
+        created = []
+        for chunk in _chunks(result['created']):
+            created.extend(Enrollment.objects.filter(course=course, user_id__in=chunk).only('id', 'user_id'))
+        if section_ids:
+            # Rows that already have progress were enrolled by that concurrent request
+            raced = set(
+                Progress.objects.filter(enrollment__in=created).values_list('enrollment__user_id', flat=True)
+            )
+            if raced:
+                created = [enrollment for enrollment in created if enrollment.user_id not in raced]
+                result['created'] = [user_id for user_id in result['created'] if user_id not in raced]
+                result['already_enrolled'].extend(sorted(raced))
+
+        Progress.objects.bulk_create(_progress_rows(created, section_ids), batch_size=BATCH_SIZE)
+        # Bulk writes send no signals
+        invalidate_enrollment_statuses(result['created'] + result['reactivated'])
+        invalidate_upcoming_exams(result['created'] + result['reactivated'])
+
+    return result
@@ -0,0 +1,34 @@
+# enrollments/signals.py
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from courses.models import Section
+from .models import Enrollment
+from .statuses import invalidate_enrollment_statuses
+
+
+@receiver(post_save, sender=Section)
+def add_section_to_enrollments(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Enrollment.objects.filter(course_id=instance.course_id).update(
+            total_sections=F('total_sections') + 1)
+
+
+@receiver(pre_delete, sender=Section)
+def remove_section_from_enrollments(sender, instance, **kwargs):
+    # pre_delete, because the section's Progress rows are cascaded away
+    # before post_delete fires
+    Enrollment.objects.filter(
+        progress__section=instance,
+        progress__completed=True,
+        completed_sections__gt=0,
+    ).update(completed_sections=F('completed_sections') - 1)
+    Enrollment.objects.filter(course_id=instance.course_id, total_sections__gt=0).update(
+        total_sections=F('total_sections') - 1)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_cached_statuses(sender, instance, **kwargs):
+    invalidate_enrollment_statuses([instance.user_id])
@@ -0,0 +1,60 @@
+# enrollments/statuses.py
+"""
+Cached enrollment status lookups.
+
+A user's enrollments are cached as one ``{course_id: status}`` map, loaded
+with a single query on the ``(user, course)`` unique index, so answering
+"am I enrolled?" for a page of course cards costs no queries once warm.
+The entry is dropped whenever one of the user's enrollments changes: the
+Enrollment signals cover ``save()``/``delete()``, and the bulk paths in
+``enrollments.services`` and ``enrollments.progress`` call
+``invalidate_enrollment_statuses`` themselves.
+
+Those deletes must reach every worker, so the cache is only used with
+``ENROLLMENT_STATUS_CACHE_TIMEOUT`` set and a shared cache backend (see
+``elearning_backend.caching``); otherwise every lookup is the one query.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from elearning_backend.caching import shared_cache_timeout
+from .models import Enrollment
+
+
+def _cache_key(user_id):
+    return f'enrollment-statuses:{user_id}'
+
+
+def _load(user_id):
+    return dict(Enrollment.objects.filter(user_id=user_id).order_by().values_list('course_id', 'status'))
+
+
+def _enrollment_map(user_id):
+    timeout = shared_cache_timeout('ENROLLMENT_STATUS_CACHE_TIMEOUT')
+    if not timeout:
+        return _load(user_id)
+    key = _cache_key(user_id)
+    statuses = cache.get(key)
+    if statuses is None:
+        statuses = _load(user_id)
+        cache.set(key, statuses, timeout)
+    return statuses
+
+
+def get_enrollment_statuses(user, course_ids):
+    """The user's enrollment status per course id, None where not enrolled"""
+    statuses = _enrollment_map(user.pk)
+    return {course_id: statuses.get(course_id) for course_id in course_ids}
+
+
+def is_enrolled(user, course_id):
+    return _enrollment_map(user.pk).get(course_id) == 'active'
+
+
+def invalidate_enrollment_statuses(user_ids):
+    # Drop now for this connection and again after commit, so a concurrent
+    # reader cannot cache the pre-commit state after the first delete
+    keys = [_cache_key(user_id) for user_id in set(user_ids)]
+    if keys and shared_cache_timeout('ENROLLMENT_STATUS_CACHE_TIMEOUT'):
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -1,3 +1,341 @@
-from django.test import TestCase
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from courses.models import Category, Course, Lesson, Section
+from courses.models import Progress as LessonProgress
+from elearning_backend.caching import check_shared_cache
+from elearning_backend.instrumentation import JsonFormatter, redact
+from . import statuses
+from .counters import reconcile_counters
+from .models import Enrollment, Progress, ProgressEvent
+from .services import enroll_user, enroll_users
+
+
+class EnrollmentServiceTestCase(TestCase):
+    def setUp(self):
+        self.instructor = User.objects.create_user('teacher', 'teacher@example.com', 'pass')
+        self.course = Course.objects.create(
+            title="Python for Beginners",
+            description="Learn Python basics",
+            instructor=self.instructor,
+            category=Category.objects.create(name="Programming"),
+            is_published=True,
+        )
+        for order in range(3):
+            Section.objects.create(course=self.course, title=f"Section {order}", order=order)
+        self.students = [
+            User.objects.create_user(f'student{i}', f'student{i}@example.com', 'pass')
+            for i in range(5)
+        ]
+        self.client = APIClient()
+
+    def test_enroll_course_creates_progress_rows(self):
+        self.client.force_authenticate(user=self.students[0])
+        response = self.client.post(f'/enrollments/enroll/{self.course.id}/')
+        self.assertEqual(response.status_code, 201)
+        enrollment = Enrollment.objects.get(pk=response.data['enrollment_id'])
+        self.assertEqual(enrollment.user_name, 'student0')
+        self.assertEqual(enrollment.progress.count(), 3)
+
+        response = self.client.post(f'/enrollments/enroll/{self.course.id}/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_enroll_users_in_bulk(self):
+        Enrollment.objects.create(user=self.students[0], course=self.course, status='dropped')
+        Enrollment.objects.create(user=self.students[1], course=self.course)
+        user_ids = [student.id for student in self.students] + [999999]
+
+        result = enroll_users(self.course, user_ids)
+
+        self.assertEqual(result['reactivated'], [self.students[0].id])
+        self.assertEqual(result['already_enrolled'], [self.students[1].id])
+        self.assertEqual(result['created'], [student.id for student in self.students[2:]])
+        self.assertEqual(result['unknown'], [999999])
+        self.assertEqual(Enrollment.objects.filter(course=self.course, status='active').count(), 5)
+        self.assertEqual(Progress.objects.filter(enrollment__user__in=self.students[2:]).count(), 9)
+
+    def test_enroll_users_races_a_single_enrollment(self):
+        bulk_create = Enrollment.objects.bulk_create
+
+        def racing_bulk_create(*args, **kwargs):
+            # Another request enrolls one of the cohort after the locks were taken
+            enroll_user(self.students[0], self.course)
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(Enrollment.objects, 'bulk_create', side_effect=racing_bulk_create):
+            result = enroll_users(self.course, [student.id for student in self.students[:2]])
+        self.assertEqual(result['created'], [self.students[1].id])
+        self.assertEqual(result['already_enrolled'], [self.students[0].id])
+        self.assertEqual(Progress.objects.filter(enrollment__course=self.course).count(), 6)
+
+    def test_cohort_endpoint_rejects_a_json_list(self):
+        self.client.force_authenticate(user=self.instructor)
+        response = self.client.post(
+            f'/enrollments/enroll/{self.course.id}/cohort/', [self.students[0].id], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_cohort_endpoint_accepts_csv(self):
+        self.client.force_authenticate(user=self.instructor)
+        upload = SimpleUploadedFile(
+            'cohort.csv',
+            ('user_id\n' + '\n'.join(str(student.id) for student in self.students)).encode(),
+            content_type='text/csv',
+        )
+        response = self.client.post(
+            f'/enrollments/enroll/{self.course.id}/cohort/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 5)
+
+    def test_cohort_endpoint_requires_instructor(self):
+        self.client.force_authenticate(user=self.students[0])
+        response = self.client.post(
+            f'/enrollments/enroll/{self.course.id}/cohort/',
+            {'user_ids': [self.students[1].id]}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class EnrollmentStatusTestCase(TestCase):
+    def setUp(self):
+        # Deletes must reach every worker, so the cache needs a shared backend
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        shared = override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                'LOCATION': location.name}},
+            ENROLLMENT_STATUS_CACHE_TIMEOUT=60,
+        )
+        shared.enable()
+        self.addCleanup(shared.disable)
+        instructor = User.objects.create_user('teacher', 'teacher@example.com', 'pass')
+        category = Category.objects.create(name="Programming")
+        self.courses = [
+            Course.objects.create(
+                title=f"Course {i}", description="", instructor=instructor, category=category, is_published=True)
+            for i in range(4)
+        ]
+        self.student = User.objects.create_user('student', 'student@example.com', 'pass')
+        Enrollment.objects.create(user=self.student, course=self.courses[0])
+        Enrollment.objects.create(user=self.student, course=self.courses[1], status='dropped')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+
+    def get_statuses(self):
+        ids = ','.join(str(course.id) for course in self.courses)
+        return self.client.get('/enrollments/statuses/', {'course_ids': ids})
+
+    def test_batch_lookup_is_cached(self):
+        with self.assertNumQueries(1):
+            response = self.get_statuses()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [response.data[str(course.id)]['status'] for course in self.courses],
+            ['active', 'dropped', None, None],
+        )
+        self.assertTrue(response.data[str(self.courses[0].id)]['is_enrolled'])
+        with self.assertNumQueries(0):
+            self.get_statuses()
+
+    def test_enrollment_changes_invalidate(self):
+        self.get_statuses()
+        self.client.post(f'/enrollments/enroll/{self.courses[2].id}/')
+        enroll_users(self.courses[3], [self.student.id])
+        enrollment = Enrollment.objects.get(user=self.student, course=self.courses[0])
+        enrollment.status = 'dropped'
+        enrollment.save()
+        self.assertEqual(
+            [self.get_statuses().data[str(course.id)]['status'] for course in self.courses],
+            ['dropped', 'dropped', 'active', 'active'],
+        )
+
+    def test_cache_needs_shared_backend(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'ENROLLMENT_STATUS_CACHE_TIMEOUT'):
+                check_shared_cache('ENROLLMENT_STATUS_CACHE_TIMEOUT')
+            # Without the check, a per-process cache would still be skipped
+            self.get_statuses()
+            with self.assertNumQueries(1):
+                self.get_statuses()
+            self.assertIsNone(cache.get(statuses._cache_key(self.student.id)))
+
+    def test_rejects_bad_ids(self):
+        self.assertEqual(self.client.get('/enrollments/statuses/', {'course_ids': '1,x'}).status_code, 400)
+        too_many = ','.join(str(i) for i in range(1, 102))
+        self.assertEqual(self.client.get('/enrollments/statuses/', {'course_ids': too_many}).status_code, 400)
+
+
+class EnrollmentLoggingTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        instructor = User.objects.create_user('teacher', 'teacher@example.com', 'pass')
+        self.course = Course.objects.create(
+            title="Python for Beginners", description="", instructor=instructor,
+            category=Category.objects.create(name="Programming"), is_published=True,
+        )
+        self.student = User.objects.create_user('student', 'student@example.com', 'pass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+
+    def test_enroll_logs_structured_event(self):
+        with self.assertLogs('enrollments.views', 'INFO') as logs:
+            response = self.client.post(
+                f'/enrollments/enroll/{self.course.id}/',
+                HTTP_AUTHORIZATION='Bearer secret-token', HTTP_X_REQUEST_ID='req-42',
+            )
+        self.assertEqual(response['X-Request-ID'], 'req-42')
+        [record] = logs.records
+        self.assertEqual(record.event, 'enrollment.created')
+        self.assertEqual(record.request_id, 'req-42')
+        self.assertEqual(record.user_id, self.student.id)
+        self.assertEqual(record.fields['enrollment_id'], response.data['enrollment_id'])
+        self.assertIsNotNone(record.elapsed_ms)
+        self.assertNotIn('secret-token', JsonFormatter().format(record))
+
+    @override_settings(LOG_EVENT_SAMPLE_RATES={'enrollment.check': 0.0})
+    def test_sampled_out_events_are_not_logged(self):
+        with self.assertNoLogs('enrollments.views', 'INFO'):
+            self.client.get(f'/enrollments/check/{self.course.id}/')
+
+    def test_redact(self):
+        self.assertEqual(
+            redact({'password': 'hunter2', 'note': 'sent Bearer abc.def', 'items': [{'api_key': 'k'}]}),
+            {'password': '[redacted]', 'note': 'sent Bearer [redacted]', 'items': [{'api_key': '[redacted]'}]},
+        )
+
+
+class ProgressCounterTestCase(TestCase):
+    def setUp(self):
+        self.instructor = User.objects.create_user('teacher', 'teacher@example.com', 'pass')
+        self.student = User.objects.create_user('student', 'student@example.com', 'pass')
+        self.course = Course.objects.create(
+            title="Python for Beginners",
+            description="Learn Python basics",
+            instructor=self.instructor,
+            category=Category.objects.create(name="Programming"),
+            is_published=True,
+        )
+        self.sections = [
+            Section.objects.create(course=self.course, title=f"Section {order}", order=order)
+            for order in range(4)
+        ]
+        self.course.refresh_from_db()
+        self.enrollment, _ = enroll_user(self.student, self.course)
+
+    def test_counters_follow_progress_and_sections(self):
+        self.assertEqual(self.course.section_count, 4)
+        self.assertEqual(self.enrollment.total_sections, 4)
+
+        progress = self.enrollment.progress.get(section=self.sections[0])
+        self.assertTrue(progress.mark_completed())
+        self.assertFalse(progress.mark_completed())
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.completed_sections, 1)
+        self.assertEqual(self.enrollment.progress_percentage, 25)
+
+        Section.objects.create(course=self.course, title="Extra", order=9)
+        self.sections[0].delete()
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.total_sections, 4)
+        self.assertEqual(self.enrollment.completed_sections, 0)
+
+    def test_reconcile_fixes_drift(self):
+        Enrollment.objects.filter(pk=self.enrollment.pk).update(total_sections=10, completed_sections=3)
+        Course.objects.filter(pk=self.course.pk).update(section_count=1)
+
+        self.assertEqual(reconcile_counters(), {'courses': 1, 'enrollments': 1})
+        self.enrollment.refresh_from_db()
+        self.assertEqual((self.enrollment.total_sections, self.enrollment.completed_sections), (4, 0))
+        self.assertEqual(reconcile_counters(), {'courses': 0, 'enrollments': 0})
+
+    def test_enrolled_list_is_one_query(self):
+        for i in range(3):
+            course = Course.objects.create(
+                title=f"Course {i}", description="More", instructor=self.instructor,
+                category=self.course.category, is_published=True)
+            enroll_user(self.student, course)
+        self.client.force_login(self.student)
+        self.client.get('/enrollments/enrolled/', HTTP_ACCEPT='application/json')  # warm the session
+
+        with self.assertNumQueries(3):  # session, user, enrollments
+            response = self.client.get('/enrollments/enrolled/', HTTP_ACCEPT='application/json')
+        self.assertEqual(len(response.json()), 4)
+        self.assertIn('progress_percentage', response.json()[0])
+
+
+class ProgressEventTestCase(TestCase):
+    def setUp(self):
+        instructor = User.objects.create_user('teacher', 'teacher@example.com', 'pass')
+        self.course = Course.objects.create(
+            title="Python for Beginners",
+            description="Learn Python basics",
+            instructor=instructor,
+            category=Category.objects.create(name="Programming"),
+            is_published=True,
+        )
+        self.lessons = []
+        for order in range(2):
+            section = Section.objects.create(course=self.course, title=f"Section {order}", order=order)
+            for lesson_order in range(2):
+                self.lessons.append(Lesson.objects.create(
+                    section=section, title=f"Lesson {order}.{lesson_order}", order=lesson_order))
+        self.student = User.objects.create_user('student', 'student@example.com', 'pass')
+        self.enrollment, _ = enroll_user(self.student, self.course)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+
+    def post_events(self, events):
+        return self.client.post('/enrollments/progress/events/', {'events': events}, format='json')
+
+    def completed(self, key, lesson):
+        return {'key': key, 'lesson_id': lesson.id, 'type': 'completed', 'timestamp': '2024-01-01T10:00:00Z'}
+
+    def test_batch_completes_sections_and_course(self):
+        events = [self.completed(f'e{i}', lesson) for i, lesson in enumerate(self.lessons[:3])]
+        events.append({'key': 'v1', 'lesson_id': self.lessons[3].id, 'type': 'viewed'})
+        response = self.post_events(events)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['accepted'], ['e0', 'e1', 'e2', 'v1'])
+        self.assertEqual(len(response.data['completed_sections']), 1)
+        self.assertEqual(response.data['completed_courses'], [])
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.completed_sections, 1)
+        self.assertEqual(Progress.objects.filter(enrollment=self.enrollment, last_accessed_at__isnull=False).count(), 2)
+
+        response = self.post_events([self.completed('e3', self.lessons[3])])
+        self.assertEqual(response.data['completed_courses'], [self.course.id])
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.status, 'completed')
+        self.assertEqual(self.enrollment.completed_sections, 2)
+
+    def test_replayed_batch_is_idempotent(self):
+        events = [self.completed('e0', self.lessons[0]), self.completed('e0', self.lessons[0])]
+        self.post_events(events)
+        response = self.post_events(events)
+        self.assertEqual(response.data['accepted'], [])
+        self.assertEqual(response.data['duplicate'], ['e0', 'e0'])
+        self.assertEqual(ProgressEvent.objects.filter(user=self.student).count(), 1)
+        self.assertEqual(LessonProgress.objects.filter(user=self.student).count(), 1)
+
+    def test_rejects_lessons_outside_enrollments(self):
+        self.enrollment.status = 'dropped'
+        self.enrollment.save()
+        response = self.post_events([self.completed('e0', self.lessons[0])])
+        self.assertEqual(response.data['rejected'], ['e0'])
+        self.assertFalse(ProgressEvent.objects.exists())
+
+        response = self.post_events([{'key': 'bad', 'lesson_id': self.lessons[0].id, 'type': 'skipped'}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_write_count_is_bounded(self):
+        events = [self.completed(f'e{i}', lesson) for i, lesson in enumerate(self.lessons)]
+        # savepoint, dedupe, lessons, enrollments, events, upsert,
+        # completions, 2 counts, 3 updates for the one enrollment, release
+        with self.assertNumQueries(13):
+            response = self.post_events(events)
+        self.assertEqual(response.data['completed_courses'], [self.course.id])
@@ -6,10 +6,13 @@ app_name = 'enrollments'
 
 urlpatterns = [
     path('enroll/<int:course_id>/', views.enroll_course, name='enroll_course'),
+    path('enroll/<int:course_id>/cohort/', views.enroll_cohort, name='enroll_cohort'),
     path('check/<int:course_id>/', views.check_enrollment, name='check_enrollment'),
+    path('statuses/', views.enrollment_statuses, name='enrollment_statuses'),
     path('enrolled/', views.EnrolledCoursesListView.as_view(), name='enrolled_courses'),
     path('progress/<int:pk>/', views.CourseProgressView.as_view(), name='course_progress'),
     path('unenroll/<slug:course_slug>/', views.unenroll_course, name='unenroll_course'),
     path('completion/<slug:course_slug>/', views.CourseCompletionView.as_view(), name='course_completion'),
+    path('progress/events/', views.record_progress_events, name='progress_events'),
     path('mark-complete/<int:content_id>/', views.mark_content_complete, name='mark_content_complete'),
 ]
\ No newline at end of file
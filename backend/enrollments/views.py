@@ -1,4 +1,8 @@
 # enrollments/views.py
+import csv
+import io
+import logging
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -15,15 +19,19 @@ from rest_framework.response import Response
 from rest_framework import status
 
 from .models import Enrollment, Progress
+from .progress import complete_lesson, ingest_events, parse_event
+from .services import enroll_user, enroll_users
+from .statuses import get_enrollment_statuses, is_enrolled
 from courses.models import Course, Module, Content
+from elearning_backend.instrumentation import log_event
+from elearning_backend.routers import replica_reads
+
+logger = logging.getLogger(__name__)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def enroll_course(request, course_id):
     try:
-        print(f"Attempting to enroll user {request.user.username} in course {course_id}")
-        print(f"Auth header: {request.headers.get('Authorization', 'No Auth header')}")
-        
         if not request.user.is_authenticated:
             return Response(
                 {'message': 'Authentication required'},
@@ -34,57 +42,17 @@ def enroll_course(request, course_id):
         try:
             course = Course.objects.get(id=course_id)
         except Course.DoesNotExist:
+            log_event(logger, 'enrollment.course_not_found', level=logging.WARNING, course_id=course_id)
             return Response(
                 {'message': f'Course with ID {course_id} not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Check if already enrolled
-        existing_enrollment = Enrollment.objects.filter(
-            user=request.user,
-            course=course
-        ).first()
-        
-        if existing_enrollment:
-            print(f"Found existing enrollment with status: {existing_enrollment.status}")
-            if existing_enrollment.status == 'dropped':
-                # Reactivate dropped enrollment
-                existing_enrollment.status = 'active'
-                existing_enrollment.save()
-                return Response({
-                    'message': 'Successfully re-enrolled in course',
-                    'enrollment_id': existing_enrollment.id
-                }, status=status.HTTP_200_OK)
-            else:
-                return Response({
-                    'message': 'You are already enrolled in this course',
-                    'enrollment_id': existing_enrollment.id
-                }, status=status.HTTP_400_BAD_REQUEST)
-        
-        print("Creating new enrollment")
-        # Create new enrollment
+        # Enrollment and its progress records are written in one transaction
         try:
-            enrollment = Enrollment.objects.create(
-                user=request.user,
-                course=course,
-                status='active'
-            )
-            
-            # Create progress records for each section
-            for section in course.sections.all():
-                Progress.objects.create(
-                    enrollment=enrollment,
-                    section=section
-                )
-            
-            print(f"Successfully created enrollment with ID: {enrollment.id}")
-            return Response({
-                'message': 'Successfully enrolled in course',
-                'enrollment_id': enrollment.id
-            }, status=status.HTTP_201_CREATED)
-            
+            enrollment, outcome = enroll_user(request.user, course)
         except Exception as e:
-            print(f"Error creating enrollment: {str(e)}")
+            log_event(logger, 'enrollment.failed', level=logging.ERROR, course_id=course_id, error=str(e))
             return Response({
                 'message': f'Error creating enrollment: {str(e)}',
                 'details': {
@@ -93,20 +61,91 @@ def enroll_course(request, course_id):
                 }
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        log_event(logger, f'enrollment.{outcome}', course_id=course_id, enrollment_id=enrollment.id,
+                  enrollment_status=enrollment.status)
+        if outcome == 'reactivated':
+            return Response({
+                'message': 'Successfully re-enrolled in course',
+                'enrollment_id': enrollment.id
+            }, status=status.HTTP_200_OK)
+        if outcome == 'exists':
+            return Response({
+                'message': 'You are already enrolled in this course',
+                'enrollment_id': enrollment.id
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'message': 'Successfully enrolled in course',
+            'enrollment_id': enrollment.id
+        }, status=status.HTTP_201_CREATED)
+        
     except Exception as e:
-        print(f"Unexpected error in enroll_course: {str(e)}")
+        log_event(logger, 'enrollment.error', level=logging.ERROR, exc_info=True, course_id=course_id)
         return Response({
             'message': f'An unexpected error occurred: {str(e)}',
             'error_type': type(e).__name__
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+MAX_COHORT_SIZE = 10000
+
+
+def parse_cohort_user_ids(request):
+    """Read user ids from a CSV upload, a text/csv body or a JSON ``user_ids`` list"""
+    # text/csv has no DRF parser, so read the raw body before touching request.data
+    if request.content_type.startswith('text/csv'):
+        text = request.body.decode('utf-8-sig')
+    elif 'file' in request.FILES:
+        text = request.FILES['file'].read().decode('utf-8-sig')
+    else:
+        user_ids = request.data.get('user_ids') if isinstance(request.data, dict) else None
+        if not isinstance(user_ids, list):
+            raise ValueError('Provide a "user_ids" list or a CSV of user ids')
+        return [int(user_id) for user_id in user_ids]
+    
+    user_ids = []
+    for row in csv.reader(io.StringIO(text)):
+        if not row or not row[0].strip():
+            continue
+        value = row[0].strip()
+        if not user_ids and not value.isdigit():
+            continue  # Header row
+        user_ids.append(int(value))
+    return user_ids
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def enroll_cohort(request, course_id):
+    course = get_object_or_404(Course, id=course_id)
+    
+    if not (request.user.is_staff or course.instructor_id == request.user.id):
+        return Response(
+            {'message': 'Only the course instructor or an admin can enroll students'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    try:
+        user_ids = parse_cohort_user_ids(request)
+    except (ValueError, TypeError, UnicodeDecodeError) as e:
+        return Response({'message': f'Invalid cohort: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if len(user_ids) > MAX_COHORT_SIZE:
+        return Response(
+            {'message': f'At most {MAX_COHORT_SIZE} users can be enrolled per request'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    result = enroll_users(course, user_ids)
+    return Response({
+        'created': len(result['created']),
+        'reactivated': len(result['reactivated']),
+        'already_enrolled': len(result['already_enrolled']),
+        'unknown_user_ids': result['unknown'],
+    }, status=status.HTTP_200_OK)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def check_enrollment(request, course_id):
     try:
-        print(f"Checking enrollment for user {request.user.username} in course {course_id}")
-        print(f"Auth header: {request.headers.get('Authorization', 'No Auth header')}")
-        
         if not request.user.is_authenticated:
             return Response(
                 {'message': 'Authentication required'},
@@ -114,21 +153,43 @@ def check_enrollment(request, course_id):
             )
             
         course = get_object_or_404(Course, id=course_id)
-        is_enrolled = Enrollment.objects.filter(
-            user=request.user,
-            course=course,
-            status='active'
-        ).exists()
-        
-        return Response({'is_enrolled': is_enrolled})
+        enrolled = is_enrolled(request.user, course.id)
+        log_event(logger, 'enrollment.check', course_id=course_id, is_enrolled=enrolled)
+        return Response({'is_enrolled': enrolled})
         
     except Exception as e:
-        print(f"Error checking enrollment: {str(e)}")
+        log_event(logger, 'enrollment.check_failed', level=logging.WARNING, course_id=course_id, error=str(e))
         return Response(
             {'message': str(e)},
             status=status.HTTP_400_BAD_REQUEST
         )
 
+MAX_STATUS_BATCH = 100
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def enrollment_statuses(request):
+    """Enrollment status for up to MAX_STATUS_BATCH courses: ?course_ids=1,2,3"""
+    try:
+        course_ids = list(dict.fromkeys(
+            int(value) for value in request.query_params.get('course_ids', '').split(',') if value.strip()
+        ))
+    except ValueError:
+        return Response({'message': 'course_ids must be a comma-separated list of integers'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if not course_ids:
+        return Response({'message': 'No course_ids given'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(course_ids) > MAX_STATUS_BATCH:
+        return Response({'message': f'At most {MAX_STATUS_BATCH} course_ids per request'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    statuses = get_enrollment_statuses(request.user, course_ids)
+    log_event(logger, 'enrollment.statuses', course_count=len(course_ids))
+    return Response({
+        str(course_id): {'is_enrolled': course_status == 'active', 'status': course_status}
+        for course_id, course_status in statuses.items()
+    })
+
 @login_required
 def unenroll_course(request, course_slug):
     course = get_object_or_404(Course, slug=course_slug)
@@ -144,43 +205,46 @@ def unenroll_course(request, course_slug):
 
 @login_required
 def mark_content_complete(request, content_id):
-    content = get_object_or_404(Content, id=content_id)
-    course = content.module.course
-    enrollment = get_object_or_404(Enrollment, user=request.user, course=course)
-    
-    progress, created = enrollment.progress.get_or_create(content=content)
-    progress.completed = True
-    progress.save()
-    
-    # Check if all content is completed
-    total_content = course.modules.aggregate(total= models.Count('contents'))['total']
-    completed_content = enrollment.progress.filter(completed=True).count()
-    
-    if total_content == completed_content:
-        enrollment.status = 'completed'
-        enrollment.completion_date = timezone.now()
-        enrollment.save()
-        messages.success(request, f"Congratulations! You have completed the course {course.title}.")
+    content = get_object_or_404(Content.objects.select_related('section'), id=content_id)
+    section = content.section
+    get_object_or_404(Enrollment, user=request.user, course_id=section.course_id)
     
-    # Redirect to next content or module
-    next_content = None
-    contents = list(content.module.contents.all())
-    current_index = contents.index(content)
+    completed_sections, completed_courses = complete_lesson(request.user, content)
+    if completed_courses:
+        messages.success(request, "Congratulations! You have completed the course.")
+        return redirect('courses:course_detail', course_id=section.course_id)
     
-    if current_index < len(contents) - 1:
-        next_content = contents[current_index + 1]
-        return redirect('courses:content_detail', content_id=next_content.id)
+    # Next lesson in this section, or the first lesson of a later section
+    next_content = Content.objects.filter(
+        Q(section=section, order__gt=content.order)
+        | Q(section__course_id=section.course_id, section__order__gt=section.order)
+    ).order_by('section__order', 'order', 'id').first()
+    if next_content:
+        return redirect('courses:lesson_detail', lesson_id=next_content.id)
     
-    # If no next content, go to next module
-    modules = list(course.modules.all())
-    current_module_index = modules.index(content.module)
+    return redirect('courses:course_detail', course_id=section.course_id)
+
+MAX_EVENTS_PER_BATCH = 500
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def record_progress_events(request):
+    """Ingest a batch of learning-player events for the current user"""
+    events = request.data.get('events') if isinstance(request.data, dict) else None
+    if not isinstance(events, list) or not events:
+        return Response({'error': 'Expected a non-empty "events" list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(events) > MAX_EVENTS_PER_BATCH:
+        return Response(
+            {'error': f'At most {MAX_EVENTS_PER_BATCH} events per batch'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
     
-    if current_module_index < len(modules) - 1:
-        next_module = modules[current_module_index + 1]
-        return redirect('courses:module_detail', course_slug=course.slug, module_id=next_module.id)
+    try:
+        events = [parse_event(event) for event in events]
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    # If no next module, go to course completion page
-    return redirect('enrollments:course_completion', course_slug=course.slug)
+    return Response(ingest_events(request.user, events))
 
 class EnrolledCoursesListView(LoginRequiredMixin, ListView):
     template_name = 'enrollments/enrolled_courses.html'
@@ -190,7 +254,7 @@ class EnrolledCoursesListView(LoginRequiredMixin, ListView):
         return Enrollment.objects.filter(
             user=self.request.user,
             status='active'
-        ).select_related('course')
+        ).select_related('course__instructor', 'course__category')
     
     def render_to_response(self, context, **response_kwargs):
         if self.request.headers.get('Accept') == 'application/json':
@@ -211,7 +275,8 @@ class EnrolledCoursesListView(LoginRequiredMixin, ListView):
                     'price': str(course.price),
                     'duration_in_weeks': course.duration_in_weeks,
                     'enrolled_at': enrollment.created_at.isoformat(),
-                    'status': enrollment.status
+                    'status': enrollment.status,
+                    'progress_percentage': enrollment.progress_percentage
                 })
             return JsonResponse(data, safe=False)
         return super().render_to_response(context, **response_kwargs)
@@ -266,10 +331,11 @@ class CourseCompletionView(LoginRequiredMixin, DetailView):
         enrollment = get_object_or_404(Enrollment, user=user, course=course)
         context['enrollment'] = enrollment
         
-        # Suggest related courses
-        context['related_courses'] = Course.objects.filter(
-            category=course.category,
-            is_published=True
-        ).exclude(id=course.id)[:3]
+        # Suggest related courses; catalog data can come from a replica
+        with replica_reads():
+            context['related_courses'] = list(Course.objects.filter(
+                category=course.category,
+                is_published=True
+            ).exclude(id=course.id)[:3])
         
         return context
\ No newline at end of file
@@ -0,0 +1,259 @@
+# exams/analytics.py
+"""
+Instructor analytics for graded exam attempts.
+
+ExamStats and QuestionStats hold running sums (count, sum and sum of
+squares of scores, a 10-bucket histogram, and per question the sums needed
+for the difficulty index and the item-total correlation). Every grading
+path feeds its before/after values through a StatsDelta, so the report is
+built from a handful of rows instead of the Answer table. The median and
+the pass rate are read from the ``(exam, status, score)`` index at report
+time, which keeps them exact when ``passing_score`` changes.
+
+``rebuild_exam_stats`` recomputes everything from streamed value tuples,
+vectorized with NumPy when it is installed (it is in requirements.txt; the
+pure-Python loop keeps bare checkouts working).
+"""
+import math
+
+from django.db import transaction
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from elearning_backend.routers import primary_reads
+from .answer_key import compile_answer_key
+from .models import Answer, ExamAttempt, ExamStats, QuestionStats
+
+HISTOGRAM_BUCKETS = 10
+STREAM_CHUNK_SIZE = 5000
+
+
+def _bucket(score):
+    return min(int(score // (100 / HISTOGRAM_BUCKETS)), HISTOGRAM_BUCKETS - 1)
+
+
+def attempt_vector(key, answers):
+    """Fraction of each question's points earned in one attempt, by question id"""
+    vector = {}
+    for answer in answers:
+        question = key.by_id.get(answer.question_id)
+        if question is not None and question.points and answer.points_earned is not None:
+            vector[answer.question_id] = float(answer.points_earned) / question.points
+    return vector
+
+
+class StatsDelta:
+    """Graded-attempt changes collected during a grading run, applied in one go"""
+
+    def __init__(self):
+        self._exams = {}
+
+    def _exam(self, exam_id):
+        if exam_id not in self._exams:
+            self._exams[exam_id] = {
+                'count': 0, 'sum': 0.0, 'sq_sum': 0.0,
+                'histogram': [0] * HISTOGRAM_BUCKETS, 'questions': {},
+            }
+        return self._exams[exam_id]
+
+    def add(self, exam_id, score, vector, sign=1):
+        """Count a graded attempt with this score and attempt_vector()"""
+        delta = self._exam(exam_id)
+        score = float(score or 0)
+        delta['count'] += sign
+        delta['sum'] += sign * score
+        delta['sq_sum'] += sign * score * score
+        delta['histogram'][_bucket(score)] += sign
+        for question_id, earned in vector.items():
+            sums = delta['questions'].setdefault(question_id, [0.0, 0.0, 0.0])
+            sums[0] += sign * earned
+            sums[1] += sign * earned * earned
+            sums[2] += sign * earned * score
+
+    def remove(self, exam_id, score, vector):
+        """Uncount an attempt that was graded before this run"""
+        self.add(exam_id, score, vector, sign=-1)
+
+    def apply(self):
+        """Fold the changes into the stored stats; call after the grading writes"""
+        for exam_id, delta in self._exams.items():
+            with transaction.atomic():
+                stats = ExamStats.objects.select_for_update().filter(exam_id=exam_id).first()
+                if stats is None:
+                    # Not materialized yet; the first report rebuilds it
+                    # from the rows this run just wrote
+                    continue
+                stats.attempt_count += delta['count']
+                stats.score_sum += delta['sum']
+                stats.score_sq_sum += delta['sq_sum']
+                stats.histogram = [a + b for a, b in zip(stats.histogram, delta['histogram'])]
+                stats.save(update_fields=['attempt_count', 'score_sum', 'score_sq_sum', 'histogram', 'updated_at'])
+                _apply_question_sums(exam_id, delta['questions'])
+        self._exams = {}
+
+
+def _apply_question_sums(exam_id, sums_by_question):
+    existing = {
+        row.question_id: row
+        for row in QuestionStats.objects.select_for_update().filter(
+            exam_id=exam_id, question_id__in=list(sums_by_question))
+    }
+    new_rows = []
+    for question_id, (earned, earned_sq, earned_score) in sums_by_question.items():
+        row = existing.get(question_id)
+        if row is None:
+            # Questions added after the stats were built: earlier attempts
+            # earned nothing on them, so the delta is the whole sum
+            row = QuestionStats(question_id=question_id, exam_id=exam_id)
+            new_rows.append(row)
+        row.earned_sum += earned
+        row.earned_sq_sum += earned_sq
+        row.earned_score_sum += earned_score
+    QuestionStats.objects.bulk_update(
+        list(existing.values()), ['earned_sum', 'earned_sq_sum', 'earned_score_sum'])
+    QuestionStats.objects.bulk_create(new_rows, ignore_conflicts=True)
+
+
+def _stream_matrix(exam_id, key):
+    """Scores of the graded attempts plus (row, column, earned fraction) cells"""
+    rows = {}
+    scores = []
+    for attempt_id, score in ExamAttempt.objects.filter(exam_id=exam_id, status='graded').values_list(
+        'id', 'score'
+    ).iterator(chunk_size=STREAM_CHUNK_SIZE):
+        rows[attempt_id] = len(scores)
+        scores.append(float(score or 0))
+
+    columns = {question.id: index for index, question in enumerate(key.questions)}
+    cells = []
+    for attempt_id, question_id, points_earned in Answer.objects.filter(
+        attempt__exam_id=exam_id, attempt__status='graded', points_earned__isnull=False,
+    ).values_list('attempt_id', 'question_id', 'points_earned').iterator(chunk_size=STREAM_CHUNK_SIZE):
+        question = key.by_id.get(question_id)
+        row = rows.get(attempt_id)
+        if question is not None and question.points and row is not None:
+            cells.append((row, columns[question_id], float(points_earned) / question.points))
+    return scores, cells
+
+
+def _sums(scores, cells, question_count):
+    """(score sums, histogram, per-question [earned, earned_sq, earned*score])"""
+    if np is not None:
+        y = np.asarray(scores, dtype=float)
+        buckets = np.minimum(y // (100 / HISTOGRAM_BUCKETS), HISTOGRAM_BUCKETS - 1).astype(int)
+        histogram = np.bincount(buckets, minlength=HISTOGRAM_BUCKETS).tolist()
+        questions = np.zeros((question_count, 3))
+        if cells:
+            cell_array = np.asarray(cells, dtype=float)
+            row, column, earned = cell_array[:, 0].astype(int), cell_array[:, 1].astype(int), cell_array[:, 2]
+            # Per-column sums without building the attempts x questions matrix
+            for index, weights in enumerate((earned, earned * earned, earned * y[row])):
+                questions[:, index] = np.bincount(column, weights=weights, minlength=question_count)
+        return (len(scores), float(y.sum()), float(y @ y)), histogram, questions.tolist()
+
+    histogram = [0] * HISTOGRAM_BUCKETS
+    for score in scores:
+        histogram[_bucket(score)] += 1
+    questions = [[0.0, 0.0, 0.0] for _ in range(question_count)]
+    for row, column, earned in cells:
+        sums = questions[column]
+        sums[0] += earned
+        sums[1] += earned * earned
+        sums[2] += earned * scores[row]
+    return (len(scores), sum(scores), sum(score * score for score in scores)), histogram, questions
+
+
+def rebuild_exam_stats(exam_id):
+    """Recompute an exam's stored stats from scratch; returns the ExamStats"""
+    # Incremental updates build on the stored sums, so they must start from
+    # the primary's data even when the analytics view reads from a replica
+    with primary_reads(), transaction.atomic():
+        key = compile_answer_key(exam_id)
+        scores, cells = _stream_matrix(exam_id, key)
+        (count, total, total_sq), histogram, questions = _sums(scores, cells, len(key.questions))
+        stats, _ = ExamStats.objects.update_or_create(exam_id=exam_id, defaults={
+            'attempt_count': count,
+            'score_sum': total,
+            'score_sq_sum': total_sq,
+            'histogram': histogram,
+        })
+        QuestionStats.objects.filter(exam_id=exam_id).delete()
+        QuestionStats.objects.bulk_create([
+            QuestionStats(
+                question_id=question.id,
+                exam_id=exam_id,
+                earned_sum=earned,
+                earned_sq_sum=earned_sq,
+                earned_score_sum=earned_score,
+            )
+            for question, (earned, earned_sq, earned_score) in zip(key.questions, questions)
+        ])
+    return stats
+
+
+def _median(exam_id, count):
+    """Exact median score via the (exam, status, score) index"""
+    if not count:
+        return None
+    graded = ExamAttempt.objects.filter(exam_id=exam_id, status='graded').order_by('score')
+    middle = list(graded.values_list('score', flat=True)[(count - 1) // 2:count // 2 + 1])
+    return float(sum(middle)) / len(middle) if middle else None
+
+
+def exam_report(exam):
+    """JSON-ready analytics for one exam"""
+    stats = ExamStats.objects.filter(exam=exam).first()
+    if stats is not None:
+        return _report(exam, stats)
+    stats = rebuild_exam_stats(exam.id)
+    # The rows just written may not have reached a replica yet
+    with primary_reads():
+        return _report(exam, stats)
+
+
+def _report(exam, stats):
+    n = stats.attempt_count
+    mean = stats.score_sum / n if n else None
+    score_var = max(stats.score_sq_sum / n - mean * mean, 0.0) if n else None
+    passed = ExamAttempt.objects.filter(exam=exam, status='graded', score__gte=exam.passing_score).count()
+
+    questions = []
+    for row in QuestionStats.objects.filter(exam=exam).select_related('question').order_by(
+        'question__order', 'question_id'
+    ):
+        difficulty = discrimination = None
+        if n:
+            difficulty = row.earned_sum / n
+            earned_var = max(row.earned_sq_sum / n - difficulty * difficulty, 0.0)
+            covariance = row.earned_score_sum / n - difficulty * mean
+            if earned_var > 0 and score_var > 0:
+                discrimination = covariance / math.sqrt(earned_var * score_var)
+        questions.append({
+            'question_id': row.question_id,
+            'order': row.question.order,
+            'question_type': row.question.question_type,
+            # Share of the question's points earned; higher means easier
+            'difficulty': difficulty,
+            # Item-total (point-biserial) correlation
+            'discrimination': discrimination,
+        })
+
+    width = 100 // HISTOGRAM_BUCKETS
+    return {
+        'exam_id': exam.id,
+        'attempt_count': n,
+        'mean': mean,
+        'median': _median(exam.id, n),
+        'stddev': math.sqrt(score_var) if n else None,
+        'passing_score': exam.passing_score,
+        'pass_rate': passed / n if n else None,
+        'histogram': [
+            {'min': bucket * width, 'max': (bucket + 1) * width, 'count': count}
+            for bucket, count in enumerate(stats.histogram)
+        ],
+        'questions': questions,
+        'updated_at': stats.updated_at.isoformat(),
+    }
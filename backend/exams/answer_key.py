@@ -0,0 +1,117 @@
+# exams/answer_key.py
+"""
+Compiled, cached exam answer keys.
+
+An AnswerKey holds everything take_exam and the grader need about an exam's
+questions as plain tuples: question order, text, points, choice ids and the
+correct choice ids. Keys are cached in the Django cache under the exam's
+``answer_key_version``, which the signals in ``exams.signals`` bump in the
+same transaction as any Question or Choice change. The version lives in the
+database, so every process (web workers and ``run_grading_worker`` alike)
+sees a bump once it commits, whatever the cache backend. Each process also
+keeps the last key per exam for ``EXAM_ANSWER_KEY_LOCAL_TTL`` seconds
+before checking the version again, so a running exam costs at most one
+small query per exam every few seconds.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from elearning_backend.routers import primary_reads
+from .models import Choice, Exam, Question
+
+AUTO_GRADED_TYPES = ('multiple_choice', 'true_false')
+
+ANSWER_KEY_CACHE_TIMEOUT = getattr(settings, 'EXAM_ANSWER_KEY_CACHE_TIMEOUT', 60 * 60)
+
+CompiledChoice = namedtuple('CompiledChoice', ['id', 'text'])
+CompiledQuestion = namedtuple('CompiledQuestion', ['id', 'text', 'question_type', 'points', 'order', 'choices'])
+AnswerKey = namedtuple('AnswerKey', ['exam_id', 'questions', 'by_id', 'correct_choices', 'total_points', 'has_manual'])
+
+_local = {}
+_local_lock = threading.Lock()
+
+
+def compile_answer_key(exam_id):
+    """Build an exam's AnswerKey from the database in two queries"""
+    choices = {}
+    correct = {}
+    for choice_id, question_id, text, is_correct in Choice.objects.filter(
+        question__exam_id=exam_id
+    ).order_by('id').values_list('id', 'question_id', 'choice_text', 'is_correct'):
+        choices.setdefault(question_id, []).append(CompiledChoice(choice_id, text))
+        if is_correct:
+            correct.setdefault(question_id, set()).add(choice_id)
+
+    questions = tuple(
+        CompiledQuestion(
+            id=question_id,
+            text=text,
+            question_type=question_type,
+            points=points,
+            order=order,
+            choices=tuple(choices.get(question_id, ())),
+        )
+        for question_id, text, question_type, points, order in Question.objects.filter(exam_id=exam_id)
+        .order_by('order', 'id')
+        .values_list('id', 'question_text', 'question_type', 'points', 'order')
+    )
+    return AnswerKey(
+        exam_id=exam_id,
+        questions=questions,
+        by_id={question.id: question for question in questions},
+        correct_choices={question_id: frozenset(ids) for question_id, ids in correct.items()},
+        total_points=sum(question.points for question in questions),
+        has_manual=any(question.question_type not in AUTO_GRADED_TYPES for question in questions),
+    )
+
+
+def _entry_key(exam_id, version):
+    return f'exam-answer-key:{exam_id}:{version}'
+
+
+def _current_version(exam_id):
+    # created_at keeps a recreated exam that reuses a deleted one's id from
+    # picking up its cached key
+    row = Exam.objects.filter(pk=exam_id).values_list('answer_key_version', 'created_at').first()
+    return f'{row[0]}-{row[1].timestamp():.6f}' if row else None
+
+
+def forget_local(exam_id):
+    """Drop this process's copy of the exam's key"""
+    with _local_lock:
+        _local.pop(exam_id, None)
+
+
+def bump_version(exam_id):
+    """Invalidate the exam's key everywhere once the current transaction commits"""
+    Exam.objects.filter(pk=exam_id).update(answer_key_version=F('answer_key_version') + 1)
+    forget_local(exam_id)
+
+
+def get_answer_key(exam_id):
+    """The exam's current AnswerKey, compiling it on a cache miss"""
+    now = time.monotonic()
+    local = _local.get(exam_id)
+    if local is not None and local[0] > now:
+        return local[2]
+
+    # Version and key both from the primary: a replica could pair the new
+    # version with the old questions
+    with primary_reads():
+        version = _current_version(exam_id)
+        if local is not None and local[1] == version:
+            answer_key = local[2]
+        else:
+            entry_key = _entry_key(exam_id, version)
+            answer_key = cache.get(entry_key)
+            if answer_key is None:
+                answer_key = compile_answer_key(exam_id)
+                cache.set(entry_key, answer_key, ANSWER_KEY_CACHE_TIMEOUT)
+    with _local_lock:
+        _local[exam_id] = (now + getattr(settings, 'EXAM_ANSWER_KEY_LOCAL_TTL', 5), version, answer_key)
+    return answer_key
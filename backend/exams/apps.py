@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ExamsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'exams'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from elearning_backend.caching import check_shared_cache
+        check_shared_cache('UPCOMING_EXAMS_CACHE_TIMEOUT')
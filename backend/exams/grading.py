@@ -0,0 +1,206 @@
+# exams/grading.py
+"""
+Set-based auto-grader.
+
+Answers are scored in memory against the exam's cached AnswerKey (see
+``exams.answer_key``) and the results go back with ``bulk_update``.
+``regrade_exam`` runs the same scoring over every finished attempt of an
+exam in batches, which is what to use after an instructor corrects a
+``Choice.is_correct``.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    Case, DecimalField, Exists, F, FloatField, OuterRef, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Cast, Coalesce, Round
+from django.utils import timezone
+
+from .analytics import StatsDelta, attempt_vector
+from .answer_key import AUTO_GRADED_TYPES, bump_version, compile_answer_key, get_answer_key
+from .models import Answer, ExamAttempt
+
+ANSWER_FIELDS = ('id', 'attempt_id', 'question_id', 'selected_choice_id', 'is_correct', 'points_earned')
+BATCH_SIZE = 500
+SCORE_PLACES = Decimal('0.01')
+
+
+def score_answers(key, answers):
+    """
+    Score one attempt's answers in place.
+
+    Auto-graded answers get ``is_correct`` and ``points_earned`` from the
+    key; manually graded ones keep whatever points they already have.
+    Returns ``(score_percentage, changed_answers)``.
+    """
+    earned = Decimal(0)
+    changed = []
+    for answer in answers:
+        question = key.by_id.get(answer.question_id)
+        if question is None:
+            continue
+        points = question.points
+        if question.question_type in AUTO_GRADED_TYPES:
+            is_correct = answer.selected_choice_id in key.correct_choices.get(answer.question_id, ())
+            points_earned = Decimal(points if is_correct else 0)
+            if answer.is_correct != is_correct or answer.points_earned != points_earned:
+                answer.is_correct = is_correct
+                answer.points_earned = points_earned
+                changed.append(answer)
+            earned += points_earned
+        elif answer.points_earned is not None:
+            earned += answer.points_earned
+
+    if not key.total_points:
+        return Decimal(0), changed
+    score = (earned * 100 / key.total_points).quantize(SCORE_PLACES)
+    return score, changed
+
+
+def awaits_instructor(key, answers):
+    """Whether any essay or short answer among ``answers`` still has no points"""
+    return key.has_manual and any(
+        answer.points_earned is None and answer.question_id in key.by_id
+        and key.by_id[answer.question_id].question_type not in AUTO_GRADED_TYPES
+        for answer in answers
+    )
+
+
+def grade_attempt(attempt, key=None):
+    """Finalize an in-progress attempt: score it and mark it submitted or graded"""
+    key = key or get_answer_key(attempt.exam_id)
+    answers = list(Answer.objects.filter(attempt=attempt).only(*ANSWER_FIELDS))
+    score, changed = score_answers(key, answers)
+
+    with transaction.atomic():
+        Answer.objects.bulk_update(changed, ['is_correct', 'points_earned'], batch_size=BATCH_SIZE)
+        attempt.score = score
+        attempt.end_time = attempt.end_time or timezone.now()
+        # Essay or short answers not graded yet still need an instructor
+        attempt.status = 'submitted' if awaits_instructor(key, answers) else 'graded'
+        attempt.save(update_fields=['score', 'end_time', 'status'])
+        if attempt.status == 'graded':
+            delta = StatsDelta()
+            delta.add(attempt.exam_id, score, attempt_vector(key, answers))
+            delta.apply()
+    return attempt
+
+
+def regrade_exam(exam_id, batch_size=BATCH_SIZE):
+    """Re-score every finished attempt of an exam; returns attempts whose score changed"""
+    # Compile from the database rather than the cache: the key may have been
+    # fixed with a queryset update that sent no signals. For the same reason
+    # bump the version, so no process keeps grading with the old key.
+    bump_version(exam_id)
+    key = compile_answer_key(exam_id)
+    regraded = 0
+    last_id = 0
+    while True:
+        attempts = list(
+            ExamAttempt.objects.filter(exam_id=exam_id, id__gt=last_id)
+            .exclude(status='in_progress')
+            .order_by('id')
+            .only('id', 'score', 'status')[:batch_size]
+        )
+        if not attempts:
+            return regraded
+        last_id = attempts[-1].id
+
+        answers_by_attempt = {}
+        for answer in Answer.objects.filter(attempt__in=attempts).only(*ANSWER_FIELDS):
+            answers_by_attempt.setdefault(answer.attempt_id, []).append(answer)
+
+        changed_answers = []
+        changed_attempts = []
+        delta = StatsDelta()
+        for attempt in attempts:
+            answers = answers_by_attempt.get(attempt.id, [])
+            before = attempt_vector(key, answers)
+            score, changed = score_answers(key, answers)
+            changed_answers.extend(changed)
+            if attempt.status == 'graded' and (changed or attempt.score != score):
+                delta.remove(exam_id, attempt.score, before)
+                delta.add(exam_id, score, attempt_vector(key, answers))
+            if attempt.score != score:
+                attempt.score = score
+                changed_attempts.append(attempt)
+
+        with transaction.atomic():
+            Answer.objects.bulk_update(changed_answers, ['is_correct', 'points_earned'], batch_size=batch_size)
+            ExamAttempt.objects.bulk_update(changed_attempts, ['score'], batch_size=batch_size)
+            delta.apply()
+        regraded += len(changed_attempts)
+
+
+def recompute_scores(attempt_ids, total_points):
+    """
+    Recompute finished attempts' scores from their answers in one UPDATE.
+
+    Attempts with no ungraded answer left are marked ``graded``.
+    """
+    earned = (
+        Answer.objects.filter(attempt=OuterRef('pk')).order_by()
+        .values('attempt').annotate(total=Sum('points_earned')).values('total')
+    )
+    score_field = DecimalField(max_digits=5, decimal_places=2)
+    if total_points:
+        # Float arithmetic: SQLite stores whole decimals as integers and
+        # would otherwise divide them as integers
+        percentage = (
+            Coalesce(Subquery(earned, output_field=FloatField()), Value(0.0))
+            * Value(100.0) / Value(float(total_points))
+        )
+        score = Round(Cast(percentage, DecimalField(max_digits=9, decimal_places=4)), 2, output_field=score_field)
+    else:
+        score = Value(Decimal(0), output_field=score_field)
+    ungraded = Answer.objects.filter(attempt=OuterRef('pk'), points_earned__isnull=True)
+    return ExamAttempt.objects.filter(id__in=attempt_ids).exclude(status='in_progress').update(
+        score=score,
+        status=Case(When(Exists(ungraded), then=F('status')), default=Value('graded')),
+    )
+
+
+def apply_question_grades(question, grades):
+    """
+    Grade many answers to one question at once.
+
+    ``grades`` maps answer id to ``(points, feedback)``; points are clamped
+    to ``[0, question.points]`` and ids of other questions' answers are
+    ignored. Returns the number of answers graded.
+    """
+    key = get_answer_key(question.exam_id)
+    graded_ids = Answer.objects.filter(question=question, id__in=list(grades))
+    with transaction.atomic():
+        attempts = {
+            attempt.id: attempt
+            for attempt in ExamAttempt.objects.filter(id__in=graded_ids.values('attempt_id'))
+            .exclude(status='in_progress').only('id', 'score', 'status')
+        }
+        answers_by_attempt = {}
+        for answer in Answer.objects.filter(attempt_id__in=list(attempts)).only(*ANSWER_FIELDS, 'feedback'):
+            answers_by_attempt.setdefault(answer.attempt_id, []).append(answer)
+
+        delta = StatsDelta()
+        graded = []
+        for attempt_id, answers in answers_by_attempt.items():
+            attempt = attempts[attempt_id]
+            if attempt.status == 'graded':
+                delta.remove(question.exam_id, attempt.score, attempt_vector(key, answers))
+            for answer in answers:
+                if answer.question_id == question.id and answer.id in grades:
+                    points, feedback = grades[answer.id]
+                    answer.points_earned = min(max(points, Decimal(0)), Decimal(question.points))
+                    answer.feedback = feedback
+                    graded.append(answer)
+
+        Answer.objects.bulk_update(graded, ['points_earned', 'feedback'], batch_size=BATCH_SIZE)
+        recompute_scores(list(attempts), key.total_points)
+
+        for attempt_id, score, status in ExamAttempt.objects.filter(id__in=list(attempts)).values_list(
+            'id', 'score', 'status'
+        ):
+            if status == 'graded':
+                delta.add(question.exam_id, score, attempt_vector(key, answers_by_attempt[attempt_id]))
+        delta.apply()
+    return len(graded)
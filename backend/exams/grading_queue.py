@@ -0,0 +1,152 @@
+# exams/grading_queue.py
+"""
+Database-backed queue for auto-grading submitted attempts.
+
+``submit_exam`` only flips the attempt to ``submitted`` and inserts a
+GradingJob; the ``run_grading_worker`` command claims pending jobs in
+batches, grades every attempt of a batch with the in-memory scorer from
+``exams.grading`` and deletes the finished jobs. Only attempts still
+``submitted`` are graded; one an instructor graded first keeps its score. Failed jobs are retried
+with exponential backoff until MAX_TRIES, then left as ``failed`` for
+inspection. Jobs whose worker died are handed back after LOCK_TIMEOUT.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from .analytics import StatsDelta, attempt_vector
+from .answer_key import get_answer_key
+from .grading import ANSWER_FIELDS, BATCH_SIZE, awaits_instructor, score_answers
+from .models import Answer, ExamAttempt, GradingJob
+
+MAX_TRIES = 5
+RETRY_DELAY = timedelta(seconds=10)
+LOCK_TIMEOUT = timedelta(minutes=5)
+
+BatchResult = namedtuple('BatchResult', ['claimed', 'graded', 'failed'])
+
+
+def enqueue(attempt_ids):
+    """Queue attempts for grading; already queued attempts are left alone"""
+    GradingJob.objects.bulk_create(
+        [GradingJob(attempt_id=attempt_id) for attempt_id in attempt_ids],
+        ignore_conflicts=True,
+    )
+
+
+def claim_batch(worker, batch_size=BATCH_SIZE):
+    """Mark up to batch_size due jobs as running for this worker; returns (job id, attempt id) pairs"""
+    now = timezone.now()
+    with transaction.atomic():
+        due = GradingJob.objects.filter(status='pending', available_at__lte=now).order_by('available_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        job_ids = list(due.values_list('id', flat=True)[:batch_size])
+        if not job_ids:
+            return []
+        GradingJob.objects.filter(id__in=job_ids, status='pending').update(
+            status='running', locked_at=now, locked_by=worker, tries=F('tries') + 1)
+    return list(
+        GradingJob.objects.filter(id__in=job_ids, status='running', locked_by=worker, locked_at=now)
+        .values_list('id', 'attempt_id')
+    )
+
+
+def _retry(job_ids, error):
+    """Put failed jobs back with a backoff, or give up after MAX_TRIES"""
+    now = timezone.now()
+    GradingJob.objects.filter(id__in=job_ids, tries__gte=MAX_TRIES).update(
+        status='failed', locked_by='', last_error=error)
+    for tries, ids in _group_by_tries(job_ids).items():
+        GradingJob.objects.filter(id__in=ids).update(
+            status='pending',
+            locked_by='',
+            last_error=error,
+            available_at=now + RETRY_DELAY * 2 ** (tries - 1),
+        )
+
+
+def _group_by_tries(job_ids):
+    groups = {}
+    for job_id, tries in GradingJob.objects.filter(
+        id__in=job_ids, status='running', tries__lt=MAX_TRIES
+    ).values_list('id', 'tries'):
+        groups.setdefault(tries, []).append(job_id)
+    return groups
+
+
+def process_batch(worker, batch_size=BATCH_SIZE):
+    """Claim and grade one batch of jobs; returns a BatchResult"""
+    jobs = {attempt_id: job_id for job_id, attempt_id in claim_batch(worker, batch_size)}
+    if not jobs:
+        return BatchResult(0, 0, 0)
+
+    graded = []
+    failures = {}
+    try:
+        with transaction.atomic():
+            # Lock the attempts still waiting for the auto-grader. One an
+            # instructor graded in the meantime (or that never reached
+            # ``submitted``) is left alone: rescoring it would clobber the
+            # manual score and count it in the exam stats twice.
+            attempts = list(
+                ExamAttempt.objects.select_for_update()
+                .filter(id__in=list(jobs), status='submitted')
+                .only('id', 'exam_id', 'score', 'status')
+            )
+            answers_by_attempt = {}
+            for answer in Answer.objects.filter(attempt__in=attempts).only(*ANSWER_FIELDS):
+                answers_by_attempt.setdefault(answer.attempt_id, []).append(answer)
+
+            changed_answers = []
+            delta = StatsDelta()
+            for attempt in attempts:
+                answers = answers_by_attempt.get(attempt.id, [])
+                try:
+                    key = get_answer_key(attempt.exam_id)
+                    score, changed = score_answers(key, answers)
+                except Exception as e:
+                    failures[jobs[attempt.id]] = repr(e)
+                    continue
+                attempt.score = score
+                # Essay or short answers not graded yet still need an instructor
+                attempt.status = 'submitted' if awaits_instructor(key, answers) else 'graded'
+                if attempt.status == 'graded':
+                    delta.add(attempt.exam_id, score, attempt_vector(key, answers))
+                graded.append(attempt)
+                changed_answers.extend(changed)
+
+            Answer.objects.bulk_update(changed_answers, ['is_correct', 'points_earned'], batch_size=batch_size)
+            ExamAttempt.objects.bulk_update(graded, ['score', 'status'], batch_size=batch_size)
+            # Skipped attempts need no grading either, so their jobs go too
+            GradingJob.objects.filter(id__in=list(jobs.values())).exclude(id__in=list(failures)).delete()
+            delta.apply()
+    except Exception as e:
+        failures.update((job_id, repr(e)) for job_id in jobs.values())
+        graded = []
+
+    for error in set(failures.values()):
+        _retry([job_id for job_id, job_error in failures.items() if job_error == error], error)
+    return BatchResult(len(jobs), len(graded), len(failures))
+
+
+def requeue_stale(timeout=LOCK_TIMEOUT):
+    """Hand back running jobs whose worker died mid-batch; returns the count"""
+    return GradingJob.objects.filter(status='running', locked_at__lt=timezone.now() - timeout).update(
+        status='pending', locked_by='')
+
+
+def queue_stats():
+    """Queue depth and lag for monitoring"""
+    stats = GradingJob.objects.aggregate(
+        pending=Count('id', filter=Q(status='pending')),
+        running=Count('id', filter=Q(status='running')),
+        failed=Count('id', filter=Q(status='failed')),
+        oldest_pending=Min('enqueued_at', filter=Q(status='pending')),
+    )
+    oldest = stats.pop('oldest_pending')
+    stats['lag_seconds'] = (timezone.now() - oldest).total_seconds() if oldest else 0.0
+    return stats
@@ -0,0 +1,94 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from courses.models import Category, Course
+from exams.models import Exam, ExamAttempt
+from exams.sweeper import expired_attempts, sweep_expired
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Compare finding expired attempts by scanning in-progress rows vs. the expires_at index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=1_000_000)
+        parser.add_argument('--expired', type=int, default=2000, help='Expired in-progress attempts among them')
+        parser.add_argument('--active', type=int, default=2000, help='Running attempts among them')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Everything is rolled back so the benchmark never touches real data
+        with transaction.atomic():
+            self._populate(options, rng)
+            now = timezone.now()
+
+            started = time.perf_counter()
+            scanned = [
+                attempt.id
+                for attempt in ExamAttempt.objects.filter(status='in_progress').select_related('exam')
+                if (now - attempt.start_time).total_seconds() > attempt.exam.duration_minutes * 60
+            ]
+            scan_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            indexed = list(expired_attempts(now).values_list('id', flat=True))
+            index_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            swept = sweep_expired(now)
+            sweep_ms = (time.perf_counter() - started) * 1000
+
+            self.stdout.write(f"attempts: {options['attempts']}")
+            self.stdout.write(f"in-progress scan:  {len(scanned):>8} expired in {scan_ms:>9.1f} ms")
+            self.stdout.write(f"expires_at index:  {len(indexed):>8} expired in {index_ms:>9.1f} ms")
+            self.stdout.write(f"sweep + enqueue:   {swept:>8} submitted in {sweep_ms:>9.1f} ms")
+            transaction.set_rollback(True)
+
+    def _populate(self, options, rng):
+        instructor = User.objects.create_user('bench-instructor', 'bench@example.com', None)
+        students = User.objects.bulk_create([
+            User(username=f'bench-student-{i}', email=f'student{i}@example.com') for i in range(1000)
+        ])
+        course = Course.objects.create(
+            title='Bench course', description='', instructor=instructor,
+            category=Category.objects.create(name='Bench'),
+        )
+        now = timezone.now()
+        exams = [
+            Exam.objects.create(
+                title=f'Bench exam {i}', course=course, exam_type='quiz',
+                start_date=now - timedelta(days=365), end_date=now + timedelta(days=1),
+            )
+            for i in range(20)
+        ]
+
+        total = options['attempts']
+        batch = []
+        for i in range(total):
+            if i < options['expired']:
+                status, expires_at = 'in_progress', now - timedelta(minutes=rng.randint(1, 10_000))
+            elif i < options['expired'] + options['active']:
+                status, expires_at = 'in_progress', now + timedelta(minutes=rng.randint(1, 60))
+            else:
+                status, expires_at = 'graded', now - timedelta(days=rng.randint(1, 365))
+            batch.append(ExamAttempt(
+                exam=rng.choice(exams), user=rng.choice(students),
+                status=status, expires_at=expires_at, score=0,
+            ))
+            if len(batch) == 10_000:
+                ExamAttempt.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            ExamAttempt.objects.bulk_create(batch)
+        # bulk_create stamps start_time with now; line it up with the deadlines
+        # (every bench exam uses the default 60 minute duration)
+        ExamAttempt.objects.update(start_time=F('expires_at') - timedelta(minutes=60))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from exams.analytics import rebuild_exam_stats
+from exams.models import Exam
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized exam analytics from graded attempts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_ids', type=int, nargs='*', help='Defaults to every exam')
+
+    def handle(self, *args, **options):
+        exam_ids = options['exam_ids'] or list(Exam.objects.values_list('id', flat=True))
+        for exam_id in exam_ids:
+            rebuild_exam_stats(exam_id)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt analytics for {len(exam_ids)} exams'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from exams.grading import regrade_exam
+from exams.models import Exam
+
+
+class Command(BaseCommand):
+    help = 'Re-score every submitted attempt of an exam against its current answer key'
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_id', type=int)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if not Exam.objects.filter(pk=options['exam_id']).exists():
+            raise CommandError(f"Exam {options['exam_id']} does not exist")
+        regraded = regrade_exam(options['exam_id'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated the score of {regraded} attempts'))
@@ -0,0 +1,38 @@
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+
+from exams import grading_queue
+
+
+class Command(BaseCommand):
+    help = 'Grade queued exam attempts in batches until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the due jobs once and exit')
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        requeued = grading_queue.requeue_stale()
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale jobs')
+
+        while True:
+            started = time.perf_counter()
+            result = grading_queue.process_batch(worker, batch_size=options['batch_size'])
+            if result.claimed:
+                stats = grading_queue.queue_stats()
+                self.stdout.write(
+                    f'graded={result.graded} failed={result.failed} '
+                    f'batch_ms={(time.perf_counter() - started) * 1000:.1f} '
+                    f'depth={stats["pending"]} lag_s={stats["lag_seconds"]:.1f}'
+                )
+                continue
+            if options['once']:
+                return
+            grading_queue.requeue_stale()
+            time.sleep(options['sleep'])
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:36
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_expires_at(apps, schema_editor):
+    Exam = apps.get_model('exams', 'Exam')
+    ExamAttempt = apps.get_model('exams', 'ExamAttempt')
+    # Per exam, since the duration and end date live on the exam
+    for exam_id, duration_minutes, end_date in Exam.objects.values_list('id', 'duration_minutes', 'end_date'):
+        attempts = ExamAttempt.objects.filter(exam_id=exam_id)
+        attempts.filter(expires_at__isnull=True).update(
+            expires_at=F('start_time') + timedelta(minutes=duration_minutes))
+        attempts.filter(expires_at__gt=end_date).update(expires_at=end_date)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0002_grading_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examattempt',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='examattempt',
+            index=models.Index(fields=['status', 'expires_at'], name='attempt_expiry_idx'),
+        ),
+        migrations.RunPython(backfill_expires_at, migrations.RunPython.noop),
+    ]
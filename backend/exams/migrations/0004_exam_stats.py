@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0003_attempt_expires_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempt_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0)),
+                ('score_sq_sum', models.FloatField(default=0)),
+                ('histogram', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('earned_sum', models.FloatField(default=0)),
+                ('earned_sq_sum', models.FloatField(default=0)),
+                ('earned_score_sum', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='examattempt',
+            index=models.Index(fields=['exam', 'status', 'score'], name='attempt_score_idx'),
+        ),
+        migrations.AddField(
+            model_name='questionstats',
+            name='exam',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_stats', to='exams.exam'),
+        ),
+        migrations.AddField(
+            model_name='questionstats',
+            name='question',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='exams.question'),
+        ),
+        migrations.AddField(
+            model_name='examstats',
+            name='exam',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='exams.exam'),
+        ),
+    ]
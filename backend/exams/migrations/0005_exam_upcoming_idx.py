@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0004_exam_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(fields=['course', 'is_active', 'start_date'], name='exam_upcoming_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0005_exam_upcoming_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='answer_key_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,5 +1,8 @@
 # exams/models.py
+from datetime import timedelta
+
 from django.db import models
+from django.utils import timezone
 from accounts.models import User
 from courses.models import Course, Module
 
@@ -25,6 +28,12 @@ class Exam(models.Model):
     max_attempts = models.PositiveIntegerField(default=1)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    answer_key_version = models.PositiveIntegerField(default=0, editable=False)  # See exams.answer_key
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['course', 'is_active', 'start_date'], name='exam_upcoming_idx'),
+        ]
     
     def __str__(self):
         return f"{self.course.title} - {self.title}"
@@ -85,10 +94,29 @@ class ExamAttempt(models.Model):
     score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_progress')
     feedback = models.TextField(blank=True)
+    # Deadline for auto-submission, see exams.sweeper
+    expires_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='attempt_expiry_idx'),
+            models.Index(fields=['exam', 'status', 'score'], name='attempt_score_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.exam.title}"
     
+    def save(self, *args, **kwargs):
+        if self.pk is None and self.expires_at is None:
+            # The timer never runs past the end of the exam
+            self.expires_at = min(
+                timezone.now() + timedelta(minutes=self.exam.duration_minutes), self.exam.end_date)
+        super().save(*args, **kwargs)
+    
+    @property
+    def is_expired(self):
+        return self.expires_at is not None and self.expires_at <= timezone.now()
+    
     @property
     def is_passed(self):
         if self.score is None:
@@ -109,4 +137,52 @@ class Answer(models.Model):
         unique_together = ('attempt', 'question')
     
     def __str__(self):
-        return f"{self.attempt.user.username} - {self.question}"
\ No newline at end of file
+        return f"{self.attempt.user.username} - {self.question}"
+
+class GradingJob(models.Model):
+    """Queued auto-grading of a submitted attempt, see exams.grading_queue"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    )
+    
+    attempt = models.OneToOneField(ExamAttempt, on_delete=models.CASCADE, related_name='grading_job')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    tries = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    enqueued_at = models.DateTimeField(auto_now_add=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=64, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='grading_job_queue_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Grading job for attempt {self.attempt_id} ({self.status})"
+
+class ExamStats(models.Model):
+    """Running sums over an exam's graded attempts, see exams.analytics"""
+    exam = models.OneToOneField(Exam, on_delete=models.CASCADE, related_name='stats')
+    attempt_count = models.PositiveIntegerField(default=0)
+    score_sum = models.FloatField(default=0)
+    score_sq_sum = models.FloatField(default=0)
+    histogram = models.JSONField(default=list)  # Attempt counts per 10-point score bucket
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Stats for {self.exam_id}"
+
+class QuestionStats(models.Model):
+    """Running sums of the fraction of a question's points earned per graded attempt"""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, related_name='stats')
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='question_stats')
+    earned_sum = models.FloatField(default=0)
+    earned_sq_sum = models.FloatField(default=0)
+    earned_score_sum = models.FloatField(default=0)  # Sum of earned fraction * attempt score
+    
+    def __str__(self):
+        return f"Stats for question {self.question_id}"
@@ -0,0 +1,61 @@
+# exams/services.py
+"""
+Exam answer handling.
+
+Submitted values are resolved against the exam's compiled AnswerKey and
+scored in memory; the resulting rows are written with a single upsert on
+the ``(attempt, question)`` unique key.
+"""
+from .answer_key import AUTO_GRADED_TYPES
+from .models import Answer
+
+
+def resolve_choice(question, value):
+    """Find the submitted choice among the compiled question's choices"""
+    value = str(value).strip()
+    for choice in question.choices:
+        if str(choice.id) == value:
+            return choice
+    if question.question_type == 'true_false':
+        # True/false forms post the choice text rather than an id
+        for choice in question.choices:
+            if choice.text.lower() == value.lower():
+                return choice
+    return None
+
+
+def build_answers(attempt, answer_key, data):
+    """Unsaved Answer rows for the form values in ``data``"""
+    answers = []
+    for question in answer_key.questions:
+        value = data.get(f'question_{question.id}')
+        if not value:
+            continue
+        if question.question_type in AUTO_GRADED_TYPES:
+            choice = resolve_choice(question, value)
+            if choice is None:
+                # Not one of this question's choices
+                continue
+            answers.append(Answer(
+                attempt=attempt,
+                question_id=question.id,
+                selected_choice_id=choice.id,
+                is_correct=choice.id in answer_key.correct_choices.get(question.id, ()),
+            ))
+        else:
+            # Essay and short answers are graded later
+            answers.append(Answer(attempt=attempt, question_id=question.id, text_answer=value))
+    return answers
+
+
+def save_answers(attempt, answer_key, data):
+    """Upsert the attempt's answers in one statement; returns the rows written"""
+    answers = build_answers(attempt, answer_key, data)
+    if answers:
+        Answer.objects.bulk_create(
+            answers,
+            update_conflicts=True,
+            unique_fields=['attempt', 'question'],
+            update_fields=['selected_choice', 'text_answer', 'is_correct', 'points_earned'],
+        )
+    return answers
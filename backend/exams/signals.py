@@ -0,0 +1,49 @@
+# exams/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from enrollments.models import Enrollment
+from . import answer_key, upcoming
+from .models import Choice, Exam, Question
+
+
+def _bump_answer_key_version(exam_id):
+    # The version commits with the change. Forget this process's copy again
+    # after commit, so a concurrent reader cannot keep the pre-commit key.
+    answer_key.bump_version(exam_id)
+    transaction.on_commit(lambda: answer_key.forget_local(exam_id))
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_answer_key(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _bump_answer_key_version(instance.exam_id)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def invalidate_choice_answer_key(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    exam_id = Question.objects.filter(pk=instance.question_id).values_list('exam_id', flat=True).first()
+    if exam_id is not None:
+        _bump_answer_key_version(exam_id)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_upcoming_exams(sender, instance, **kwargs):
+    upcoming.invalidate_upcoming_exams([instance.user_id])
+
+
+@receiver(post_save, sender=Exam)
+@receiver(post_delete, sender=Exam)
+def invalidate_all_upcoming_exams(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Bump now and again after commit, as for the answer key
+    upcoming.bump_version()
+    transaction.on_commit(upcoming.bump_version)
@@ -0,0 +1,42 @@
+# exams/sweeper.py
+"""
+Auto-submission of attempts whose timer ran out.
+
+Every in-progress attempt carries an ``expires_at`` deadline (its timer,
+cut short by the exam's ``end_date``), and the
+``(status, expires_at)`` index turns "what has expired" into one range
+scan. Expired attempts are claimed in batches with the same
+in_progress -> submitted transition as ``submit_exam`` and handed to the
+grading queue, so abandoned attempts no longer stay in progress forever.
+"""
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import grading_queue
+from .models import ExamAttempt
+
+BATCH_SIZE = 500
+
+
+def expired_attempts(now=None):
+    return ExamAttempt.objects.filter(status='in_progress', expires_at__lte=now or timezone.now())
+
+
+def sweep_expired(now=None, batch_size=BATCH_SIZE):
+    """Submit and enqueue every attempt past its deadline; returns the count"""
+    now = now or timezone.now()
+    swept = 0
+    while True:
+        with transaction.atomic():
+            due = expired_attempts(now).order_by('expires_at', 'id')
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True)
+            attempt_ids = list(due.values_list('id', flat=True)[:batch_size])
+            if not attempt_ids:
+                return swept
+            # The deadline, not the sweep time, is when the attempt ended
+            ExamAttempt.objects.filter(id__in=attempt_ids, status='in_progress').update(
+                status='submitted', end_time=F('expires_at'))
+            grading_queue.enqueue(attempt_ids)
+        swept += len(attempt_ids)
@@ -1,3 +1,572 @@
-from django.test import TestCase
+import statistics
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from elearning_backend.caching import check_shared_cache
+from courses.models import Category, Course, Lesson, Section
+from enrollments.models import Enrollment
+from enrollments.progress import complete_lesson
+from enrollments.services import enroll_users
+from .answer_key import get_answer_key
+from . import analytics, grading_queue
+from .analytics import exam_report, rebuild_exam_stats
+from .grading import regrade_exam
+from .sweeper import sweep_expired
+from .upcoming import get_upcoming_exams
+from .models import Answer, Choice, Exam, ExamAttempt, ExamStats, GradingJob, Question
+
+
+class ExamTestMixin:
+    def create_exam(self, multiple_choice=2, true_false=1, essays=1):
+        cache.clear()
+        self.instructor = User.objects.create_user('teacher', 'teacher@example.com', 'pass')
+        self.student = User.objects.create_user('student', 'student@example.com', 'pass')
+        self.course = Course.objects.create(
+            title="Python for Beginners",
+            description="Learn Python basics",
+            instructor=self.instructor,
+            category=Category.objects.create(name="Programming"),
+            is_published=True,
+        )
+        now = timezone.now()
+        self.exam = Exam.objects.create(
+            title="Final",
+            course=self.course,
+            exam_type='final',
+            start_date=now - timedelta(days=1),
+            end_date=now + timedelta(days=1),
+        )
+        order = 0
+        for _ in range(multiple_choice):
+            question = Question.objects.create(
+                exam=self.exam, question_text="Pick one", question_type='multiple_choice', points=2, order=order)
+            Choice.objects.create(question=question, choice_text="Right", is_correct=True)
+            Choice.objects.create(question=question, choice_text="Wrong")
+            order += 1
+        for _ in range(true_false):
+            question = Question.objects.create(
+                exam=self.exam, question_text="True?", question_type='true_false', order=order)
+            Choice.objects.create(question=question, choice_text="True", is_correct=True)
+            Choice.objects.create(question=question, choice_text="False")
+            order += 1
+        for _ in range(essays):
+            Question.objects.create(exam=self.exam, question_text="Explain", question_type='essay', points=5, order=order)
+            order += 1
+        self.questions = list(self.exam.questions.prefetch_related('choices'))
+        self.attempt = ExamAttempt.objects.create(exam=self.exam, user=self.student)
+
+    def choice(self, question, correct=True):
+        return next(choice for choice in question.choices.all() if choice.is_correct == correct)
+
+
+class TakeExamTestCase(ExamTestMixin, TestCase):
+    def setUp(self):
+        self.create_exam()
+        self.client.force_login(self.student)
+
+    def form_data(self, correct=True):
+        data = {'save': '1'}
+        for question in self.questions:
+            if question.question_type == 'multiple_choice':
+                data[f'question_{question.id}'] = self.choice(question, correct).id
+            elif question.question_type == 'true_false':
+                data[f'question_{question.id}'] = 'true' if correct else 'false'
+            else:
+                data[f'question_{question.id}'] = 'Because.'
+        return data
+
+    def test_save_answers_scores_in_memory(self):
+        response = self.client.post(f'/exams/attempt/{self.attempt.id}/', self.form_data())
+        self.assertEqual(response.status_code, 302)
+
+        answers = {answer.question_id: answer for answer in self.attempt.answers.all()}
+        self.assertEqual(len(answers), 4)
+        for question in self.questions:
+            answer = answers[question.id]
+            if question.question_type == 'essay':
+                self.assertEqual(answer.text_answer, 'Because.')
+                self.assertIsNone(answer.is_correct)
+            else:
+                self.assertTrue(answer.is_correct)
+
+        # Saving again updates the same rows
+        self.client.post(f'/exams/attempt/{self.attempt.id}/', self.form_data(correct=False))
+        self.assertEqual(self.attempt.answers.count(), 4)
+        self.assertEqual(self.attempt.answers.filter(is_correct=False).count(), 3)
+
+    def test_ignores_choices_of_other_questions(self):
+        first, second = self.questions[:2]
+        self.client.post(f'/exams/attempt/{self.attempt.id}/', {
+            'save': '1',
+            f'question_{first.id}': self.choice(second).id,
+        })
+        self.assertFalse(Answer.objects.exists())
+
+    def test_query_count_does_not_depend_on_question_count(self):
+        # session, user, attempt, key version, questions, choices, upsert
+        with self.assertNumQueries(7):
+            self.client.post(f'/exams/attempt/{self.attempt.id}/', self.form_data())
+        # The compiled answer key is cached from then on
+        with self.assertNumQueries(4):
+            self.client.post(f'/exams/attempt/{self.attempt.id}/', self.form_data())
+
+
+class AnswerKeyTestCase(ExamTestMixin, TestCase):
+    def setUp(self):
+        self.create_exam()
+
+    def test_answer_key_is_compiled_once(self):
+        key = get_answer_key(self.exam.id)
+        self.assertEqual([question.id for question in key.questions], [question.id for question in self.questions])
+        self.assertEqual(key.total_points, 10)
+        self.assertTrue(key.has_manual)
+        first = self.questions[0]
+        self.assertEqual(key.correct_choices[first.id], {self.choice(first).id})
+        with self.assertNumQueries(0):
+            self.assertIs(get_answer_key(self.exam.id), key)
+
+    def test_choice_changes_invalidate_the_key(self):
+        first = self.questions[0]
+        get_answer_key(self.exam.id)
+        wrong = self.choice(first, correct=False)
+        wrong.is_correct = True
+        wrong.save()
+        self.assertIn(wrong.id, get_answer_key(self.exam.id).correct_choices[first.id])
+
+        Question.objects.create(exam=self.exam, question_text="Another", question_type='essay', points=3, order=9)
+        self.assertEqual(get_answer_key(self.exam.id).total_points, 13)
+
+    @override_settings(EXAM_ANSWER_KEY_LOCAL_TTL=0)
+    def test_other_processes_see_the_change(self):
+        first = self.questions[0]
+        key = get_answer_key(self.exam.id)
+        # Only the version check while nothing changed
+        with self.assertNumQueries(1):
+            self.assertIs(get_answer_key(self.exam.id), key)
+        # A change committed by another process: its local copy and
+        # cache are out of reach, the version is not
+        with mock.patch('exams.answer_key.forget_local'):
+            self.choice(first, correct=False).delete()
+        self.assertEqual(len(get_answer_key(self.exam.id).questions[0].choices), 1)
+
+
+@override_settings(EXAM_GRADING_ASYNC=False)
+class GradingTestCase(ExamTestMixin, TestCase):
+    def setUp(self):
+        self.create_exam(essays=0)
+        self.client.force_login(self.student)
+
+    def answer_all(self, attempt, correct=True):
+        Answer.objects.bulk_create([
+            Answer(attempt=attempt, question=question, selected_choice=self.choice(question, correct))
+            for question in self.questions
+        ])
+
+    def test_submit_grades_in_bulk(self):
+        first, second, third = self.questions
+        Answer.objects.create(attempt=self.attempt, question=first, selected_choice=self.choice(first))
+        Answer.objects.create(attempt=self.attempt, question=third, selected_choice=self.choice(third, False))
+
+        # session, user, attempt, then in a savepoint: claim, key version,
+        # key (2), answers, and in nested savepoints the bulk update, attempt
+        # save and the analytics stats lookup
+        with self.assertNumQueries(17):
+            response = self.client.post(f'/exams/attempt/{self.attempt.id}/submit/')
+        self.assertEqual(response.status_code, 302)
+
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.status, 'graded')
+        self.assertEqual(self.attempt.score, Decimal('40.00'))
+        self.assertEqual(Answer.objects.get(question=first).points_earned, 2)
+        self.assertEqual(Answer.objects.get(question=third).points_earned, 0)
+
+        # A second submit is a no-op
+        self.client.post(f'/exams/attempt/{self.attempt.id}/submit/')
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.score, Decimal('40.00'))
+
+    def test_regrade_after_fixing_answer_key(self):
+        self.answer_all(self.attempt)
+        self.client.post(f'/exams/attempt/{self.attempt.id}/submit/')
+        other = ExamAttempt.objects.create(exam=self.exam, user=self.instructor)
+        self.answer_all(other, correct=False)
+        self.client.force_login(self.instructor)
+        self.client.post(f'/exams/attempt/{other.id}/submit/')
+
+        # The "wrong" choice of the first question was actually right
+        question = self.questions[0]
+        Choice.objects.filter(question=question).update(is_correct=True)
+
+        self.assertEqual(regrade_exam(self.exam.id, batch_size=1), 1)
+        other.refresh_from_db()
+        self.assertEqual(other.score, Decimal('40.00'))
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.score, Decimal('100.00'))
+        # Every process picks up the fixed key
+        with override_settings(EXAM_ANSWER_KEY_LOCAL_TTL=0):
+            self.assertEqual(len(get_answer_key(self.exam.id).correct_choices[question.id]), 2)
+
+
+class GradingQueueTestCase(ExamTestMixin, TestCase):
+    def setUp(self):
+        self.create_exam(essays=0)
+        self.client.force_login(self.student)
+        for question in self.questions:
+            Answer.objects.create(attempt=self.attempt, question=question, selected_choice=self.choice(question))
+
+    def test_submit_enqueues_and_worker_grades(self):
+        # session, user, attempt, savepoint, claim, enqueue, release
+        with self.assertNumQueries(7):
+            self.client.post(f'/exams/attempt/{self.attempt.id}/submit/')
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.status, 'submitted')
+        self.assertIsNone(self.attempt.score)
+        self.assertEqual(grading_queue.queue_stats()['pending'], 1)
+
+        result = grading_queue.process_batch('test-worker')
+        self.assertEqual(result, grading_queue.BatchResult(1, 1, 0))
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.status, 'graded')
+        self.assertEqual(self.attempt.score, Decimal('100.00'))
+        self.assertFalse(GradingJob.objects.exists())
+
+    def submit(self):
+        ExamAttempt.objects.filter(pk=self.attempt.pk).update(status='submitted')
+        grading_queue.enqueue([self.attempt.id])
+
+    def test_failed_jobs_are_retried_then_given_up(self):
+        self.submit()
+        with mock.patch('exams.grading_queue.get_answer_key', side_effect=RuntimeError('boom')):
+            for _ in range(grading_queue.MAX_TRIES):
+                self.assertEqual(grading_queue.process_batch('test-worker').failed, 1)
+                GradingJob.objects.update(available_at=timezone.now())
+        job = GradingJob.objects.get()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('boom', job.last_error)
+        self.assertEqual(grading_queue.queue_stats()['failed'], 1)
+
+    def test_stale_running_jobs_are_requeued(self):
+        self.submit()
+        grading_queue.claim_batch('dead-worker')
+        GradingJob.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(grading_queue.requeue_stale(), 1)
+        self.assertEqual(grading_queue.process_batch('test-worker').graded, 1)
+
+
+class SweeperTestCase(ExamTestMixin, TestCase):
+    def setUp(self):
+        self.create_exam(essays=0)
+
+    def test_attempts_get_a_deadline(self):
+        expected = self.attempt.start_time + timedelta(minutes=self.exam.duration_minutes)
+        self.assertAlmostEqual(self.attempt.expires_at.timestamp(), expected.timestamp(), delta=1)
+
+    def test_deadline_stops_at_the_end_of_the_exam(self):
+        self.exam.end_date = timezone.now() + timedelta(minutes=10)
+        self.exam.save()
+        late = ExamAttempt.objects.create(exam=self.exam, user=self.instructor)
+        self.assertEqual(late.expires_at, self.exam.end_date)
+
+        self.assertEqual(sweep_expired(now=self.exam.end_date), 1)
+        late.refresh_from_db()
+        self.assertEqual((late.status, late.end_time), ('submitted', self.exam.end_date))
+
+    def test_sweep_submits_expired_attempts(self):
+        running = ExamAttempt.objects.create(exam=self.exam, user=self.instructor)
+        deadline = timezone.now() - timedelta(minutes=5)
+        ExamAttempt.objects.filter(pk=self.attempt.pk).update(expires_at=deadline)
+        Answer.objects.create(
+            attempt=self.attempt, question=self.questions[0], selected_choice=self.choice(self.questions[0]))
+
+        self.assertEqual(sweep_expired(batch_size=1), 1)
+        self.assertEqual(sweep_expired(), 0)
+
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.status, 'submitted')
+        self.assertEqual(self.attempt.end_time, deadline)
+        running.refresh_from_db()
+        self.assertEqual(running.status, 'in_progress')
+
+        grading_queue.process_batch('test-worker')
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.status, 'graded')
+        self.assertEqual(self.attempt.score, Decimal('40.00'))
+
+
+class ExamAnalyticsTestCase(ExamTestMixin, TestCase):
+    def setUp(self):
+        self.create_exam(essays=0)
+        self.attempt.delete()
+        # Student i answers the first i questions correctly
+        self.students = [
+            User.objects.create_user(f'taker{i}', f'taker{i}@example.com', 'pass') for i in range(4)
+        ]
+        for i, student in enumerate(self.students):
+            attempt = ExamAttempt.objects.create(exam=self.exam, user=student, status='submitted')
+            for position, question in enumerate(self.questions):
+                Answer.objects.create(
+                    attempt=attempt, question=question, selected_choice=self.choice(question, position < i))
+            grading_queue.enqueue([attempt.id])
+        grading_queue.process_batch('test-worker', batch_size=2)
+        grading_queue.process_batch('test-worker', batch_size=2)
+        self.scores = [0.0, 40.0, 80.0, 100.0]
+
+    def test_report_statistics(self):
+        report = exam_report(self.exam)
+        self.assertEqual(report['attempt_count'], 4)
+        self.assertAlmostEqual(report['mean'], statistics.mean(self.scores))
+        self.assertAlmostEqual(report['median'], statistics.median(self.scores))
+        self.assertAlmostEqual(report['stddev'], statistics.pstdev(self.scores))
+        self.assertEqual(report['pass_rate'], 0.5)
+        self.assertEqual([bucket['count'] for bucket in report['histogram']], [1, 0, 0, 0, 1, 0, 0, 0, 1, 1])
+        self.assertEqual([question['difficulty'] for question in report['questions']], [0.75, 0.5, 0.25])
+        for question in report['questions']:
+            self.assertGreater(question['discrimination'], 0)
+
+    def test_numpy_and_python_rebuilds_agree(self):
+        self.assertIsNotNone(analytics.np)
+        vectorized = exam_report(self.exam)
+        with mock.patch.object(analytics, 'np', None):
+            rebuild_exam_stats(self.exam.id)
+            loop = exam_report(self.exam)
+        for field in ('attempt_count', 'mean', 'stddev', 'histogram'):
+            self.assertEqual(vectorized[field], loop[field], field)
+        for a, b in zip(vectorized['questions'], loop['questions']):
+            self.assertAlmostEqual(a['difficulty'], b['difficulty'])
+            self.assertAlmostEqual(a['discrimination'], b['discrimination'])
+
+    def test_first_report_reads_the_rebuilt_rows_from_the_primary(self):
+        with mock.patch.object(analytics, 'primary_reads', wraps=analytics.primary_reads) as primary:
+            exam_report(self.exam)
+            # rebuild_exam_stats and the report read after it
+            self.assertEqual(primary.call_count, 2)
+            exam_report(self.exam)
+            self.assertEqual(primary.call_count, 2)
+
+    def test_incremental_stats_match_a_rebuild(self):
+        # Fix the key so the "wrong" choice of the last question also counts
+        Choice.objects.filter(question=self.questions[-1]).update(is_correct=True)
+        regrade_exam(self.exam.id)
+        incremental = exam_report(self.exam)
+        rebuild_exam_stats(self.exam.id)
+        rebuilt = exam_report(self.exam)
+        for field in ('attempt_count', 'mean', 'median', 'stddev', 'pass_rate', 'histogram'):
+            self.assertEqual(incremental[field], rebuilt[field], field)
+        for a, b in zip(incremental['questions'], rebuilt['questions']):
+            self.assertAlmostEqual(a['difficulty'], b['difficulty'])
+        self.assertEqual(incremental['questions'][-1]['difficulty'], 1.0)
+        self.assertIsNone(incremental['questions'][-1]['discrimination'])
+
+    def test_endpoint_is_instructor_only(self):
+        self.client.force_login(self.students[0])
+        self.assertEqual(self.client.get(f'/exams/instructor/exam/{self.exam.id}/analytics/').status_code, 403)
+        self.client.force_login(self.instructor)
+        exam_report(self.exam)  # materializes the stats
+        # session, user, exam, stats, pass count, question stats, median
+        with self.assertNumQueries(7):
+            response = self.client.get(f'/exams/instructor/exam/{self.exam.id}/analytics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['attempt_count'], 4)
+        self.assertTrue(ExamStats.objects.filter(exam=self.exam).exists())
+
+
+class QuestionGradingTestCase(ExamTestMixin, TestCase):
+    def setUp(self):
+        self.create_exam(multiple_choice=1, true_false=0, essays=1)
+        self.attempt.delete()
+        self.mc, self.essay = self.questions
+        self.attempts = []
+        for i in range(3):
+            student = User.objects.create_user(f'writer{i}', f'writer{i}@example.com', 'pass')
+            attempt = ExamAttempt.objects.create(exam=self.exam, user=student, status='submitted')
+            Answer.objects.create(attempt=attempt, question=self.mc, selected_choice=self.choice(self.mc))
+            Answer.objects.create(attempt=attempt, question=self.essay, text_answer=f'Essay {i}')
+            self.attempts.append(attempt)
+            grading_queue.enqueue([attempt.id])
+        grading_queue.process_batch('test-worker')
+        self.url = f'/exams/instructor/question/{self.essay.id}/answers/'
+        self.client.force_login(self.instructor)
+
+    def test_pages_through_ungraded_answers(self):
+        response = self.client.get(self.url, {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([row['text_answer'] for row in data['results']], ['Essay 0', 'Essay 1'])
+        response = self.client.get(data['next'])
+        self.assertEqual([row['text_answer'] for row in response.json()['results']], ['Essay 2'])
+        self.assertIsNone(response.json()['next'])
+
+    def test_page_size_is_clamped(self):
+        for page_size in (0, -5):
+            response = self.client.get(self.url, {'page_size': page_size})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['results']), 1)
+            self.assertIsNotNone(response.json()['next'])
+        self.assertEqual(self.client.get(self.url, {'page_size': 'ten'}).status_code, 400)
+
+    def test_batch_grades_update_scores_in_one_pass(self):
+        answers = list(Answer.objects.filter(question=self.essay).order_by('id'))
+        grades = [
+            {'answer_id': answers[0].id, 'points': 5, 'feedback': 'Great'},
+            {'answer_id': answers[1].id, 'points': 9},  # clamped to 5
+        ]
+        response = self.client.post(self.url, {'grades': grades}, content_type='application/json')
+        self.assertEqual(response.json(), {'graded': 2})
+
+        first, second, third = (ExamAttempt.objects.get(pk=attempt.pk) for attempt in self.attempts)
+        self.assertEqual((first.status, first.score), ('graded', Decimal('100.00')))
+        self.assertEqual(second.score, Decimal('100.00'))
+        self.assertEqual(third.status, 'submitted')
+        self.assertEqual(Answer.objects.get(pk=answers[0].id).feedback, 'Great')
+        self.assertEqual(len(self.client.get(self.url).json()['results']), 1)
+
+        # Regrading an answer moves the analytics with it
+        self.client.post(self.url, {'grades': [{'answer_id': answers[1].id, 'points': 0}]},
+                         content_type='application/json')
+        report = exam_report(self.exam)
+        rebuild_exam_stats(self.exam.id)
+        self.assertEqual(report['mean'], exam_report(self.exam)['mean'])
+        self.assertAlmostEqual(report['mean'], (100 + 28.57) / 2)
+
+    def test_full_grading_clamps_negative_points(self):
+        attempt = self.attempts[0]
+        essay = Answer.objects.get(attempt=attempt, question=self.essay)
+        self.client.post(f'/exams/instructor/attempt/{attempt.id}/grade/', {f'points_{essay.id}': '-3'})
+        essay.refresh_from_db()
+        attempt.refresh_from_db()
+        self.assertEqual(essay.points_earned, 0)
+        self.assertEqual((attempt.status, attempt.score), ('graded', Decimal('28.57')))
+
+    def test_instructor_grading_before_the_worker_runs(self):
+        late, later = [], []
+        for attempts, name in ((late, 'late'), (later, 'later')):
+            student = User.objects.create_user(name, f'{name}@example.com', 'pass')
+            attempt = ExamAttempt.objects.create(exam=self.exam, user=student, status='submitted')
+            Answer.objects.create(attempt=attempt, question=self.mc, selected_choice=self.choice(self.mc))
+            attempts.append(Answer.objects.create(attempt=attempt, question=self.essay, text_answer='Essay'))
+            attempts.append(attempt)
+            grading_queue.enqueue([attempt.id])
+        (late_essay, late), (later_essay, later) = late, later
+        exam_report(self.exam)  # materializes the stats
+
+        # One attempt graded in full, the other's essay graded in a batch
+        self.client.post(f'/exams/instructor/attempt/{late.id}/grade/', {f'points_{late_essay.id}': '1'})
+        self.client.post(self.url, {'grades': [{'answer_id': later_essay.id, 'points': 5}]},
+                         content_type='application/json')
+        self.assertEqual(exam_report(self.exam)['attempt_count'], 1)
+
+        result = grading_queue.process_batch('test-worker')
+        self.assertEqual((result.claimed, result.graded, result.failed), (2, 1, 0))
+        self.assertFalse(GradingJob.objects.exists())
+        late.refresh_from_db()
+        self.assertEqual((late.status, late.score), ('graded', Decimal('42.86')))
+        later.refresh_from_db()
+        self.assertEqual((later.status, later.score), ('graded', Decimal('100.00')))
+        # Each counted once
+        report = exam_report(self.exam)
+        self.assertEqual(report['attempt_count'], 2)
+        rebuild_exam_stats(self.exam.id)
+        self.assertEqual(report['mean'], exam_report(self.exam)['mean'])
+
+    def test_ignores_answers_to_other_questions(self):
+        other = Answer.objects.filter(question=self.mc).first()
+        response = self.client.post(self.url, {'grades': [{'answer_id': other.id, 'points': 0}]},
+                                    content_type='application/json')
+        self.assertEqual(response.json(), {'graded': 0})
+
+        self.client.force_login(self.student)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class UpcomingExamsTestCase(ExamTestMixin, TestCase):
+    def setUp(self):
+        # Invalidation must reach every worker, so the cache needs a shared backend
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        shared = override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                'LOCATION': location.name}},
+            UPCOMING_EXAMS_CACHE_TIMEOUT=60,
+        )
+        shared.enable()
+        self.addCleanup(shared.disable)
+        self.create_exam()
+        now = timezone.now()
+        self.courses = [self.course] + [
+            Course.objects.create(
+                title=f"Course {i}", description="", instructor=self.instructor,
+                category=self.course.category, is_published=True,
+            )
+            for i in range(3)
+        ]
+        for i, course in enumerate(self.courses):
+            Exam.objects.create(
+                title=f"Quiz {i}", course=course, exam_type='quiz',
+                start_date=now + timedelta(days=i + 1), end_date=now + timedelta(days=i + 2),
+            )
+        Exam.objects.create(
+            title="Hidden", course=self.courses[1], exam_type='quiz', is_active=False,
+            start_date=now + timedelta(days=1), end_date=now + timedelta(days=2),
+        )
+        for course in self.courses[:3]:
+            Enrollment.objects.create(user=self.student, course=course)
+        Enrollment.objects.filter(user=self.student, course=self.courses[2]).update(status='dropped')
+
+    def test_one_query_for_any_number_of_courses(self):
+        with self.assertNumQueries(1):
+            exams = get_upcoming_exams(self.student)
+        self.assertEqual([exam['title'] for exam in exams], ['Quiz 0', 'Quiz 1'])
+        self.assertEqual(exams[1]['course']['title'], 'Course 0')
+        with self.assertNumQueries(0):
+            get_upcoming_exams(self.student)
+
+    def test_cache_needs_shared_backend(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'UPCOMING_EXAMS_CACHE_TIMEOUT'):
+                check_shared_cache('UPCOMING_EXAMS_CACHE_TIMEOUT')
+            # Without the check, a per-process cache would still be skipped
+            get_upcoming_exams(self.student)
+            with self.assertNumQueries(1):
+                get_upcoming_exams(self.student)
+
+    def test_enrolling_invalidates_the_cache(self):
+        get_upcoming_exams(self.student)
+        Enrollment.objects.create(user=self.student, course=self.courses[3])
+        self.assertEqual(len(get_upcoming_exams(self.student)), 3)
+
+    def titles(self):
+        return [exam['title'] for exam in get_upcoming_exams(self.student)]
+
+    def test_bulk_writes_and_exam_changes_invalidate(self):
+        titles = self.titles
+        self.assertEqual(titles(), ['Quiz 0', 'Quiz 1'])
+        # Reactivated by the cohort bulk path
+        enroll_users(self.courses[2], [self.student.pk])
+        self.assertEqual(titles(), ['Quiz 0', 'Quiz 1', 'Quiz 2'])
+
+        exam = Exam.objects.get(title='Quiz 2')
+        exam.is_active = False
+        exam.save()
+        self.assertEqual(titles(), ['Quiz 0', 'Quiz 1'])
+
+        # Completing the course ends its enrollment
+        section = Section.objects.create(course=self.courses[0], title="Only", order=0)
+        lesson = Lesson.objects.create(section=section, title="Only", order=0)
+        Enrollment.objects.filter(user=self.student, course=self.courses[0]).update(total_sections=1)
+        complete_lesson(self.student, lesson)
+        self.assertEqual(titles(), ['Quiz 1'])
+
+    def test_json_list(self):
+        self.client.force_login(self.student)
+        response = self.client.get('/exams/upcoming/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([exam['title'] for exam in response.json()['results']], ['Quiz 0', 'Quiz 1'])
@@ -0,0 +1,113 @@
+# exams/upcoming.py
+"""
+Upcoming exams for a student's dashboard.
+
+One query joins the student's active enrollments to the courses' active
+exams that have not started yet, served by the
+``(course, is_active, start_date)`` index. Results are cached per user for
+a short time. They are dropped when the user's enrollments change and,
+through a version shared by all users, whenever any exam changes.
+
+Those deletes and bumps must reach every worker, so the cache is only used
+with ``UPCOMING_EXAMS_CACHE_TIMEOUT`` set and a shared cache backend (see
+``elearning_backend.caching``); otherwise every lookup is the one query.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from elearning_backend.caching import shared_cache_timeout
+from .models import Exam
+
+
+VERSION_KEY = 'upcoming-exams-version'
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    """Drop every user's cached list, e.g. after an exam is added, moved or removed"""
+    if not shared_cache_timeout('UPCOMING_EXAMS_CACHE_TIMEOUT'):
+        return
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def _cache_key(user_id, version):
+    return f'upcoming-exams:{version}:{user_id}'
+
+
+def upcoming_exams_queryset(user, now=None):
+    # Both enrollment conditions go in one filter() so they share the join
+    return Exam.objects.filter(
+        course__course_enrollments__user=user,
+        course__course_enrollments__status='active',
+        is_active=True,
+        start_date__gt=now or timezone.now(),
+    ).order_by('start_date', 'id')
+
+
+def _load(user):
+    return [
+        {
+            'id': row['id'],
+            'title': row['title'],
+            'exam_type': row['exam_type'],
+            'start_date': row['start_date'],
+            'end_date': row['end_date'],
+            'duration_minutes': row['duration_minutes'],
+            'course': {'id': row['course_id'], 'title': row['course__title']},
+        }
+        for row in upcoming_exams_queryset(user).values(
+            'id', 'title', 'exam_type', 'start_date', 'end_date', 'duration_minutes',
+            'course_id', 'course__title',
+        )
+    ]
+
+
+def get_upcoming_exams(user):
+    """Upcoming exams as dicts (template- and JSON-friendly), soonest first"""
+    timeout = shared_cache_timeout('UPCOMING_EXAMS_CACHE_TIMEOUT')
+    if not timeout:
+        return _load(user)
+    key = _cache_key(user.pk, _current_version())
+    exams = cache.get(key)
+    if exams is None:
+        exams = _load(user)
+        cache.set(key, exams, timeout)
+    # Drop exams that started since the entry was cached
+    now = timezone.now()
+    return [exam for exam in exams if exam['start_date'] > now]
+
+
+def invalidate_upcoming_exams(user_ids):
+    # Drop now for this connection and again after commit, so a concurrent
+    # reader cannot cache the pre-commit state after the first delete
+    user_ids = set(user_ids)
+    if not user_ids or not shared_cache_timeout('UPCOMING_EXAMS_CACHE_TIMEOUT'):
+        return
+
+    def delete():
+        version = _current_version()
+        cache.delete_many([_cache_key(user_id, version) for user_id in user_ids])
+
+    delete()
+    transaction.on_commit(delete)
+
+
+def exam_as_json(exam):
+    return {
+        **exam,
+        'start_date': exam['start_date'].isoformat(),
+        'end_date': exam['end_date'].isoformat(),
+    }
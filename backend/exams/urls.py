@@ -14,5 +14,8 @@ urlpatterns = [
     path('attempt/<int:attempt_id>/results/', views.exam_results, name='exam_results'),
     path('instructor/exams/', views.InstructorExamListView.as_view(), name='instructor_exams'),
     path('instructor/exam/<int:exam_id>/attempts/', views.instructor_exam_attempts, name='instructor_exam_attempts'),
+    path('instructor/exam/<int:exam_id>/analytics/', views.exam_analytics, name='exam_analytics'),
+    path('instructor/question/<int:question_id>/answers/', views.question_grading, name='question_grading'),
     path('instructor/attempt/<int:attempt_id>/grade/', views.grade_exam, name='grade_exam'),
+    path('grading-queue/metrics/', views.grading_queue_metrics, name='grading_queue_metrics'),
 ]
\ No newline at end of file
@@ -1,4 +1,7 @@
 # exams/views.py
+import logging
+from decimal import Decimal, InvalidOperation
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -6,30 +9,42 @@ from django.views.generic import ListView, DetailView, CreateView
 from django.contrib import messages
 from django.urls import reverse
 from django.utils import timezone
-from django.http import Http404
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import transaction
+from django.http import Http404, JsonResponse
 from django.db.models import Count, Max
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
 from .models import Exam, Question, Choice, ExamAttempt, Answer
 from .forms import ExamAttemptForm
+from .answer_key import AUTO_GRADED_TYPES, get_answer_key
+from . import grading_queue
+from .analytics import StatsDelta, attempt_vector, exam_report
+from .grading import ANSWER_FIELDS, apply_question_grades, grade_attempt, score_answers
+from .services import save_answers
+from .upcoming import exam_as_json, get_upcoming_exams
 from courses.models import Course
+from elearning_backend.instrumentation import log_event
+from elearning_backend.routers import ReadReplicaMixin, use_read_replica
 from enrollments.models import Enrollment
 
+logger = logging.getLogger(__name__)
+
 class UpcomingExamsListView(LoginRequiredMixin, ListView):
     template_name = 'exams/upcoming_exams.html'
     context_object_name = 'upcoming_exams'
     
     def get_queryset(self):
-        now = timezone.now()
-        enrolled_courses = Course.objects.filter(
-            enrollments__user=self.request.user,
-            enrollments__status='active'
-        )
-        
-        return Exam.objects.filter(
-            course__in=enrolled_courses,
-            start_date__gt=now,
-            is_active=True
-        ).order_by('start_date')
+        return get_upcoming_exams(self.request.user)
+    
+    def render_to_response(self, context, **response_kwargs):
+        if self.request.headers.get('Accept') == 'application/json':
+            return JsonResponse({'results': [exam_as_json(exam) for exam in context['upcoming_exams']]})
+        return super().render_to_response(context, **response_kwargs)
 
 class ExamDetailView(LoginRequiredMixin, DetailView):
     model = Exam
@@ -107,7 +122,8 @@ def start_exam(request, exam_id):
     existing_attempt = ExamAttempt.objects.filter(
         exam=exam,
         user=request.user,
-        status='in_progress'
+        status='in_progress',
+        expires_at__gt=now
     ).first()
     
     if existing_attempt:
@@ -119,15 +135,17 @@ def start_exam(request, exam_id):
         user=request.user,
         status='in_progress'
     )
+    log_event(logger, 'exam.attempt_started', exam_id=exam.id, attempt_id=attempt.id,
+              attempt_number=attempts_count + 1)
     
     return redirect('exams:take_exam', attempt_id=attempt.id)
 
 @login_required
 def take_exam(request, attempt_id):
-    attempt = get_object_or_404(ExamAttempt, id=attempt_id)
+    attempt = get_object_or_404(ExamAttempt.objects.select_related('exam'), id=attempt_id)
     
     # Check if this attempt belongs to the user
-    if attempt.user != request.user:
+    if attempt.user_id != request.user.id:
         messages.error(request, "You do not have permission to access this exam attempt.")
         return redirect('accounts:dashboard')
     
@@ -138,60 +156,18 @@ def take_exam(request, attempt_id):
     
     exam = attempt.exam
     
-    # Check if exam time has expired
-    time_elapsed = timezone.now() - attempt.start_time
-    if time_elapsed.total_seconds() > exam.duration_minutes * 60:
-        # Auto-submit if time expired
+    # Check if exam time has expired; the sweep_expired_attempts command
+    # submits abandoned attempts, this only covers a reload before it runs
+    if attempt.is_expired:
         return submit_exam(request, attempt_id)
     
-    # Get all questions for the exam
-    questions = exam.questions.all().prefetch_related('choices')
+    # Questions and choices come from the cached answer key, not the database
+    answer_key = get_answer_key(exam.id)
+    questions = answer_key.questions
     
     if request.method == 'POST':
-        # Process answers
-        for question in questions:
-            if question.question_type == 'multiple_choice':
-                choice_id = request.POST.get(f'question_{question.id}')
-                if choice_id:
-                    choice = get_object_or_404(Choice, id=choice_id)
-                    answer, created = Answer.objects.update_or_create(
-                        attempt=attempt,
-                        question=question,
-                        defaults={
-                            'selected_choice': choice,
-                            'is_correct': choice.is_correct
-                        }
-                    )
-            elif question.question_type == 'true_false':
-                answer_value = request.POST.get(f'question_{question.id}')
-                if answer_value:
-                    is_correct = (answer_value == 'true' and 
-                                  question.choices.filter(is_correct=True, choice_text='True').exists()) or \
-                                 (answer_value == 'false' and 
-                                  question.choices.filter(is_correct=True, choice_text='False').exists())
-                    
-                    choice = question.choices.get(choice_text=answer_value.capitalize())
-                    answer, created = Answer.objects.update_or_create(
-                        attempt=attempt,
-                        question=question,
-                        defaults={
-                            'selected_choice': choice,
-                            'is_correct': is_correct
-                        }
-                    )
-            else:  # Essay or short answer
-                text_answer = request.POST.get(f'question_{question.id}')
-                if text_answer:
-                    answer, created = Answer.objects.update_or_create(
-                        attempt=attempt,
-                        question=question,
-                        defaults={
-                            'text_answer': text_answer,
-                            # These will be graded later
-                            'is_correct': None,
-                            'points_earned': None
-                        }
-                    )
+        # Resolve and score every answer in memory, then write them in one upsert
+        save_answers(attempt, answer_key, request.POST)
         
         # Check if it's a save or submit action
         if 'save' in request.POST:
@@ -202,16 +178,13 @@ def take_exam(request, attempt_id):
     
     # Get existing answers
     answers = {}
-    for answer in Answer.objects.filter(attempt=attempt):
-        if answer.selected_choice:
-            answers[answer.question.id] = answer.selected_choice.id
-        else:
-            answers[answer.question.id] = answer.text_answer
+    for question_id, choice_id, text_answer in Answer.objects.filter(attempt=attempt).values_list(
+        'question_id', 'selected_choice_id', 'text_answer'
+    ):
+        answers[question_id] = choice_id if choice_id else text_answer
     
     # Calculate time remaining
-    time_limit_seconds = exam.duration_minutes * 60
-    elapsed_seconds = time_elapsed.total_seconds()
-    remaining_seconds = max(0, time_limit_seconds - elapsed_seconds)
+    remaining_seconds = max(0, (attempt.expires_at - timezone.now()).total_seconds())
     
     return render(request, 'exams/take_exam.html', {
         'attempt': attempt,
@@ -229,39 +202,21 @@ def submit_exam(request, attempt_id):
         messages.info(request, "This exam has already been submitted.")
         return redirect('exams:exam_results', attempt_id=attempt.id)
     
-    # Mark the attempt as submitted
-    attempt.status = 'submitted'
-    attempt.end_time = timezone.now()
-    
-    # Auto-grade multiple-choice and true/false questions
-    total_points = 0
-    earned_points = 0
-    
-    for question in attempt.exam.questions.all():
-        total_points += question.points
+    # Claim the attempt with a conditional UPDATE so a double submit grades once
+    now = timezone.now()
+    with transaction.atomic():
+        if not ExamAttempt.objects.filter(pk=attempt.pk, status='in_progress').update(status='submitted', end_time=now):
+            messages.info(request, "This exam has already been submitted.")
+            return redirect('exams:exam_results', attempt_id=attempt.id)
+        attempt.end_time = now
         
-        if question.question_type in ['multiple_choice', 'true_false']:
-            answer = Answer.objects.filter(attempt=attempt, question=question).first()
-            
-            if answer and answer.is_correct:
-                answer.points_earned = question.points
-                earned_points += question.points
-                answer.save()
-            elif answer:
-                answer.points_earned = 0
-                answer.save()
-    
-    # Calculate score as percentage
-    if total_points > 0:
-        attempt.score = (earned_points / total_points) * 100
-    else:
-        attempt.score = 0
-    
-    # For exams with only auto-graded questions, mark as graded
-    if not attempt.exam.questions.filter(question_type__in=['short_answer', 'essay']).exists():
-        attempt.status = 'graded'
-    
-    attempt.save()
+        grading = 'queued' if getattr(settings, 'EXAM_GRADING_ASYNC', True) else 'inline'
+        if grading == 'queued':
+            # Auto-grading happens in the run_grading_worker command
+            grading_queue.enqueue([attempt.id])
+        else:
+            grade_attempt(attempt)
+    log_event(logger, 'exam.attempt_submitted', exam_id=attempt.exam_id, attempt_id=attempt.id, grading=grading)
     
     messages.success(request, "Your exam has been submitted successfully.")
     return redirect('exams:exam_results', attempt_id=attempt.id)
@@ -285,7 +240,7 @@ def exam_results(request, attempt_id):
         'passed': attempt.is_passed if attempt.score is not None else False
     })
 
-class InstructorExamListView(LoginRequiredMixin, ListView):
+class InstructorExamListView(LoginRequiredMixin, ReadReplicaMixin, ListView):
     template_name = 'exams/instructor_exam_list.html'
     context_object_name = 'exams'
     
@@ -294,42 +249,51 @@ class InstructorExamListView(LoginRequiredMixin, ListView):
 
 @login_required
 def grade_exam(request, attempt_id):
-    attempt = get_object_or_404(ExamAttempt, id=attempt_id)
+    attempt = get_object_or_404(ExamAttempt.objects.select_related('exam__course'), id=attempt_id)
     
     # Check if the user is the instructor of the course
-    if attempt.exam.course.instructor != request.user:
+    if attempt.exam.course.instructor_id != request.user.id:
         messages.error(request, "You do not have permission to grade this exam.")
         return redirect('accounts:dashboard')
     
     if request.method == 'POST':
-        total_points = 0
-        earned_points = 0
+        answer_key = get_answer_key(attempt.exam_id)
+        answers = list(Answer.objects.filter(attempt=attempt).only(*ANSWER_FIELDS, 'feedback'))
+        delta = StatsDelta()
+        if attempt.status == 'graded':
+            # Regrading: take the previous result out of the exam analytics
+            delta.remove(attempt.exam_id, attempt.score, attempt_vector(answer_key, answers))
         
-        for question in attempt.exam.questions.all():
-            total_points += question.points
-            answer = Answer.objects.get(attempt=attempt, question=question)
-            
-            if question.question_type in ['multiple_choice', 'true_false']:
-                # These were already auto-graded
-                if answer.points_earned is not None:
-                    earned_points += answer.points_earned
-            else:
-                # Grade essay/short answer questions
-                points = request.POST.get(f'points_{answer.id}')
-                feedback = request.POST.get(f'feedback_{answer.id}')
-                
-                if points:
-                    answer.points_earned = min(float(points), question.points)
-                    answer.feedback = feedback
-                    answer.save()
-                    
-                    earned_points += answer.points_earned
+        # Grade essay/short answer questions; auto-graded ones are rescored
+        # against the answer key by score_answers below
+        graded = []
+        for answer in answers:
+            question = answer_key.by_id.get(answer.question_id)
+            if question is None or question.question_type in AUTO_GRADED_TYPES:
+                continue
+            try:
+                points = Decimal(request.POST.get(f'points_{answer.id}') or 'NaN')
+            except InvalidOperation:
+                continue
+            if points.is_finite():
+                answer.points_earned = min(max(points, Decimal(0)), Decimal(question.points))
+                answer.feedback = request.POST.get(f'feedback_{answer.id}', '')
+                graded.append(answer)
         
-        # Update the attempt
-        attempt.status = 'graded'
-        attempt.score = (earned_points / total_points) * 100 if total_points > 0 else 0
-        attempt.feedback = request.POST.get('overall_feedback', '')
-        attempt.save()
+        score, changed = score_answers(answer_key, answers)
+        with transaction.atomic():
+            Answer.objects.bulk_update(graded, ['points_earned', 'feedback'])
+            Answer.objects.bulk_update(changed, ['is_correct', 'points_earned'])
+            
+            # Update the attempt
+            attempt.status = 'graded'
+            attempt.score = score
+            attempt.feedback = request.POST.get('overall_feedback', '')
+            attempt.save(update_fields=['status', 'score', 'feedback'])
+            delta.add(attempt.exam_id, score, attempt_vector(answer_key, answers))
+            delta.apply()
+        log_event(logger, 'exam.attempt_graded', exam_id=attempt.exam_id, attempt_id=attempt.id,
+                  score=score, manually_graded=len(graded))
         
         messages.success(request, "The exam has been graded successfully.")
         return redirect('exams:instructor_exam_attempts', exam_id=attempt.exam.id)
@@ -345,6 +309,7 @@ def grade_exam(request, attempt_id):
     })
 
 @login_required
+@use_read_replica
 def instructor_exam_attempts(request, exam_id):
     exam = get_object_or_404(Exam, id=exam_id)
     
@@ -367,4 +332,97 @@ class StudentExamHistoryView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         return ExamAttempt.objects.filter(
             user=self.request.user
-        ).select_related('exam', 'exam__course').order_by('-start_time')
\ No newline at end of file
+        ).select_related('exam', 'exam__course').order_by('-start_time')
+
+@staff_member_required
+def grading_queue_metrics(request):
+    return JsonResponse(grading_queue.queue_stats())
+
+@use_read_replica
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def exam_analytics(request, exam_id):
+    """Score distribution and per-question statistics for an exam's instructor"""
+    exam = get_object_or_404(Exam.objects.select_related('course'), id=exam_id)
+    if exam.course.instructor_id != request.user.id and not request.user.is_staff:
+        return Response({'error': 'Only the course instructor can view exam analytics'},
+                        status=status.HTTP_403_FORBIDDEN)
+    return Response(exam_report(exam))
+
+GRADING_PAGE_SIZE = 50
+MAX_GRADING_PAGE_SIZE = 200
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def question_grading(request, question_id):
+    """
+    Question-centric grading: GET pages through the answers still to be
+    graded, POST grades a batch of them at once.
+    """
+    question = get_object_or_404(Question.objects.select_related('exam__course'), id=question_id)
+    if question.exam.course.instructor_id != request.user.id and not request.user.is_staff:
+        return Response({'error': 'Only the course instructor can grade this question'},
+                        status=status.HTTP_403_FORBIDDEN)
+    
+    if request.method == 'POST':
+        grades = request.data.get('grades') if isinstance(request.data, dict) else None
+        if not isinstance(grades, list) or not grades:
+            return Response({'error': 'Expected a non-empty "grades" list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(grades) > MAX_GRADING_PAGE_SIZE:
+            return Response({'error': f'At most {MAX_GRADING_PAGE_SIZE} grades per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            parsed = {
+                int(grade['answer_id']): (Decimal(str(grade['points'])), str(grade.get('feedback') or ''))
+                for grade in grades
+            }
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            return Response({'error': 'Each grade needs an answer_id and numeric points'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not all(points.is_finite() for points, _ in parsed.values()):
+            return Response({'error': 'Points must be finite numbers'}, status=status.HTTP_400_BAD_REQUEST)
+        graded = apply_question_grades(question, parsed)
+        log_event(logger, 'exam.question_graded', exam_id=question.exam_id, question_id=question.id, graded=graded)
+        return Response({'graded': graded})
+    
+    try:
+        page_size = max(1, min(int(request.query_params.get('page_size', GRADING_PAGE_SIZE)), MAX_GRADING_PAGE_SIZE))
+        cursor = int(request.query_params.get('cursor') or 0)
+    except ValueError:
+        return Response({'error': 'Invalid cursor or page_size'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    answers = Answer.objects.filter(
+        question=question, id__gt=cursor, attempt__status__in=['submitted', 'graded'])
+    if request.query_params.get('include_graded') != '1':
+        answers = answers.filter(points_earned__isnull=True)
+    rows = list(answers.order_by('id').values(
+        'id', 'attempt_id', 'attempt__user__username', 'text_answer', 'points_earned', 'feedback',
+    )[:page_size + 1])
+    
+    next_url = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        params = request.GET.copy()
+        params['cursor'] = rows[-1]['id']
+        next_url = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+    
+    return Response({
+        'question': {
+            'id': question.id,
+            'text': question.question_text,
+            'question_type': question.question_type,
+            'points': question.points,
+        },
+        'next': next_url,
+        'results': [
+            {
+                'answer_id': row['id'],
+                'attempt_id': row['attempt_id'],
+                'student': row['attempt__user__username'],
+                'text_answer': row['text_answer'],
+                'points_earned': row['points_earned'],
+                'feedback': row['feedback'],
+            }
+            for row in rows
+        ],
+    })
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from accounts.credentials import create_user
 from .models import User
 
 class UserSerializer(serializers.ModelSerializer):
@@ -21,12 +22,10 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return data
     
     def create(self, validated_data):
-        user = User.objects.create_user(
+        return create_user(
             username=validated_data['username'],
             email=validated_data['email'],
+            password=validated_data['password'],
             first_name=validated_data.get('first_name', ''),
             last_name=validated_data.get('last_name', ''),
-        )
-        user.set_password(validated_data['password'])
-        user.save()
-        return user
\ No newline at end of file
+        )
\ No newline at end of file
@@ -1,6 +1,7 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from accounts.credentials import set_password, verify_password
 from .models import User
 from .serializers import UserSerializer, UserRegistrationSerializer
 from django.views.generic.edit import FormView
@@ -21,7 +22,8 @@ class ChangePasswordView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request):
-        user = request.user
+        # Fresh row: request.user may be a cached copy with an old hash
+        user = User.objects.get(pk=request.user.pk)
         current_password = request.data.get('current_password')
         new_password = request.data.get('new_password')
         
@@ -31,14 +33,14 @@ class ChangePasswordView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        if not user.check_password(current_password):
+        if not verify_password(user, current_password):
             return Response(
                 {'detail': 'Current password is incorrect'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        user.set_password(new_password)
-        user.save()
+        set_password(user, new_password)
+        user.save(update_fields=['password'])
         
         return Response({'detail': 'Password updated successfully'})
     
@@ -52,6 +54,7 @@ from django.views.generic import CreateView, UpdateView, DetailView
 from django.urls import reverse_lazy
 from .models import User, UserProfile
 from .forms import UserRegistrationForm, UserProfileForm, LoginForm
+from exams.upcoming import get_upcoming_exams
 
 class UserRegistrationView(CreateView):
     model = User
@@ -107,17 +110,11 @@ class UserProfileUpdateView(UpdateView):
 
 @login_required
 def dashboard(request):
-    enrolled_courses = request.user.enrollments.all()
-    upcoming_exams = []
-    
-    for enrollment in enrolled_courses:
-        course_exams = enrollment.course.exams.all()
-        for exam in course_exams:
-            upcoming_exams.append(exam)
+    enrolled_courses = request.user.user_enrollments.select_related('course')
     
     context = {
         'enrolled_courses': enrolled_courses,
-        'upcoming_exams': upcoming_exams
+        'upcoming_exams': get_upcoming_exams(request.user)
     }
     
     return render(request, 'users/dashboard.html', context)
\ No newline at end of file
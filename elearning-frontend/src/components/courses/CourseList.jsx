@@ -18,7 +18,7 @@ function CourseList() {
           throw new Error('Failed to fetch courses');
         }
         const data = await response.json();
-        const processedData = data.map(course => ({
+        const processedData = data.results.map(course => ({
           ...course,
           thumbnail: course.thumbnail && !course.thumbnail.startsWith('http') 
             ? `http://localhost:8000${course.thumbnail}` 